@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Benchmarks of summaries and output rendering."""
+from __future__ import unicode_literals
+
+from argparse import Namespace
+from io import StringIO
+
+import pytest
+
+from odorik.config import OdorikConfig
+from odorik.commands.base import Command, SORT_ORDER
+
+
+def get_command(output_format):
+    """Create command rendering to memory."""
+    return Command(
+        Namespace(format=output_format), OdorikConfig(), StringIO()
+    )
+
+
+def bench_calls_summary(benchmark, calls):
+    """Calls summary."""
+    result = benchmark(Command.calls_summary, calls)
+    assert result['count'] == len(calls)
+
+
+def bench_sms_summary(benchmark, sms):
+    """SMS summary."""
+    result = benchmark(Command.sms_summary, sms)
+    assert result['count'] == len(sms)
+
+
+def bench_data_summary(benchmark, data):
+    """Mobile data summary."""
+    result = benchmark(Command.data_summary, data)
+    assert result['bytes_total'] > 0
+
+
+@pytest.mark.parametrize('output_format', ('text', 'csv', 'json', 'html'))
+def bench_print_list(benchmark, calls, output_format):
+    """Rendering of calls list."""
+    command = get_command(output_format)
+
+    def render():
+        """Render to empty buffer."""
+        command.stdout = StringIO()
+        command.print(calls)
+
+    benchmark(render)
+
+
+@pytest.mark.parametrize('output_format', ('text', 'csv', 'json', 'html'))
+def bench_print_summary(benchmark, size, output_format):
+    """Rendering of summary for many lines."""
+    lines = {
+        'Line {0}'.format(i): {field: i for field in SORT_ORDER}
+        for i in range(max(size // 100, 1))
+    }
+    command = get_command(output_format)
+
+    def render():
+        """Render to empty buffer."""
+        command.stdout = StringIO()
+        command.print(lines)
+
+    benchmark(render)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Benchmarks of API response decoding."""
+from __future__ import unicode_literals
+
+import pytest
+
+from odorik import Odorik, synthetic
+
+
+class StaticOdorik(Odorik):
+
+    """API object returning static response without network access."""
+
+    def __init__(self, body):
+        """Create object returning given body."""
+        super(StaticOdorik, self).__init__()
+        self.body = body
+
+    def _request(self, method, path, args):
+        """Return static response."""
+        return self.body, {'phases': {}, 'duration': 0}
+
+
+@pytest.mark.parametrize('kind', ('calls', 'sms', 'data', 'lines'))
+def bench_get_json(benchmark, request, kind, size):
+    """Decoding of JSON response."""
+    records = request.getfixturevalue(kind)
+    assert len(records) == size
+    api = StaticOdorik(synthetic.dump(records))
+    result = benchmark(api.get_json, 'test.json')
+    assert len(result) == len(records)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Shared fixtures for benchmarks.
+
+Dataset sizes can be configured by ODORIK_BENCH_SIZES environment variable
+as comma separated list of record counts, for example 1000,10000000.
+"""
+from __future__ import unicode_literals
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from odorik import synthetic  # noqa: E402
+
+SIZES = [
+    int(size)
+    for size in os.environ.get(
+        'ODORIK_BENCH_SIZES', '1000,10000,100000'
+    ).split(',')
+]
+
+GENERATORS = {
+    'calls': synthetic.generate_calls,
+    'sms': synthetic.generate_sms,
+    'data': synthetic.generate_data,
+    'lines': synthetic.generate_lines,
+}
+
+CACHE = {}
+
+
+def get_records(kind, size):
+    """Return generated records, cached across benchmarks."""
+    key = (kind, size)
+    if key not in CACHE:
+        CACHE.clear()
+        CACHE[key] = list(GENERATORS[kind](size))
+    return CACHE[key]
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: '{0}'.format(size))
+def size(request):
+    """Dataset size."""
+    return request.param
+
+
+@pytest.fixture
+def calls(size):  # pylint: disable=redefined-outer-name
+    """Generated calls."""
+    return get_records('calls', size)
+
+
+@pytest.fixture
+def sms(size):  # pylint: disable=redefined-outer-name
+    """Generated SMS messages."""
+    return get_records('sms', size)
+
+
+@pytest.fixture
+def data(size):  # pylint: disable=redefined-outer-name
+    """Generated mobile data usage."""
+    return get_records('data', size)
+
+
+@pytest.fixture
+def lines(size):  # pylint: disable=redefined-outer-name
+    """Generated lines."""
+    return get_records('lines', size)
@@ -22,11 +22,24 @@ from __future__ import unicode_literals
 
 try:
     from urllib import urlencode, urlopen
+    from urllib2 import HTTPError
 except ImportError:
     from urllib.parse import urlencode
     from urllib.request import urlopen
+    from urllib.error import HTTPError
 
+import calendar
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+import hashlib
+import heapq
 import json
+import os
+import tempfile
+import threading
+import time
+from timeit import default_timer
 
 __version__ = '0.6'
 
@@ -36,16 +49,241 @@ URL = 'http://www.odorik.cz/'
 USER_AGENT = 'python-odorik/{0}'.format(__version__)
 
 
+DEFAULT_WINDOW = timedelta(days=7)
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Parameters not used to identify recorded responses, the user is kept as
+# responses differ between accounts
+CREDENTIALS = ('password', 'user_agent')
+# API paths returning list of records
+RECORD_PATHS = ('calls.json', 'sms.json', 'mobile_data.json')
+# Fields needed for iterating over records window by window
+ITER_FIELDS = ('id', 'date')
+
+
 class OdorikException(Exception):
 
     """Generic error."""
 
 
+Response = namedtuple(
+    'Response', ('status', 'body', 'size', 'phases', 'shared')
+)
+# Responses are fetched by the request unless said otherwise
+Response.__new__.__defaults__ = (False,)
+
+
+def projection(fields):
+    """Return JSON object hook keeping only given fields of records.
+
+    Error responses are kept intact.
+    """
+    fields = tuple(fields)
+
+    def hook(value):
+        """Project decoded object."""
+        if 'errors' in value:
+            return value
+        return {key: value[key] for key in fields if key in value}
+
+    return hook
+
+
+class UrllibTransport(object):
+
+    """Transport performing HTTP requests using urllib."""
+
+    @staticmethod
+    def request(method, url, path, args):
+        """Perform HTTP request, returning Response."""
+        phases = {}
+        started = default_timer()
+        if method == 'POST':
+            handle = urlopen(
+                '{0}{1}'.format(url, path),
+                urlencode(args).encode('utf-8')
+            )
+        else:
+            handle = urlopen('{0}{1}?{2}'.format(
+                url,
+                path,
+                urlencode(args)
+            ))
+        # Covers name resolution, connecting and waiting for headers
+        phases['request'] = default_timer() - started
+        downloading = default_timer()
+        body = handle.read()
+        phases['download'] = default_timer() - downloading
+        return Response(
+            handle.getcode(), body.decode('utf-8'), len(body), phases
+        )
+
+
+class CassetteTransport(object):
+
+    """Base class for transports using cassette directory."""
+
+    def __init__(self, directory, fields=None):
+        """Create transport storing cassettes in a directory.
+
+        With fields only these fields of records are stored.
+        """
+        self.directory = directory
+        self.fields = fields
+
+    def get_key(self, method, path, args):
+        """Return cassette data identifying the request.
+
+        Responses with only some fields of records are stored separately
+        from the complete ones.
+        """
+        key = {
+            'method': method,
+            'path': path,
+            'args': {
+                key: '{0}'.format(value)
+                for key, value in args.items() if key not in CREDENTIALS
+            },
+        }
+        if self.fields is not None and path.endswith(RECORD_PATHS):
+            key['fields'] = sorted(self.fields)
+        return key
+
+    def get_filename(self, key):
+        """Return cassette file name for a request."""
+        digest = hashlib.sha1(
+            json.dumps(key, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(
+            self.directory,
+            '{0}-{1}-{2}.json'.format(
+                key['method'], key['path'].replace('/', '_'), digest[:16]
+            )
+        )
+
+
+class RecordingTransport(CassetteTransport):
+
+    """Transport recording responses into cassette directory."""
+
+    def __init__(self, directory, transport=None, fields=None):
+        """Create transport recording responses of other transport.
+
+        With fields only these fields of records are recorded.
+        """
+        super(RecordingTransport, self).__init__(directory, fields)
+        if transport is None:
+            transport = UrllibTransport()
+        self.transport = transport
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def request(self, method, url, path, args):
+        """Perform request and record the response."""
+        response = self.transport.request(method, url, path, args)
+        cassette = self.get_key(method, path, args)
+        filename = self.get_filename(cassette)
+        cassette['status'] = response.status
+        cassette['body'] = response.body
+        if self.fields is not None and path.endswith(RECORD_PATHS):
+            try:
+                cassette['body'] = json.dumps(json.loads(
+                    response.body, object_hook=projection(self.fields)
+                ))
+            except ValueError:
+                pass
+        # Write atomically, same request might be recorded concurrently
+        handle, temp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, 'w') as output:
+            json.dump(cassette, output, separators=(',', ':'))
+        os.replace(temp, filename)
+        return response
+
+
+class ReplayTransport(CassetteTransport):
+
+    """Transport replaying responses from cassette directory."""
+
+    def __init__(self, directory, fields=None):
+        """Create transport replaying responses from a directory.
+
+        With fields responses recorded with same fields are replayed.
+        """
+        super(ReplayTransport, self).__init__(directory, fields)
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def request(self, method, url, path, args):
+        """Return recorded response."""
+        filename = self.get_filename(self.get_key(method, path, args))
+        with self.lock:
+            if filename in self.cache:
+                return self.cache[filename]
+        started = default_timer()
+        try:
+            with open(filename) as handle:
+                cassette = json.load(handle)
+        except IOError:
+            raise OdorikException(
+                'No recorded response for {0} {1}'.format(method, path)
+            )
+        response = Response(
+            cassette['status'],
+            cassette['body'],
+            len(cassette['body'].encode('utf-8')),
+            {'replay': default_timer() - started},
+        )
+        with self.lock:
+            self.cache[filename] = response
+        return response
+
+
+class SharedTransport(object):
+
+    """Transport sharing responses of identical GET requests.
+
+    Concurrent identical requests wait for the first one to complete, so
+    every response is fetched only once during lifetime of the transport.
+    """
+
+    def __init__(self, transport=None):
+        """Create transport sharing responses of other transport."""
+        if transport is None:
+            transport = UrllibTransport()
+        self.transport = transport
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def request(self, method, url, path, args):
+        """Perform request or return already fetched response."""
+        if method != 'GET':
+            return self.transport.request(method, url, path, args)
+        key = json.dumps([url, path, args], sort_keys=True, default=str)
+        with self.lock:
+            pending = self.responses.get(key)
+            if pending is None:
+                pending = self.responses[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if owner:
+            try:
+                pending.set_result(
+                    self.transport.request(method, url, path, args)
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                pending.set_exception(error)
+            return pending.result()
+        return pending.result()._replace(shared=True)
+
+
 class Odorik(object):
 
     """Odorik API object."""
 
-    def __init__(self, user='', password='', url=API_URL, config=None):
+    def __init__(self, user='', password='', url=API_URL, config=None,
+                 transport=None):
         """Create the object, storing user and API password."""
         if config is not None:
             self.user = config.get(config.section, 'user')
@@ -55,6 +293,28 @@ class Odorik(object):
             self.user = user
             self.password = password
             self.url = url
+        if transport is None:
+            transport = UrllibTransport()
+        self.transport = transport
+        self.hooks = []
+
+    def add_hook(self, hook):
+        """Register request observer.
+
+        The hook is called with timing event dictionary after every request.
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Unregister request observer."""
+        self.hooks.remove(hook)
+
+    def _notify(self, event):
+        """Pass event to all registered hooks, if there is any."""
+        if event is None:
+            return
+        for hook in self.hooks:
+            hook(event)
 
     def _fill_args(self, args):
         """Fill in args."""
@@ -71,27 +331,73 @@ class Odorik(object):
         if response.startswith('error '):
             raise OdorikException(response)
 
-    def post(self, path, args=None):
-        """Perform GET request on the API."""
+    def _request(self, method, path, args):
+        """Perform HTTP request on the API using configured transport.
+
+        Returns response text and timing event, which is not yet passed to
+        the hooks so that caller can add further phases. There is no event
+        for response shared with other request, which has reported it.
+        """
         args = self._fill_args(args)
-        url = '{0}{1}'.format(self.url, path)
-        request = urlopen(url, urlencode(args).encode('utf-8'))
-        return request.read().decode('utf-8')
+        event = {
+            'method': method,
+            'path': path,
+            'args': {
+                key: value for key, value in args.items() if key != 'password'
+            },
+            'start': time.time(),
+            'status': None,
+            'bytes': 0,
+            'phases': {},
+            'error': None,
+        }
+        started = default_timer()
+        try:
+            response = self.transport.request(method, self.url, path, args)
+        except Exception as error:
+            if isinstance(error, HTTPError):
+                event['status'] = error.code
+            event['error'] = '{0}'.format(error)
+            event['duration'] = default_timer() - started
+            self._notify(event)
+            raise
+        if response.shared:
+            return response.body, None
+        event['status'] = response.status
+        event['bytes'] = response.size
+        event['phases'].update(response.phases)
+        event['duration'] = default_timer() - started
+        return response.body, event
+
+    def post(self, path, args=None):
+        """Perform POST request on the API."""
+        response, event = self._request('POST', path, args)
+        self._notify(event)
+        return response
 
     def get(self, path, args=None):
         """Perform GET request on the API."""
-        args = self._fill_args(args)
-        url = '{0}{1}?{2}'.format(
-            self.url,
-            path,
-            urlencode(args)
-        )
-        request = urlopen(url)
-        return request.read().decode('utf-8')
+        response, event = self._request('GET', path, args)
+        self._notify(event)
+        return response
+
+    def get_json(self, path, args=None, fields=None):
+        """JSON parser on top of get.
 
-    def get_json(self, path, args=None):
-        """JSON parser on top of get."""
-        result = json.loads(self.get(path, args))
+        With fields only these fields of decoded objects are kept.
+        """
+        response, event = self._request('GET', path, args)
+        decoding = default_timer()
+        object_hook = None
+        if fields is not None:
+            object_hook = projection(fields)
+        try:
+            result = json.loads(response, object_hook=object_hook)
+        finally:
+            if event is not None:
+                event['phases']['decode'] = default_timer() - decoding
+                event['duration'] += event['phases']['decode']
+                self._notify(event)
         if isinstance(result, dict) and 'errors' in result:
             raise OdorikException(result['errors'])
         return result
@@ -102,7 +408,7 @@ class Odorik(object):
         self._check_response(response)
         return float(response)
 
-    def mobile_data(self, from_date, to_date, number=None):
+    def mobile_data(self, from_date, to_date, number=None, fields=None):
         """Get data usage in given period."""
         if number is None:
             url = 'sim_cards/mobile_data.json'
@@ -110,7 +416,8 @@ class Odorik(object):
             url = 'sim_cards/{0}/mobile_data.json'.format(number)
         return self.get_json(
             url,
-            {'from': from_date.isoformat(), 'to': to_date.isoformat()}
+            {'from': from_date.isoformat(), 'to': to_date.isoformat()},
+            fields
         )
 
     def send_sms(self, recipient, message, sender='5517'):
@@ -122,7 +429,8 @@ class Odorik(object):
         self._check_response(response)
         return response
 
-    def calls(self, from_date, to_date, line=None, status=None, direction=None):
+    def calls(self, from_date, to_date, line=None, status=None, direction=None,
+              fields=None):
         """Return list of calls."""
         args = {
             'from': from_date.isoformat(),
@@ -134,9 +442,9 @@ class Odorik(object):
             args['status'] = status
         if direction is not None:
             args['direction'] = direction
-        return self.get_json('calls.json', args)
+        return self.get_json('calls.json', args, fields)
 
-    def sms(self, from_date, to_date, line=None):
+    def sms(self, from_date, to_date, line=None, fields=None):
         """Return list of sms."""
         args = {
             'from': from_date.isoformat(),
@@ -144,7 +452,7 @@ class Odorik(object):
         }
         if line is not None:
             args['line'] = line
-        return self.get_json('sms.json', args)
+        return self.get_json('sms.json', args, fields)
 
     def callback(self, caller, recipient, line=None):
         """Initiate callback."""
@@ -161,3 +469,130 @@ class Odorik(object):
     def lines(self):
         """List lines for an account."""
         return self.get_json('lines.json')
+
+    @staticmethod
+    def _iter_windows(fetch, start, end, window):
+        """Iterate over records fetched window by window.
+
+        Next window is fetched in background while the current one is being
+        consumed, records are yielded in chronological order.
+        """
+        if window <= timedelta(0):
+            raise ValueError('Window has to be positive')
+
+        def windows():
+            """Generate window boundaries."""
+            current = start
+            while current < end:
+                yield current, min(current + window, end)
+                current += window
+
+        def submit(executor, bounds):
+            """Start fetching window in background."""
+            if bounds is None:
+                return None
+            return executor.submit(fetch, *bounds)
+
+        # Records on window boundary can be returned in both windows
+        seen = set()
+        boundaries = windows()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = submit(executor, next(boundaries, None))
+            while pending is not None:
+                following = submit(executor, next(boundaries, None))
+                records = pending.result()
+                for record in records:
+                    if record['id'] not in seen:
+                        yield record
+                seen = set(record['id'] for record in records)
+                pending = following
+
+    def _fetch_sorted(self, method, *args, **kwargs):
+        """Return callable fetching window of records sorted by date."""
+        def fetch(from_date, to_date):
+            """Fetch records in window."""
+            return sorted(
+                method(from_date, to_date, *args, **kwargs),
+                key=lambda record: record['date']
+            )
+        return fetch
+
+    @staticmethod
+    def _iter_fields(fields):
+        """Return fields to decode, including ones needed for iterating."""
+        if fields is None:
+            return None
+        fields = list(fields)
+        return fields + [key for key in ITER_FIELDS if key not in fields]
+
+    def iter_calls(self, start, end, window=DEFAULT_WINDOW, line=None,
+                   status=None, direction=None, fields=None):
+        """Iterate over calls in given period, window by window."""
+        return self._iter_windows(
+            self._fetch_sorted(
+                self.calls, line, status=status, direction=direction,
+                fields=self._iter_fields(fields)
+            ),
+            start, end, window
+        )
+
+    def iter_sms(self, start, end, window=DEFAULT_WINDOW, line=None,
+                 fields=None):
+        """Iterate over sms in given period, window by window."""
+        return self._iter_windows(
+            self._fetch_sorted(
+                self.sms, line, fields=self._iter_fields(fields)
+            ),
+            start, end, window
+        )
+
+    def iter_mobile_data(self, start, end, window=DEFAULT_WINDOW,
+                         number=None, fields=None):
+        """Iterate over data usage in given period, window by window."""
+        return self._iter_windows(
+            self._fetch_sorted(
+                self.mobile_data, number, fields=self._iter_fields(fields)
+            ),
+            start, end, window
+        )
+
+    def iter_balance(self, start, end, window=DEFAULT_WINDOW, step=None):
+        """Iterate over balance history reconstructed from records.
+
+        Calls and SMS messages are merged by date and their balance_after
+        is used, so no additional requests are needed. With step only last
+        balance in every step is returned.
+        """
+        fields = ('balance_after',)
+        records = heapq.merge(
+            self.iter_calls(start, end, window, fields=fields),
+            self.iter_sms(start, end, window, fields=fields),
+            key=lambda record: record['date']
+        )
+        points = (
+            {'date': record['date'], 'balance': record['balance_after']}
+            for record in records
+            if record.get('balance_after') is not None
+        )
+        if step is None:
+            return points
+        return self._downsample(points, step)
+
+    @staticmethod
+    def _downsample(points, step):
+        """Return last point of every step, aligned to UTC epoch."""
+        seconds = step.total_seconds()
+        if seconds <= 0:
+            raise ValueError('Step has to be positive')
+        last = None
+        current = None
+        for point in points:
+            bucket = calendar.timegm(
+                time.strptime(point['date'], DATE_FORMAT)
+            ) // seconds
+            if last is not None and bucket != current:
+                yield last
+            last = point
+            current = bucket
+        if last is not None:
+            yield last
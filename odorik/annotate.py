@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Enrichment of records with line information and configured aliases."""
+from __future__ import unicode_literals
+
+# Fields holding phone numbers which get alias added
+NUMBER_FIELDS = ('source_number', 'destination_number', 'phone_number')
+
+
+def normalize_number(value):
+    """Normalize phone number for lookups."""
+    value = '{0}'.format(value).strip()
+    if value.startswith('+'):
+        return '00' + value[1:]
+    return value
+
+
+class Annotator(object):
+
+    """Join records against lines and configured aliases.
+
+    All lookup tables are built once, annotating a record is then just
+    a dictionary lookup per field.
+    """
+
+    def __init__(self, lines, config=None):
+        """Build lookup tables from lines and configuration."""
+        self.lines = {}
+        self.line_aliases = {}
+        self.number_aliases = {}
+        for line in lines:
+            self.lines['{0}'.format(line['id'])] = (
+                line['name'], line['public_number']
+            )
+            if line['name'] and line['public_number']:
+                self.number_aliases[
+                    normalize_number(line['public_number'])
+                ] = line['name']
+        if config is not None:
+            for alias, value in config.items('lines'):
+                self.line_aliases[value.strip()] = alias
+            # Configured aliases take precedence over line names
+            for alias, value in config.items('numbers'):
+                self.number_aliases[normalize_number(value)] = alias
+
+    def annotate(self, record):
+        """Add line name and number aliases to record in place."""
+        if 'line' in record:
+            line = '{0}'.format(record['line'])
+            name, number = self.lines.get(line, (None, None))
+            record['line_name'] = name
+            record['line_number'] = number
+            record['line_alias'] = self.line_aliases.get(line)
+        for field in NUMBER_FIELDS:
+            if field in record:
+                record[field[:-6] + 'alias'] = self.number_aliases.get(
+                    normalize_number(record[field])
+                )
+        return record
@@ -0,0 +1,899 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Base classes and helpers of command line commands."""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import copy
+import json
+import csv
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from datetime import datetime, timedelta
+import dateutil.parser
+from dateutil.tz import tzlocal
+
+import odorik
+from odorik.annotate import NUMBER_FIELDS, Annotator
+from odorik.config import NoOptionError
+from odorik.filters import FilterError, compile_filter
+from odorik.materialize import (
+    distinct_counts, empty_distinct, empty_sketches, fold_call_sketches,
+    fold_calls, fold_data, fold_distinct, fold_sms, sketch_percentiles,
+)
+from odorik.sorting import DEFAULT_BUFFER, parse_sort, sort_records
+from odorik.sketches import parse_percentiles
+
+COMMANDS = {}
+
+# Already seen records are requested again to catch delayed ones
+FOLLOW_OVERLAP = timedelta(minutes=5)
+
+SORT_ORDER = [
+    'id',
+    'public_number',
+    'count',
+    'count_in',
+    'count_out',
+    'sms_count',
+    'sms_count_in',
+    'sms_count_out',
+    'call_count',
+    'call_count_in',
+    'call_count_out',
+    'call_length',
+    'call_length_in',
+    'call_length_out',
+    'bytes_down',
+    'bytes_up',
+    'bytes_total',
+    'data_price',
+    'call_price',
+    'sms_price',
+    'length',
+    'length_in',
+    'length_out',
+    'ringing_length',
+    'price',
+]
+
+# Fields of calls, SMS and data usage summaries
+CALL_SUMMARY_FIELDS = (
+    'price', 'length', 'length_in', 'length_out', 'length_redirected',
+    'count', 'count_in', 'count_out',
+)
+SMS_SUMMARY_FIELDS = ('price', 'count', 'count_in', 'count_out')
+DATA_SUMMARY_FIELDS = ('bytes_total', 'bytes_down', 'bytes_up', 'price')
+
+
+FORMATS = ('text', 'csv', 'json', 'html')
+
+# Number of records buffered for every output sink
+SINK_BUFFER = 1000
+
+
+def register_command(command):
+    """Decorator to register command in command line interface."""
+    COMMANDS[command.name] = command
+    return command
+
+
+def get_parser(parser_class=ArgumentParser):
+    """Create argument parser."""
+    parser = parser_class(
+        description='Odorik <{0}> command line utility.'.format(odorik.URL),
+        epilog='This utility is developed at <{0}>.'.format(odorik.DEVEL_URL),
+    )
+    parser.add_argument(
+        '--format',
+        default='text',
+        choices=FORMATS,
+        help='Output format to use'
+    )
+    parser.add_argument(
+        '--output',
+        action='append',
+        type=output_sink,
+        metavar='FORMAT:PATH',
+        help='Write output in format to a file (- for standard output) '
+        'instead of standard output, can be repeated',
+    )
+    parser.add_argument(
+        '--version',
+        action='version',
+        version='odorik {0}'.format(odorik.__version__)
+    )
+    parser.add_argument(
+        '--config',
+        help='Path to configuration file',
+    )
+    parser.add_argument(
+        '--config-section',
+        default='odorik',
+        help='Configuration section to use'
+    )
+    parser.add_argument(
+        '--user',
+        help='API username',
+    )
+    parser.add_argument(
+        '--password',
+        help='API password',
+    )
+    parser.add_argument(
+        '--url',
+        help='API URL',
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print API request timings to stderr',
+    )
+    parser.add_argument(
+        '--timings-file',
+        metavar='PATH',
+        help='Write API request timings as trace events to a file',
+    )
+    accounts = parser.add_mutually_exclusive_group()
+    accounts.add_argument(
+        '--sections',
+        type=sections_list,
+        metavar='SECTION,...',
+        help='Comma separated configuration sections to use',
+    )
+    accounts.add_argument(
+        '--all-sections',
+        action='store_true',
+        help='Use all configuration sections with API user',
+    )
+    parser.add_argument(
+        '--max-workers',
+        type=positive_int,
+        default=4,
+        help='Number of accounts processed concurrently',
+    )
+    cassettes = parser.add_mutually_exclusive_group()
+    cassettes.add_argument(
+        '--record',
+        metavar='DIR',
+        help='Record API responses to a directory',
+    )
+    cassettes.add_argument(
+        '--replay',
+        metavar='DIR',
+        help='Replay API responses from a directory instead of network',
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='PATH',
+        help='Profile CPU and memory usage and write reports to a file',
+    )
+    subparser = parser.add_subparsers(dest="cmd")
+
+    for command in sorted(COMMANDS):
+        COMMANDS[command].add_parser(subparser)
+
+    return parser
+
+
+class CommandError(Exception):
+
+    """Generic error from command line."""
+
+
+def sort_key(value):
+    """Key getter for sorting."""
+    try:
+        return '{0:02d}'.format(SORT_ORDER.index(value))
+    except ValueError:
+        return value
+
+
+def sorted_items(value):
+    """Sorted items iterator."""
+    for key in sorted(value.keys(), key=sort_key):
+        yield key, value[key]
+
+
+def where_filter(value):
+    """Validate and compile --where expression."""
+    try:
+        return compile_filter(value)
+    except FilterError as error:
+        raise ArgumentTypeError('{0}'.format(error))
+
+
+def percentiles_list(value):
+    """Validate --percentiles list."""
+    try:
+        return parse_percentiles(value)
+    except ValueError as error:
+        raise ArgumentTypeError('{0}'.format(error))
+
+
+def output_sink(value):
+    """Validate --output FORMAT:PATH."""
+    output_format, separator, path = value.partition(':')
+    if not separator or not path or output_format not in FORMATS:
+        raise ArgumentTypeError(
+            'Please specify output as FORMAT:PATH, format being one of {0}'
+            .format(', '.join(FORMATS))
+        )
+    return output_format, path
+
+
+def positive_int(value):
+    """Validate positive integer."""
+    try:
+        result = int(value)
+    except ValueError:
+        result = 0
+    if result <= 0:
+        raise ArgumentTypeError('Please specify positive number')
+    return result
+
+
+def positive_float(value):
+    """Validate positive float."""
+    try:
+        result = float(value)
+    except ValueError:
+        result = 0
+    if not result > 0 or result == float('inf'):
+        raise ArgumentTypeError('Please specify positive number')
+    return result
+
+
+def fields_list(value):
+    """Validate --fields list."""
+    result = []
+    for field in value.split(','):
+        field = field.strip()
+        if not field:
+            raise ArgumentTypeError('Please specify fields as FIELD[,FIELD]')
+        if field not in result:
+            result.append(field)
+    return result
+
+
+def sections_list(value):
+    """Validate --sections list."""
+    result = [section.strip() for section in value.split(',')]
+    if not all(result):
+        raise ArgumentTypeError(
+            'Please specify sections as SECTION[,SECTION]'
+        )
+    return result
+
+
+def decode_fields(args):
+    """Return fields to decode for listing records with --fields.
+
+    These are the listed fields and any fields needed for filtering,
+    sorting, annotating or following records. Resolving redirects needs
+    whole records, so nothing is projected then.
+    """
+    fields = getattr(args, 'fields', None)
+    following = getattr(args, 'follow', False)
+    if fields is None or not (args.list or following):
+        return None
+    if getattr(args, 'resolve_redirects', False):
+        return None
+    needed = []
+    if args.where is not None:
+        needed.extend(sorted(args.where.fields))
+    if args.sort:
+        needed.extend(field for field, reverse in args.sort)
+    if args.annotate:
+        needed.append('line')
+        needed.extend(NUMBER_FIELDS)
+    if following:
+        needed.extend(odorik.ITER_FIELDS)
+    result = list(fields)
+    for field in needed:
+        if field not in result:
+            result.append(field)
+    return result
+
+
+def duration(value):
+    """Parse duration such as 30m, 12h, 1d or 2w."""
+    units = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+    try:
+        result = timedelta(**{units[value[-1]]: int(value[:-1])})
+    except (KeyError, ValueError, IndexError):
+        raise ArgumentTypeError(
+            'Please specify duration as number with unit m, h, d or w'
+        )
+    if result <= timedelta(0):
+        raise ArgumentTypeError('Duration has to be positive')
+    return result
+
+
+def key_value(value):
+    """Validate key=value parameter."""
+    if '=' not in value:
+        raise ValueError('Please specify --param as key=value')
+    return value
+
+
+class Command(object):
+
+    """Basic command object."""
+
+    name = ''
+    description = ''
+
+    def __init__(self, args, config, stdout=None, client=None):
+        """Construct Command object."""
+        self.args = args
+        self.config = config
+        if stdout is None:
+            self.stdout = sys.stdout
+        else:
+            self.stdout = stdout
+        if client is None:
+            self.odorik = odorik.Odorik(config=config)
+        else:
+            self.odorik = client
+        # List to store printed values instead of rendering them
+        self.capture = None
+        self.annotator = None
+        # Current time fixed for all jobs scheduled at once
+        self.now = None
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        return subparser.add_parser(
+            cls.name, description=cls.description
+        )
+
+    @staticmethod
+    def add_list_option(parser):
+        """Add argparse argument --list."""
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List all records (instead of printing summary)'
+        )
+
+    @staticmethod
+    def add_line_option(parser):
+        """Add argparse argument --line."""
+        parser.add_argument(
+            '--line',
+            help='Line to use for listing'
+        )
+
+    @staticmethod
+    def add_where_option(parser):
+        """Add argparse argument --where."""
+        parser.add_argument(
+            '--where',
+            type=where_filter,
+            metavar='EXPRESSION',
+            help='Filter records by expression, for example "price > 1"'
+        )
+
+    def filter_records(self, records):
+        """Filter records by --where expression."""
+        if self.args.where is None:
+            return records
+        return list(filter(self.args.where, records))
+
+    @staticmethod
+    def add_fields_option(parser):
+        """Add argparse argument --fields."""
+        parser.add_argument(
+            '--fields',
+            type=fields_list,
+            metavar='FIELD[,FIELD]',
+            help='Decode and list only given fields, for example id,date,price'
+        )
+
+    def print_records(self, records):
+        """Print listed records, limited to --fields."""
+        fields = self.args.fields
+        if fields is None:
+            self.print(records)
+            return
+        if decode_fields(self.args) != fields:
+            # Drop fields decoded only for processing
+            records = (
+                {key: record[key] for key in fields if key in record}
+                for record in records
+            )
+        self.print(records, fields)
+
+    @staticmethod
+    def add_annotate_option(parser):
+        """Add argparse argument --annotate."""
+        parser.add_argument(
+            '--annotate',
+            action='store_true',
+            help='Add line names and number aliases to records'
+        )
+
+    def annotate_records(self, records):
+        """Annotate records with line names and aliases by --annotate."""
+        if not self.args.annotate:
+            return records
+        if self.annotator is None:
+            self.annotator = Annotator(self.odorik.lines(), self.config)
+        annotate = self.annotator.annotate
+        return [annotate(record) for record in records]
+
+    @staticmethod
+    def add_percentiles_option(parser):
+        """Add argparse argument --percentiles."""
+        parser.add_argument(
+            '--percentiles',
+            type=percentiles_list,
+            metavar='PCT[,PCT]',
+            help='Show percentiles of call length and ringing length, '
+            'for example 50,95,99'
+        )
+
+    @staticmethod
+    def call_percentiles(calls, percentiles, prefix=''):
+        """Calculate percentiles of calls using quantile sketches."""
+        sketches = empty_sketches()
+        fold_call_sketches(sketches, calls)
+        return sketch_percentiles(sketches, percentiles, prefix)
+
+    @staticmethod
+    def add_distinct_option(parser):
+        """Add argparse argument --distinct."""
+        parser.add_argument(
+            '--distinct',
+            action='store_true',
+            help='Show number of distinct destination and source numbers'
+        )
+
+    @staticmethod
+    def count_distinct(records, prefix=''):
+        """Count distinct numbers using distinct count sketches."""
+        sketches = empty_distinct((prefix,))
+        fold_distinct(sketches, records, prefix)
+        return distinct_counts(sketches)
+
+    @staticmethod
+    def add_sort_option(parser):
+        """Add argparse arguments for sorting and limiting records."""
+        parser.add_argument(
+            '--sort',
+            type=parse_sort,
+            metavar='FIELD[,FIELD]',
+            help='Sort listed records, prefix field with - for descending'
+        )
+        parser.add_argument(
+            '--limit',
+            type=positive_int,
+            help='Limit number of listed records'
+        )
+        parser.add_argument(
+            '--sort-buffer',
+            type=positive_int,
+            default=DEFAULT_BUFFER,
+            help='Number of records to sort in memory before using disk'
+        )
+
+    def sort_records(self, records):
+        """Sort and limit records by --sort and --limit."""
+        return sort_records(
+            records, self.args.sort, self.args.limit, self.args.sort_buffer
+        )
+
+    @staticmethod
+    def add_follow_option(parser):
+        """Add argparse arguments for following new records."""
+        parser.add_argument(
+            '--follow',
+            action='store_true',
+            help='Keep printing new records as they appear'
+        )
+        parser.add_argument(
+            '--interval',
+            type=positive_float,
+            default=10,
+            help='Minimal polling interval in seconds for --follow'
+        )
+        parser.add_argument(
+            '--max-interval',
+            type=positive_float,
+            default=300,
+            help='Maximal polling interval in seconds for --follow'
+        )
+
+    def follow(self, fetch):
+        """Poll for new records and print them.
+
+        Only short window since the previous poll is requested and the
+        polling interval is doubled while there are no new records.
+        """
+        if self.args.start_date:
+            cursor = self.args.start_date
+            if cursor.tzinfo is not None:
+                cursor = cursor.astimezone(tzlocal()).replace(tzinfo=None)
+        else:
+            cursor = datetime.now().replace(microsecond=0)
+        # Records already printed within overlap window and time of the
+        # poll returning them, which is never earlier than their date
+        seen = {}
+        if self.args.max_interval < self.args.interval:
+            raise CommandError(
+                'Maximal interval can not be shorter than interval!'
+            )
+        interval = self.args.interval
+        try:
+            while True:
+                now = datetime.now().replace(microsecond=0)
+                records = self.filter_records(self.annotate_records(
+                    fetch(cursor - FOLLOW_OVERLAP, now)
+                ))
+                records = [
+                    record for record in sorted(
+                        records, key=lambda record: record['date']
+                    )
+                    if record['id'] not in seen
+                ]
+                cursor = max(cursor, now)
+                for record in records:
+                    seen[record['id']] = now
+                seen = {
+                    key: value for key, value in seen.items()
+                    if value >= cursor - FOLLOW_OVERLAP
+                }
+                if records:
+                    self.print_records(records)
+                    self.stdout.flush()
+                    interval = self.args.interval
+                else:
+                    interval = min(interval * 2, self.args.max_interval)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            return
+
+    def resolve(self, kind, value):
+        """Resolve line/phone number from configuration."""
+        if value is None:
+            return None
+        if value.isdigit():
+            return value
+        try:
+            return self.config.get(kind, value)
+        except NoOptionError:
+            raise CommandError(
+                'Invalid value for {0}: {1}'.format(kind, value)
+            )
+
+    @staticmethod
+    def calls_summary(calls):
+        """Wrapper for getting calls summary."""
+        result = dict.fromkeys(CALL_SUMMARY_FIELDS, 0)
+        fold_calls(result, calls, '')
+        return result
+
+    @staticmethod
+    def sms_summary(messages):
+        """Wrapper for getting sms summary."""
+        result = dict.fromkeys(SMS_SUMMARY_FIELDS, 0)
+        fold_sms(result, messages, '')
+        return result
+
+    @staticmethod
+    def data_summary(data_usage):
+        """Wrapper for getting data summary."""
+        result = dict.fromkeys(DATA_SUMMARY_FIELDS, 0)
+        fold_data(result, data_usage, '')
+        return result
+
+    def println(self, line):
+        """Print single line to output."""
+        print(line, file=self.stdout)
+
+    def print_json(self, value):
+        """JSON print."""
+        if isinstance(value, (list, dict)):
+            json.dump(value, self.stdout, indent=2)
+            return
+        # Stream records from iterator, formatted same as list
+        self.stdout.write('[')
+        separator = '\n  '
+        for item in value:
+            self.stdout.write(separator)
+            self.stdout.write(
+                json.dumps(item, indent=2).replace('\n', '\n  ')
+            )
+            separator = ',\n  '
+        self.stdout.write('\n]')
+
+    @staticmethod
+    def format_value(value):
+        """Format value for rendering."""
+        if isinstance(value, float):
+            return '{0:.2f}'.format(value)
+        elif isinstance(value, int):
+            return '{0}'.format(value)
+        elif value is None:
+            return ''
+        return value
+
+    @classmethod
+    def format_csv_value(cls, value):
+        """Format value for rendering in CSV."""
+        value = cls.format_value(value)
+        if sys.version_info < (3, 0):
+            return value.encode('utf-8')
+        return value
+
+    def print_csv(self, value, header):
+        """CSV print."""
+        if header is not None:
+            writer = csv.DictWriter(self.stdout, header)
+            writer.writeheader()
+            for row in value:
+                writer.writerow({
+                    key: self.format_csv_value(row.get(key))
+                    for key in header
+                })
+        elif isinstance(list(value.items())[0][1], (dict, list)):
+            for key, data in sorted_items(value):
+                self.println(self.format_csv_value(key))
+                self.print_csv(data, self.get_header(data))
+                self.println(self.format_csv_value(''))
+        else:
+            writer = csv.writer(self.stdout)
+            for key, data in sorted_items(value):
+                writer.writerow((key, self.format_csv_value(data)))
+
+    def print_html(self, value, header):
+        """HTML print."""
+        if header is not None:
+            self.println('<table>')
+            self.println('  <thead>')
+            self.println('    <tr>')
+            for key in header:
+                self.println('      <th>{0}</th>'.format(key))
+            self.println('    </tr>')
+            self.println('  </thead>')
+            self.println('  <tbody>')
+
+            for item in value:
+                self.println('    <tr>')
+                for key in header:
+                    self.println('      <td>{0}</td>'.format(
+                        self.format_value(item.get(key))
+                    ))
+                self.println('    </tr>')
+            self.println('  </tbody>')
+            self.println('</table>')
+        elif isinstance(list(value.items())[0][1], (dict, list)):
+            for key, data in sorted_items(value):
+                self.println('<h1>{0}</h1>'.format(key))
+                self.print_html(data, self.get_header(data))
+        else:
+            self.println('<table>')
+            for key, data in sorted_items(value):
+                self.println('  <tr>')
+                self.println('    <th>{0}</th><td>{1}</td>'.format(
+                    key, self.format_value(data)
+                ))
+                self.println('  </tr>')
+            self.println('</table>')
+
+    def print_text(self, value, header):
+        """Text print."""
+        if header is not None:
+            for item in value:
+                for key in header:
+                    self.println('{0}: {1}'.format(
+                        key, self.format_value(item.get(key))
+                    ))
+                self.println('')
+        elif isinstance(list(value.items())[0][1], (dict, list)):
+            for key, data in sorted_items(value):
+                self.println(key)
+                self.print_text(data, self.get_header(data))
+                self.println('')
+        else:
+            for key, data in sorted_items(value):
+                self.println('{0}: {1}'.format(
+                    key, self.format_value(data)
+                ))
+
+    @staticmethod
+    def get_header(value):
+        """Return header for list of records."""
+        if isinstance(value, list):
+            if len(value) == 0:
+                return []
+            return sorted(value[0].keys(), key=sort_key)
+        return None
+
+    def get_sink(self, output_format, stream):
+        """Return copy of command rendering to stream in format."""
+        sink = copy.copy(self)
+        sink.stdout = stream
+        sink.args = Namespace(**vars(self.args))
+        sink.args.format = output_format
+        sink.args.output = None
+        return sink
+
+    def print_sinks(self, value, header):
+        """Print value to all --output sinks.
+
+        Records from iterator are passed to all sinks at once, every sink
+        rendering them in own thread.
+        """
+        handles = []
+        try:
+            sinks = []
+            for output_format, path in self.args.output:
+                if path == '-':
+                    stream = self.stdout
+                else:
+                    stream = open(path, 'w')
+                    handles.append(stream)
+                sinks.append(self.get_sink(output_format, stream))
+            if isinstance(value, (list, dict)):
+                for sink in sinks:
+                    sink.print(value, header)
+                return
+            end = object()
+
+            def render(sink, queue):
+                """Render records from queue."""
+                records = iter(queue.get, end)
+                try:
+                    sink.print(records, header)
+                finally:
+                    # Keep consuming so that producer is never blocked
+                    for dummy in records:
+                        continue
+
+            queues = [Queue(SINK_BUFFER) for sink in sinks]
+            with ThreadPoolExecutor(max_workers=len(sinks)) as executor:
+                futures = [
+                    executor.submit(render, sink, queue)
+                    for sink, queue in zip(sinks, queues)
+                ]
+                try:
+                    for record in value:
+                        for queue in queues:
+                            queue.put(record)
+                finally:
+                    for queue in queues:
+                        queue.put(end)
+                for future in futures:
+                    future.result()
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def print(self, value, header=None):
+        """Print value, records can have explicit header."""
+        if self.capture is not None:
+            if not isinstance(value, (list, dict)):
+                # Records iterator can not be rendered later
+                value = list(value)
+            self.capture.append(value)
+            return
+        if getattr(self.args, 'output', None):
+            self.print_sinks(value, header)
+            return
+        if isinstance(value, list):
+            if len(value) == 0:
+                return
+            if header is None:
+                header = sorted(value[0].keys(), key=sort_key)
+        elif not isinstance(value, dict):
+            # Records iterator, peek for header
+            value = iter(value)
+            try:
+                first = next(value)
+            except StopIteration:
+                return
+            if header is None:
+                header = sorted(first.keys(), key=sort_key)
+            value = itertools.chain((first,), value)
+
+        if self.args.format == 'json':
+            self.print_json(value)
+        elif self.args.format == 'csv':
+            self.print_csv(value, header)
+        elif self.args.format == 'html':
+            self.print_html(value, header)
+        else:
+            self.print_text(value, header)
+
+    def run(self):
+        """Main execution of the command."""
+        raise NotImplementedError
+
+
+class IntervalCommand(Command):
+
+    """Helper class to handle date intervals."""
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(IntervalCommand, cls).add_parser(subparser)
+        parser.add_argument(
+            '--this-month',
+            action='store_true',
+            help='Show data for this month [default]'
+        )
+        parser.add_argument(
+            '--last-month',
+            action='store_true',
+            help='Show data for last month'
+        )
+        parser.add_argument(
+            '--start-date',
+            type=dateutil.parser.parse,
+            help='Starting datetime'
+        )
+        parser.add_argument(
+            '--end-date',
+            type=dateutil.parser.parse,
+            help='Ending datetime'
+        )
+        return parser
+
+    def get_interval(self):
+        """Return interval based on passed flags."""
+        now = self.now or datetime.now()
+
+        if self.args.start_date and self.args.end_date:
+            if self.args.start_date >= self.args.end_date:
+                raise CommandError(
+                    'Starting date has to be earlier than ending!'
+                )
+            return (self.args.start_date, self.args.end_date)
+        elif self.args.start_date:
+            return (self.args.start_date, now)
+        elif self.args.end_date:
+            raise CommandError('Can not set ending date without start!')
+
+        return self.month_interval(now, self.args.last_month)
+
+    @staticmethod
+    def month_interval(now, last_month=False):
+        """Return interval of month up to now or of the previous month."""
+        if last_month:
+            # Get last day of previous month
+            now = now.replace(day=1) - timedelta(days=1)
+            # Set to midnight, without microseconds to keep the interval
+            # same for repeated runs
+            now = now.replace(hour=23, minute=59, second=59, microsecond=0)
+
+        # Fallback to this month
+        return (datetime(now.year, now.month, 1), now)
+
+    def run(self):
+        """Main execution of the command."""
+        raise NotImplementedError
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command executing commands listed in a file."""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import shlex
+import sys
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import odorik
+from odorik.commands.base import (
+    COMMANDS, Command, CommandError, get_parser, register_command
+)
+
+
+class LineParser(ArgumentParser):
+
+    """Argument parser reporting errors instead of exiting."""
+
+    def exit(self, status=0, message=None):
+        """Reject options which would terminate the program."""
+        raise CommandError(message or 'Unsupported option')
+
+    def error(self, message):
+        """Raise exception for invalid arguments."""
+        raise CommandError(message)
+
+
+@register_command
+class Batch(Command):
+
+    """Execute commands in batch."""
+
+    name = 'batch'
+    description = "Executes commands listed in a file"
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Batch, cls).add_parser(subparser)
+        parser.add_argument(
+            'file',
+            nargs='?',
+            default='-',
+            help='File with commands, one per line (default is stdin)',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Number of commands to execute in parallel',
+        )
+        return parser
+
+    def read_lines(self):
+        """Read command lines from file or stdin."""
+        if self.args.file == '-':
+            return sys.stdin.readlines()
+        with open(self.args.file) as handle:
+            return handle.readlines()
+
+    def parse_line(self, parser, line):
+        """Parse single command line into arguments and output target."""
+        tokens = shlex.split(line, comments=True)
+        if not tokens:
+            return None, None
+        target = None
+        if len(tokens) > 2 and tokens[-2] == '>':
+            target = tokens[-1]
+            tokens = tokens[:-2]
+        # Inherit global options of the batch itself
+        namespace = Namespace(**vars(self.args))
+        args = parser.parse_args(tokens, namespace)
+        if args.cmd is None or args.cmd == self.name:
+            raise CommandError('Invalid command')
+        return args, target
+
+    def parse_commands(self):
+        """Parse all commands before executing any of them."""
+        if self.args.output:
+            raise CommandError(
+                'Global --output can not be used with batch, '
+                'use --output or > PATH on each line instead!'
+            )
+        parser = get_parser(LineParser)
+        result = []
+        for number, line in enumerate(self.read_lines(), 1):
+            try:
+                args, target = self.parse_line(parser, line)
+            except (CommandError, ValueError) as error:
+                raise CommandError('{0}:{1}: {2}'.format(
+                    '<stdin>' if self.args.file == '-' else self.args.file,
+                    number,
+                    error,
+                ))
+            if args is not None:
+                result.append((number, args, target))
+        return result
+
+    def execute(self, args, target, stdout):
+        """Execute single command, returning error message if any."""
+        try:
+            if target is not None:
+                with open(target, 'w') as handle:
+                    COMMANDS[args.cmd](
+                        args, self.config, handle, self.odorik
+                    ).run()
+            else:
+                COMMANDS[args.cmd](
+                    args, self.config, stdout, self.odorik
+                ).run()
+        except (CommandError, odorik.OdorikException) as error:
+            return '{0}'.format(error)
+        return None
+
+    def execute_buffered(self, item):
+        """Execute single command with output captured in memory."""
+        stdout = StringIO()
+        error = self.execute(item[1], item[2], stdout)
+        return stdout.getvalue(), error
+
+    def run(self):
+        """Main execution of the command."""
+        commands = self.parse_commands()
+        errors = []
+        if self.args.jobs > 1:
+            with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+                results = list(
+                    executor.map(self.execute_buffered, commands)
+                )
+            for item, result in zip(commands, results):
+                self.stdout.write(result[0])
+                errors.append((item[0], result[1]))
+        else:
+            for number, args, target in commands:
+                errors.append(
+                    (number, self.execute(args, target, self.stdout))
+                )
+        errors = [error for error in errors if error[1] is not None]
+        for number, error in errors:
+            print(
+                'Error on line {0}: {1}'.format(number, error),
+                file=sys.stderr
+            )
+        if errors:
+            raise CommandError(
+                '{0} of {1} commands failed'.format(
+                    len(errors), len(commands)
+                )
+            )
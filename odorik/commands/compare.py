@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command comparing summaries of two periods."""
+from __future__ import unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from odorik.commands.base import (
+    Command, CommandError, IntervalCommand, register_command
+)
+from odorik.materialize import SUMMARY_FIELDS, DailyIndex, SummaryStore
+
+
+@register_command
+class Compare(Command):
+
+    """Compare summaries of two periods."""
+
+    name = 'compare'
+    description = "Compares summary of lines in two periods"
+
+    periods = (
+        'this-month', 'last-month',
+        'this-month-last-year', 'last-month-last-year',
+    )
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Compare, cls).add_parser(subparser)
+        parser.add_argument(
+            '--period',
+            choices=cls.periods,
+            default='this-month',
+            help='Period to show [default: this-month]',
+        )
+        parser.add_argument(
+            '--against',
+            choices=cls.periods,
+            default='last-month',
+            help='Period to compare with [default: last-month]',
+        )
+        parser.add_argument(
+            '--metric',
+            action='append',
+            choices=SUMMARY_FIELDS + ('price',),
+            help='Summary field to compare, can be repeated [default: all]',
+        )
+        parser.add_argument(
+            '--cache-dir',
+            help='Directory to store daily aggregates, defaults to XDG cache'
+        )
+        return parser
+
+    def get_period(self, name):
+        """Return interval for period name."""
+        now = self.now or datetime.now()
+        if name.endswith('-last-year'):
+            if now.month == 2 and now.day == 29:
+                now = now.replace(day=28)
+            now = now.replace(year=now.year - 1)
+        # Same boundaries as --this-month and --last-month of summary
+        return IntervalCommand.month_interval(
+            now, name.startswith('last-month')
+        )
+
+    @staticmethod
+    def get_delta(current, previous):
+        """Return absolute and relative difference."""
+        delta = current - previous
+        if previous:
+            return delta, 100.0 * delta / previous
+        return delta, None
+
+    def run(self):
+        """Main execution of the command."""
+        lines = self.odorik.lines()
+        period = self.args.period
+        against = self.args.against
+        if period == against:
+            raise CommandError('Please choose two different periods!')
+        metrics = self.args.metric or SUMMARY_FIELDS + ('price',)
+        with ThreadPoolExecutor(max_workers=self.args.max_workers) as executor:
+            summaries = DailyIndex(
+                self.odorik, SummaryStore(self.args.cache_dir)
+            ).summarize_periods(
+                lines,
+                (self.get_period(period), self.get_period(against)),
+                executor
+            )
+        result = []
+        for line in lines:
+            current, previous = summaries[line['name']]
+            for metric in metrics:
+                delta, delta_pct = self.get_delta(
+                    current[metric], previous[metric]
+                )
+                result.append({
+                    'line': line['name'],
+                    'metric': metric,
+                    period: current[metric],
+                    against: previous[metric],
+                    'delta': delta,
+                    'delta_pct': delta_pct,
+                })
+        self.print(
+            result, ['line', 'metric', period, against, 'delta', 'delta_pct']
+        )
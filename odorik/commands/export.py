@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command exporting records to database."""
+from __future__ import unicode_literals
+
+from argparse import ArgumentTypeError
+
+from odorik.export import SQLiteExporter, parse_target
+from odorik.commands.base import IntervalCommand, register_command
+
+
+def export_target(value):
+    """Validate export target."""
+    try:
+        return parse_target(value)
+    except ValueError as error:
+        raise ArgumentTypeError('{0}'.format(error))
+
+
+@register_command
+class Export(IntervalCommand):
+
+    """Export records to database."""
+
+    name = 'export'
+    description = "Exports records to SQLite database"
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Export, cls).add_parser(subparser)
+        parser.add_argument(
+            '--to',
+            type=export_target,
+            required=True,
+            metavar='sqlite:PATH',
+            help='Database to export to',
+        )
+        parser.add_argument(
+            '--records',
+            action='append',
+            choices=('calls', 'sms', 'mobile-data', 'lines'),
+            help='Records to export, can be repeated [default: all]',
+        )
+        return parser
+
+    def run(self):
+        """Main execution of the command."""
+        from_date, to_date = self.get_interval()
+        sources = (
+            ('calls', 'calls', lambda: self.odorik.iter_calls(
+                from_date, to_date
+            )),
+            ('sms', 'sms', lambda: self.odorik.iter_sms(from_date, to_date)),
+            ('mobile-data', 'mobile_data', lambda: (
+                self.odorik.iter_mobile_data(from_date, to_date)
+            )),
+            ('lines', 'lines', self.odorik.lines),
+        )
+        exporter = SQLiteExporter(self.args.to[1])
+        result = {}
+        try:
+            for name, table, fetch in sources:
+                if self.args.records and name not in self.args.records:
+                    continue
+                result[name] = exporter.load(table, fetch())
+        finally:
+            exporter.close()
+        self.print(result)
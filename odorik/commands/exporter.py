@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command serving OpenMetrics endpoint."""
+from __future__ import unicode_literals
+
+from argparse import ArgumentTypeError
+
+from odorik.commands.summary import Summary
+from odorik.exporter import MetricsCache, MetricsServer
+from odorik.commands.base import register_command
+
+# Shortest allowed interval between fetching data from the API
+MIN_REFRESH = 10
+
+
+def refresh_interval(value):
+    """Validate --refresh interval."""
+    try:
+        result = int(value)
+    except ValueError:
+        result = 0
+    if result < MIN_REFRESH:
+        raise ArgumentTypeError(
+            'Please specify refresh interval of at least {0} seconds'.format(
+                MIN_REFRESH
+            )
+        )
+    return result
+
+
+@register_command
+class Exporter(Summary):
+
+    """Serve OpenMetrics endpoint."""
+
+    name = 'exporter'
+    description = "Serves balance and usage metrics for Prometheus"
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Exporter, cls).add_parser(subparser)
+        parser.add_argument(
+            '--bind',
+            default='127.0.0.1',
+            help='Address to listen on',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=9721,
+            help='Port to listen on',
+        )
+        parser.add_argument(
+            '--refresh',
+            type=refresh_interval,
+            default=300,
+            help='Interval in seconds for refreshing data from the API',
+        )
+        return parser
+
+    def collect(self):
+        """Collect data for metrics."""
+        return {
+            'balance': self.odorik.balance(),
+            'lines': self.summarize(),
+        }
+
+    def get_server(self):
+        """Create metrics server with warmed up cache."""
+        cache = MetricsCache(self.collect, self.args.refresh)
+        cache.refresh()
+        return MetricsServer((self.args.bind, self.args.port), cache)
+
+    def run(self):
+        """Main execution of the command."""
+        server = self.get_server()
+        server.cache.start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.cache.stop()
+            server.server_close()
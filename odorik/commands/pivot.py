@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command printing summary metric for lines and periods."""
+from __future__ import unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from odorik.commands.base import Command, register_command
+from odorik.materialize import SUMMARY_FIELDS, DailyIndex, SummaryStore
+
+
+@register_command
+class Pivot(Command):
+
+    """Print metric for lines and periods."""
+
+    name = 'pivot'
+    description = "Prints matrix of summary metric for lines and periods"
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Pivot, cls).add_parser(subparser)
+        parser.add_argument(
+            '--rows',
+            choices=('line', 'number'),
+            default='line',
+            help='Identify rows by line name or public number',
+        )
+        parser.add_argument(
+            '--cols',
+            choices=('month', 'quarter'),
+            default='month',
+            help='Period for columns',
+        )
+        parser.add_argument(
+            '--metric',
+            choices=SUMMARY_FIELDS + ('price',),
+            default='price',
+            help='Summary field to show',
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=datetime.now().year,
+            help='Year to show [default: current year]',
+        )
+        parser.add_argument(
+            '--cache-dir',
+            help='Directory to store daily aggregates, defaults to XDG cache'
+        )
+        return parser
+
+    def get_periods(self):
+        """Return list of column names and periods up to now."""
+        now = datetime.now()
+        step = 1 if self.args.cols == 'month' else 3
+        result = []
+        for month in range(1, 13, step):
+            start = datetime(self.args.year, month, 1)
+            if start > now:
+                break
+            if month + step > 12:
+                end = datetime(self.args.year + 1, 1, 1)
+            else:
+                end = datetime(self.args.year, month + step, 1)
+            if self.args.cols == 'month':
+                name = '{0}-{1:02d}'.format(self.args.year, month)
+            else:
+                name = '{0}-Q{1}'.format(self.args.year, month // 3 + 1)
+            result.append((name, (start, min(end, now))))
+        return result
+
+    def run(self):
+        """Main execution of the command."""
+        lines = self.odorik.lines()
+        periods = self.get_periods()
+        with ThreadPoolExecutor(max_workers=self.args.max_workers) as executor:
+            summaries = DailyIndex(
+                self.odorik, SummaryStore(self.args.cache_dir)
+            ).summarize_periods(
+                lines, [period for name, period in periods], executor
+            )
+        rows = self.args.rows
+        result = []
+        for line in lines:
+            row = {}
+            for (name, dummy), summary in zip(
+                    periods, summaries[line['name']]):
+                row[name] = summary[self.args.metric]
+            row['total'] = sum(row.values())
+            if rows == 'line':
+                row[rows] = line['name']
+            else:
+                row[rows] = line['public_number']
+            result.append(row)
+        self.print(
+            result, [rows] + [name for name, dummy in periods] + ['total']
+        )
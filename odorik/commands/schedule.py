@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command executing commands periodically."""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import copy
+import os
+import shlex
+import sys
+import tempfile
+import threading
+from argparse import ArgumentTypeError, Namespace
+from configparser import Error as ConfigParserError, RawConfigParser
+from datetime import datetime, timedelta
+from io import StringIO
+
+import odorik
+from odorik.commands.base import (
+    COMMANDS, Command, CommandError, duration, get_parser, positive_int,
+    register_command,
+)
+from odorik.schedule import OVERLAP_MODES, Job, Scheduler
+
+
+def optional_duration(value):
+    """Parse duration, allowing 0 to disable it."""
+    if value.strip() == '0':
+        return timedelta(0)
+    return duration(value)
+
+
+@register_command
+class Schedule(Command):
+
+    """Execute commands periodically."""
+
+    name = 'schedule'
+    description = "Executes commands periodically as defined in a file"
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Schedule, cls).add_parser(subparser)
+        parser.add_argument(
+            'file',
+            help='File with job definitions',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=optional_duration,
+            default=timedelta(minutes=1),
+            help='Maximal random delay of first run of a job (default is 1m)',
+        )
+        parser.add_argument(
+            '--jobs',
+            type=positive_int,
+            default=4,
+            help='Number of jobs to execute in parallel',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Execute every job once and exit',
+        )
+        return parser
+
+    def __init__(self, args, config, stdout=None, client=None):
+        """Construct Schedule object."""
+        super(Schedule, self).__init__(args, config, stdout, client)
+        self.lock = threading.Lock()
+
+    def read_spec(self):
+        """Read job definitions."""
+        spec = RawConfigParser()
+        try:
+            if not spec.read(self.args.file):
+                raise CommandError(
+                    'Can not read jobs file: {0}'.format(self.args.file)
+                )
+        except ConfigParserError as error:
+            raise CommandError('Invalid jobs file: {0}'.format(error))
+        return spec
+
+    @staticmethod
+    def get_option(spec, name, key, default=None, parse=None):
+        """Return parsed option of a job, default None means required."""
+        if not spec.has_option(name, key):
+            if default is None:
+                raise CommandError('Missing {0} in job {1}'.format(key, name))
+            return default
+        value = spec.get(name, key)
+        if parse is None:
+            return value
+        try:
+            return parse(value)
+        except ArgumentTypeError as error:
+            raise CommandError(
+                'Invalid {0} in job {1}: {2}'.format(key, name, error)
+            )
+
+    def parse_jobs(self):
+        """Parse all jobs before executing any of them."""
+        spec = self.read_spec()
+        parser = get_parser()
+        result = []
+        for name in spec.sections():
+            # Inherit global options of the schedule itself
+            namespace = Namespace(**vars(self.args))
+            args = parser.parse_args(
+                shlex.split(self.get_option(spec, name, 'command')),
+                namespace
+            )
+            if args.cmd is None or args.cmd == self.name:
+                raise CommandError('Invalid command in job {0}'.format(name))
+            overlap = self.get_option(spec, name, 'overlap', 'skip')
+            if overlap not in OVERLAP_MODES:
+                raise CommandError(
+                    'Invalid overlap in job {0}, use one of {1}'.format(
+                        name, ', '.join(OVERLAP_MODES)
+                    )
+                )
+            interval = self.get_option(spec, name, 'interval', parse=duration)
+            jitter = self.get_option(
+                spec, name, 'jitter', self.args.jitter, optional_duration
+            )
+            output = self.get_option(spec, name, 'output', '')
+            result.append(Job(
+                name,
+                interval.total_seconds(),
+                jitter.total_seconds(),
+                overlap,
+                {'args': args, 'output': output or None},
+            ))
+        if not result:
+            raise CommandError('No jobs defined')
+        return result
+
+    def prepare(self, now):
+        """Create context shared by jobs started at once.
+
+        The current time is fixed and the API responses are shared, so
+        that identical requests of several jobs are performed only once.
+        """
+        return (
+            datetime.fromtimestamp(now).replace(microsecond=0),
+            odorik.SharedTransport(self.odorik.transport),
+        )
+
+    def write(self, job, output):
+        """Write output of job run."""
+        path = job.data['output']
+        if path is None:
+            with self.lock:
+                self.stdout.write(output)
+                self.stdout.flush()
+            return
+        # Write atomically, the file might be read by other programs
+        handle, temp = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path))
+        )
+        with os.fdopen(handle, 'w') as target:
+            target.write(output)
+        os.replace(temp, path)
+
+    def execute(self, job, context):
+        """Execute single run of a job."""
+        now, transport = context
+        args = job.data['args']
+        client = copy.copy(self.odorik)
+        client.transport = transport
+        stdout = StringIO()
+        try:
+            command = COMMANDS[args.cmd](args, self.config, stdout, client)
+            command.now = now
+            command.run()
+            self.write(job, stdout.getvalue())
+        except Exception as error:
+            with self.lock:
+                print(
+                    'Error in job {0}: {1}'.format(job.name, error),
+                    file=sys.stderr
+                )
+            raise
+
+    def run(self):
+        """Main execution of the command."""
+        jobs = self.parse_jobs()
+        scheduler = Scheduler(
+            jobs, self.execute, self.prepare, max_workers=self.args.jobs
+        )
+        if self.args.once:
+            scheduler.run_once()
+        else:
+            try:
+                scheduler.run()
+            except KeyboardInterrupt:
+                pass
+        failed = [job for job in jobs if job.errors]
+        if self.args.once and failed:
+            raise CommandError(
+                '{0} of {1} jobs failed'.format(len(failed), len(jobs))
+            )
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command printing summary of all lines."""
+from __future__ import unicode_literals
+
+from odorik.commands.base import IntervalCommand, register_command
+from odorik.materialize import (
+    DailyIndex, IncrementalSummary, SummaryStore, empty_summary, fold_calls,
+    fold_data, fold_sms, line_summary,
+)
+
+
+@register_command
+class Summary(IntervalCommand):
+
+    """Print data usage."""
+
+    name = 'summary'
+    description = "Displays summary information for all lines"
+
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Summary, cls).add_parser(subparser)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Update stored summary only with records since last run'
+        )
+        group.add_argument(
+            '--indexed',
+            action='store_true',
+            help='Calculate summary from stored daily aggregates'
+        )
+        parser.add_argument(
+            '--cache-dir',
+            help='Directory to store summaries, defaults to XDG cache'
+        )
+        cls.add_percentiles_option(parser)
+        cls.add_distinct_option(parser)
+        return parser
+
+    def process_line(self, line, from_date, to_date):
+        """Processe summary for one line."""
+        messages = self.odorik.sms(from_date, to_date, line['id'])
+        calls = self.odorik.calls(from_date, to_date, line['id'])
+        data_usage = self.odorik.mobile_data(
+            from_date,
+            to_date,
+            line['public_number']
+        )
+        result = empty_summary()
+        fold_calls(result, calls)
+        fold_sms(result, messages)
+        fold_data(result, data_usage)
+        result = line_summary(line, result)
+        if self.args.percentiles:
+            result.update(
+                self.call_percentiles(calls, self.args.percentiles, 'call_')
+            )
+        if self.args.distinct:
+            result.update(self.count_distinct(calls, 'call_'))
+            result.update(self.count_distinct(messages, 'sms_'))
+        return result
+
+    def summarize(self):
+        """Calculate summary for all lines."""
+        lines = self.odorik.lines()
+        from_date, to_date = self.get_interval()
+        if self.args.incremental:
+            return IncrementalSummary(
+                self.odorik, SummaryStore(self.args.cache_dir)
+            ).summarize(
+                lines, from_date, to_date, self.args.percentiles,
+                self.args.distinct
+            )
+        if self.args.indexed:
+            return DailyIndex(
+                self.odorik, SummaryStore(self.args.cache_dir)
+            ).summarize(
+                lines, from_date, to_date, percentiles=self.args.percentiles,
+                distinct=self.args.distinct
+            )
+        result = {}
+        for line in lines:
+            result[line['name']] = self.process_line(
+                line, from_date, to_date
+            )
+        return result
+
+    def run(self):
+        """Main execution of the command."""
+        self.print(self.summarize())
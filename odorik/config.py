@@ -50,6 +50,14 @@ class OdorikConfig(RawConfigParser):
         self.set(self.section, 'password', '')
         self.set(self.section, 'url', odorik.API_URL)
 
+    def account_sections(self):
+        """Return sections configuring API user."""
+        return [
+            section for section in self.sections()
+            if section not in ('lines', 'numbers') and
+            self.has_option(section, 'user') and self.get(section, 'user')
+        ]
+
     def load(self, path=None):
         """Load configuration from XDG paths."""
         if path is None:
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Export of records to SQLite database."""
+from __future__ import unicode_literals
+
+import itertools
+import sqlite3
+
+# Number of records inserted in single transaction
+BATCH_SIZE = 10000
+
+TABLES = {
+    'calls': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('redirection_parent_id', 'INTEGER'),
+        ('date', 'TEXT NOT NULL'),
+        ('direction', 'TEXT'),
+        ('source_number', 'TEXT'),
+        ('destination_number', 'TEXT'),
+        ('destination_name', 'TEXT'),
+        ('length', 'INTEGER'),
+        ('ringing_length', 'INTEGER'),
+        ('status', 'TEXT'),
+        ('price', 'REAL'),
+        ('price_per_minute', 'REAL'),
+        ('balance_after', 'REAL'),
+        ('line', 'INTEGER'),
+    ),
+    'sms': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('date', 'TEXT NOT NULL'),
+        ('direction', 'TEXT'),
+        ('source_number', 'TEXT'),
+        ('destination_number', 'TEXT'),
+        ('status', 'TEXT'),
+        ('type', 'TEXT'),
+        ('price', 'REAL'),
+        ('balance_after', 'REAL'),
+        ('line', 'INTEGER'),
+    ),
+    'mobile_data': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('date', 'TEXT NOT NULL'),
+        ('phone_number', 'TEXT'),
+        ('bytes_up', 'INTEGER'),
+        ('bytes_down', 'INTEGER'),
+        ('bytes_total', 'INTEGER'),
+        ('price', 'REAL'),
+        ('price_per_mb', 'REAL'),
+    ),
+    'lines': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('name', 'TEXT'),
+        ('public_number', 'TEXT'),
+        ('caller_id', 'TEXT'),
+        ('backup_number', 'TEXT'),
+        ('active_sip', 'INTEGER'),
+        ('active_iax', 'INTEGER'),
+        ('active_pin', 'INTEGER'),
+        ('active_password', 'INTEGER'),
+        ('active_anonymous', 'INTEGER'),
+        ('active_greeting', 'INTEGER'),
+        ('active_cz_restriction', 'INTEGER'),
+        ('missed_call_email', 'TEXT'),
+        ('voicemail_email', 'TEXT'),
+        ('recording_email', 'TEXT'),
+    ),
+}
+
+INDEXES = {
+    'calls': ('date', 'line', 'direction', 'destination_number'),
+    'sms': ('date', 'line', 'direction', 'destination_number'),
+    'mobile_data': ('date', 'phone_number'),
+    'lines': (),
+}
+
+
+def parse_target(value):
+    """Parse export target specification."""
+    scheme, sep, path = value.partition(':')
+    if not sep or not path:
+        raise ValueError('Please specify target as sqlite:PATH')
+    if scheme != 'sqlite':
+        raise ValueError('Unsupported export target: {0}'.format(scheme))
+    return scheme, path
+
+
+class SQLiteExporter(object):
+
+    """Bulk loader of records into SQLite database."""
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        """Open database and create schema."""
+        self.connection = sqlite3.connect(path)
+        self.batch_size = batch_size
+        self.create_schema()
+
+    def create_schema(self):
+        """Create tables and indexes if they do not exist."""
+        with self.connection:
+            for table, columns in TABLES.items():
+                self.connection.execute(
+                    'CREATE TABLE IF NOT EXISTS {0} ({1})'.format(
+                        table,
+                        ', '.join(
+                            '{0} {1}'.format(*column) for column in columns
+                        )
+                    )
+                )
+                for column in INDEXES[table]:
+                    self.connection.execute(
+                        'CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})'
+                        .format(table, column)
+                    )
+
+    def load(self, table, records):
+        """Insert or replace records by id, returning their number.
+
+        Records are consumed in batches, each inserted in single
+        transaction, so the source can be a lazy iterator.
+        """
+        columns = [column for column, dummy in TABLES[table]]
+        query = 'INSERT OR REPLACE INTO {0} ({1}) VALUES ({2})'.format(
+            table, ', '.join(columns), ', '.join('?' * len(columns))
+        )
+        records = iter(records)
+        count = 0
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                return count
+            with self.connection:
+                self.connection.executemany(query, [
+                    tuple(record.get(column) for column in columns)
+                    for record in batch
+                ])
+            count += len(batch)
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""OpenMetrics exporter for Odorik account metrics."""
+from __future__ import unicode_literals
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+PREFIX = 'odorik_'
+
+LINE_METRICS = (
+    ('call_count', 'Number of calls'),
+    ('call_count_in', 'Number of incoming calls'),
+    ('call_count_out', 'Number of outgoing calls'),
+    ('call_length', 'Length of calls in seconds'),
+    ('call_length_in', 'Length of incoming calls in seconds'),
+    ('call_length_out', 'Length of outgoing calls in seconds'),
+    ('sms_count', 'Number of SMS messages'),
+    ('sms_count_in', 'Number of incoming SMS messages'),
+    ('sms_count_out', 'Number of outgoing SMS messages'),
+    ('bytes_total', 'Transferred mobile data in bytes'),
+    ('data_price', 'Price of mobile data'),
+    ('call_price', 'Price of calls'),
+    ('sms_price', 'Price of SMS messages'),
+    ('price', 'Total price'),
+)
+
+
+def escape_label(value):
+    """Escape label value for OpenMetrics exposition."""
+    return '{0}'.format(value).replace(
+        '\\', '\\\\'
+    ).replace(
+        '"', '\\"'
+    ).replace(
+        '\n', '\\n'
+    )
+
+
+def format_labels(labels):
+    """Format label set."""
+    if not labels:
+        return ''
+    return '{{{0}}}'.format(','.join(
+        '{0}="{1}"'.format(key, escape_label(value))
+        for key, value in labels
+    ))
+
+
+def format_metric(name, kind, description, samples):
+    """Format single metric family."""
+    name = PREFIX + name
+    lines = [
+        '# TYPE {0} {1}'.format(name, kind),
+        '# HELP {0} {1}.'.format(name, description),
+    ]
+    suffix = '_total' if kind == 'counter' else ''
+    for labels, value in samples:
+        lines.append('{0}{1}{2} {3}'.format(
+            name, suffix, format_labels(labels), repr(float(value))
+        ))
+    return lines
+
+
+def render_metrics(data, state):
+    """Render metrics in OpenMetrics text format.
+
+    The data is dictionary with balance and lines summary (as generated by
+    the summary command), the state contains information about refreshing.
+    """
+    lines = []
+    if data is not None:
+        lines.extend(format_metric(
+            'balance', 'gauge', 'Current account balance',
+            [((), data['balance'])]
+        ))
+        summary = data['lines']
+        for field, description in LINE_METRICS:
+            samples = []
+            for name in sorted(summary):
+                line = summary[name]
+                labels = (
+                    ('line', line['id']),
+                    ('name', name),
+                    ('public_number', line['public_number']),
+                )
+                samples.append((labels, line[field]))
+            lines.extend(format_metric(
+                'line_' + field, 'gauge', description, samples
+            ))
+    lines.extend(format_metric(
+        'refresh_timestamp_seconds', 'gauge',
+        'Time of last successful refresh',
+        [((), state['timestamp'])]
+    ))
+    lines.extend(format_metric(
+        'refresh_duration_seconds', 'gauge',
+        'Duration of last successful refresh',
+        [((), state['duration'])]
+    ))
+    lines.extend(format_metric(
+        'refresh_errors', 'counter',
+        'Number of failed refreshes',
+        [((), state['errors'])]
+    ))
+    lines.append('# EOF')
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+
+class MetricsCache(object):
+
+    """Cached metrics refreshed in background thread."""
+
+    def __init__(self, collect, interval):
+        """Create cache using collect callable to fetch the data."""
+        self.collect = collect
+        self.interval = interval
+        self.data = None
+        self.state = {'timestamp': 0, 'duration': 0, 'errors': 0}
+        self.content = render_metrics(self.data, self.state)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        """Fetch fresh data and render metrics."""
+        start = time.time()
+        try:
+            data = self.collect()
+        except Exception:  # pylint: disable=broad-except
+            # Keep serving stale data, error is visible in the metrics
+            with self.lock:
+                self.state['errors'] += 1
+                self.content = render_metrics(self.data, self.state)
+            return False
+        with self.lock:
+            self.data = data
+            self.state['timestamp'] = time.time()
+            self.state['duration'] = self.state['timestamp'] - start
+            self.content = render_metrics(self.data, self.state)
+        return True
+
+    def get_content(self):
+        """Return rendered metrics."""
+        with self.lock:
+            return self.content
+
+    def loop(self):
+        """Background refresh loop."""
+        while not self.stopped.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        """Start background refreshing."""
+        self.thread = threading.Thread(target=self.loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop background refreshing."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    """HTTP handler serving cached metrics."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve metrics."""
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        content = self.server.cache.get_content()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', '{0}'.format(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Silence request logging."""
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+
+    """Threaded HTTP server for metrics."""
+
+    daemon_threads = True
+
+    def __init__(self, address, cache):
+        """Create server bound to address serving given cache."""
+        HTTPServer.__init__(self, address, MetricsHandler)
+        self.cache = cache
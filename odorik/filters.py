@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Filter expressions for records.
+
+The expression is parsed once and compiled to a predicate, for example::
+
+    price > 1 and length >= 60 and destination_name ~ 'Slovensko'
+"""
+from __future__ import unicode_literals
+
+import operator
+import re
+
+TOKENS = re.compile(r'''
+    \s*(?:
+        (?P<number>-?[0-9]+(?:\.[0-9]+)?)|
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|
+        (?P<operator>==|!=|<=|>=|!~|[=<>~])|
+        (?P<paren>[()])|
+        (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )
+''', re.VERBOSE)
+
+KEYWORDS = {
+    'and': 'and',
+    'or': 'or',
+    'not': 'not',
+    'true': True,
+    'false': False,
+    'null': None,
+}
+
+
+def regex_search(value, pattern):
+    """Regular expression search, pattern is compiled expression."""
+    return pattern.search('{0}'.format(value)) is not None
+
+
+def regex_not_search(value, pattern):
+    """Negated regular expression search."""
+    return pattern.search('{0}'.format(value)) is None
+
+
+OPERATORS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '~': regex_search,
+    '!~': regex_not_search,
+}
+
+
+class FilterError(ValueError):
+
+    """Invalid filter expression."""
+
+
+def tokenize(expression):
+    """Split expression into list of (kind, value) tokens."""
+    result = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKENS.match(expression, position)
+        if match is None or match.end() == position:
+            raise FilterError(
+                'Invalid filter expression at: {0}'.format(
+                    expression[position:]
+                )
+            )
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            value = float(value) if '.' in value else int(value)
+            kind = 'literal'
+        elif kind == 'string':
+            # Unescape only quote and backslash, other escapes are kept
+            # for regular expressions
+            value = re.sub(
+                r'\\([\\{0}])'.format(value[0]), r'\1', value[1:-1]
+            )
+            kind = 'literal'
+        elif kind == 'name' and value.lower() in KEYWORDS:
+            value = KEYWORDS[value.lower()]
+            kind = 'keyword' if value in ('and', 'or', 'not') else 'literal'
+        result.append((kind, value))
+    return result
+
+
+class Parser(object):
+
+    """Recursive descent parser producing predicate closures."""
+
+    def __init__(self, expression):
+        """Create parser for expression."""
+        self.tokens = tokenize(expression)
+        self.position = 0
+        # Names of fields referenced by the expression
+        self.fields = set()
+
+    def peek(self):
+        """Return current token."""
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self):
+        """Consume current token."""
+        token = self.peek()
+        if token[0] is None:
+            raise FilterError('Unexpected end of filter expression')
+        self.position += 1
+        return token
+
+    def parse(self):
+        """Parse whole expression."""
+        if not self.tokens:
+            raise FilterError('Empty filter expression')
+        result = self.parse_or()
+        if self.position != len(self.tokens):
+            raise FilterError(
+                'Unexpected token in filter expression: {0}'.format(
+                    self.peek()[1]
+                )
+            )
+        return result
+
+    def parse_or(self):
+        """Parse disjunction."""
+        terms = [self.parse_and()]
+        while self.peek() == ('keyword', 'or'):
+            self.take()
+            terms.append(self.parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda record: any(term(record) for term in terms)
+
+    def parse_and(self):
+        """Parse conjunction."""
+        terms = [self.parse_not()]
+        while self.peek() == ('keyword', 'and'):
+            self.take()
+            terms.append(self.parse_not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda record: all(term(record) for term in terms)
+
+    def parse_not(self):
+        """Parse negation."""
+        if self.peek() == ('keyword', 'not'):
+            self.take()
+            term = self.parse_not()
+            return lambda record: not term(record)
+        return self.parse_primary()
+
+    def parse_primary(self):
+        """Parse parenthesis or comparison."""
+        if self.peek() == ('paren', '('):
+            self.take()
+            result = self.parse_or()
+            if self.take() != ('paren', ')'):
+                raise FilterError('Missing closing parenthesis')
+            return result
+        left = self.parse_operand()
+        kind, value = self.take()
+        if kind != 'operator':
+            raise FilterError('Expected operator, got {0}'.format(value))
+        right = self.parse_operand()
+        return self.compile_comparison(left, value, right)
+
+    def parse_operand(self):
+        """Parse field name or literal."""
+        kind, value = self.take()
+        if kind not in ('name', 'literal'):
+            raise FilterError('Expected field or value, got {0}'.format(value))
+        if kind == 'name':
+            self.fields.add(value)
+        return kind, value
+
+    @staticmethod
+    def compile_comparison(left, name, right):
+        """Compile comparison to a closure."""
+        function = OPERATORS[name]
+        if name in ('~', '!~'):
+            if right[0] != 'literal':
+                raise FilterError('Regular expression has to be a string')
+            try:
+                right = ('literal', re.compile('{0}'.format(right[1])))
+            except re.error as error:
+                raise FilterError(
+                    'Invalid regular expression: {0}'.format(error)
+                )
+
+        def compare(first, second):
+            """Compare values, incomparable values do not match."""
+            if first is None or second is None:
+                return function(first, second) if name in ('=', '==', '!=') \
+                    else False
+            try:
+                return function(first, second)
+            except TypeError:
+                return False
+
+        # Specialize most common cases to avoid overhead per record
+        if left[0] == 'name' and right[0] == 'literal':
+            field = left[1]
+            constant = right[1]
+            return lambda record: compare(record.get(field), constant)
+        if left[0] == 'literal' and right[0] == 'name':
+            field = right[1]
+            constant = left[1]
+            return lambda record: compare(constant, record.get(field))
+        if left[0] == 'name' and right[0] == 'name':
+            first = left[1]
+            second = right[1]
+            return lambda record: compare(
+                record.get(first), record.get(second)
+            )
+        result = compare(left[1], right[1])
+        return lambda record: result
+
+
+def compile_filter(expression):
+    """Compile filter expression to a predicate.
+
+    Fields referenced by the expression are stored in its fields attribute.
+    """
+    parser = Parser(expression)
+    result = parser.parse()
+    result.fields = frozenset(parser.fields)
+    return result
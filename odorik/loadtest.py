@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Load test driver running the client against the mock API server.
+
+The driver can be started by ``python -m odorik.loadtest``.
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import shlex
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import StringIO
+from timeit import default_timer
+
+from odorik import Odorik
+from odorik.main import main as cli_main
+from odorik.mockserver import add_server_arguments, create_server
+from odorik.timings import PERCENTILES, format_ms, percentile
+
+
+def last_day():
+    """Return interval covering last day."""
+    now = datetime.utcnow()
+    return now - timedelta(days=1), now
+
+
+OPERATIONS = {
+    'balance': lambda api: api.balance(),
+    'lines': lambda api: api.lines(),
+    'calls': lambda api: api.calls(*last_day()),
+    'sms': lambda api: api.sms(*last_day()),
+    'mobile-data': lambda api: api.mobile_data(*last_day()),
+    'send-sms': lambda api: api.send_sms('00420789123456', 'text'),
+    'callback': lambda api: api.callback('00420789123456', '800123456'),
+}
+
+
+def cli_operation(command):
+    """Create operation executing command line interface."""
+    args = shlex.split(command)
+
+    def operation(api):
+        """Execute command against API server."""
+        try:
+            cli_main(
+                settings=(('odorik', 'url', api.url),),
+                stdout=StringIO(),
+                args=args,
+            )
+        except SystemExit as error:
+            if error.code:
+                raise RuntimeError('Command failed: {0}'.format(command))
+
+    return operation
+
+
+def run_level(url, operations, concurrency, requests):
+    """Run operations at given concurrency level, return statistics."""
+    api = Odorik(url=url)
+
+    def execute(number):
+        """Execute single operation and measure it."""
+        operation = operations[number % len(operations)]
+        started = default_timer()
+        try:
+            operation(api)
+            failed = False
+        except Exception:  # pylint: disable=broad-except
+            failed = True
+        return default_timer() - started, failed
+
+    started = default_timer()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(execute, range(requests)))
+    elapsed = default_timer() - started
+    durations = sorted(result[0] for result in results)
+    stats = {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for result in results if result[1]),
+        'elapsed': elapsed,
+        'throughput': requests / elapsed if elapsed else 0,
+    }
+    for pct in PERCENTILES:
+        stats['p{0}'.format(pct)] = percentile(durations, pct)
+    return stats
+
+
+def report(results, stream):
+    """Print results table."""
+    header = ['concurrency', 'requests', 'errors', 'ops/s'] + [
+        'p{0} ms'.format(pct) for pct in PERCENTILES
+    ]
+    print('  '.join('{0:>11}'.format(item) for item in header), file=stream)
+    for stats in results:
+        row = [
+            '{0}'.format(stats['concurrency']),
+            '{0}'.format(stats['requests']),
+            '{0}'.format(stats['errors']),
+            '{0:.1f}'.format(stats['throughput']),
+        ] + [
+            format_ms(stats['p{0}'.format(pct)]) for pct in PERCENTILES
+        ]
+        print('  '.join('{0:>11}'.format(item) for item in row), file=stream)
+
+
+def get_parser():
+    """Create argument parser."""
+    parser = ArgumentParser(
+        description='Load test of the Odorik client using mock API server.'
+    )
+    parser.add_argument(
+        '--url',
+        help='API URL to test, local mock server is started if not specified',
+    )
+    parser.add_argument(
+        '--concurrency',
+        default='1,4,16',
+        help='Comma separated list of concurrency levels',
+    )
+    parser.add_argument(
+        '--requests', type=int, default=100,
+        help='Number of operations on every concurrency level',
+    )
+    parser.add_argument(
+        '--operation',
+        action='append',
+        choices=sorted(OPERATIONS),
+        default=[],
+        help='Library operation to execute, can be repeated',
+    )
+    parser.add_argument(
+        '--command',
+        action='append',
+        default=[],
+        help='Command line to execute, for example "summary", can be repeated',
+    )
+    add_server_arguments(parser)
+    return parser
+
+
+def main(args=None, stdout=None):
+    """Execution entry point."""
+    args = get_parser().parse_args(args)
+    if stdout is None:
+        stdout = sys.stdout
+    operations = [OPERATIONS[name] for name in args.operation]
+    operations.extend(cli_operation(command) for command in args.command)
+    if not operations:
+        operations = [OPERATIONS['balance']]
+    server = None
+    url = args.url
+    if url is None:
+        server = create_server(args)
+        server.start()
+        url = server.url
+    try:
+        results = [
+            run_level(url, operations, int(level), args.requests)
+            for level in args.concurrency.split(',')
+        ]
+    finally:
+        if server is not None:
+            server.stop()
+    report(results, stdout)
+    return results
+
+
+if __name__ == '__main__':
+    main()
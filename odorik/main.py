@@ -22,422 +22,20 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import sys
-import json
-import csv
-from argparse import ArgumentParser
-from datetime import datetime, timedelta
-import dateutil.parser
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 
 import odorik
-from odorik.config import OdorikConfig, NoOptionError
-
-
-COMMANDS = {}
-
-SORT_ORDER = [
-    'id',
-    'public_number',
-    'count',
-    'count_in',
-    'count_out',
-    'sms_count',
-    'sms_count_in',
-    'sms_count_out',
-    'call_count',
-    'call_count_in',
-    'call_count_out',
-    'call_length',
-    'call_length_in',
-    'call_length_out',
-    'bytes_down',
-    'bytes_up',
-    'bytes_total',
-    'data_price',
-    'call_price',
-    'sms_price',
-    'length',
-    'length_in',
-    'length_out',
-    'ringing_length',
-    'price',
-]
-
-
-def register_command(command):
-    """Decorator to register command in command line interface."""
-    COMMANDS[command.name] = command
-    return command
-
-
-def get_parser():
-    """Create argument parser."""
-    parser = ArgumentParser(
-        description='Odorik <{0}> command line utility.'.format(odorik.URL),
-        epilog='This utility is developed at <{0}>.'.format(odorik.DEVEL_URL),
-    )
-    parser.add_argument(
-        '--format',
-        default='text',
-        choices=('text', 'csv', 'json', 'html'),
-        help='Output format to use'
-    )
-    parser.add_argument(
-        '--version',
-        action='version',
-        version='odorik {0}'.format(odorik.__version__)
-    )
-    parser.add_argument(
-        '--config',
-        help='Path to configuration file',
-    )
-    parser.add_argument(
-        '--config-section',
-        default='odorik',
-        help='Configuration section to use'
-    )
-    parser.add_argument(
-        '--user',
-        help='API username',
-    )
-    parser.add_argument(
-        '--password',
-        help='API password',
-    )
-    parser.add_argument(
-        '--url',
-        help='API URL',
-    )
-    subparser = parser.add_subparsers(dest="cmd")
-
-    for command in COMMANDS:
-        COMMANDS[command].add_parser(subparser)
-
-    return parser
-
-
-class CommandError(Exception):
-
-    """Generic error from command line."""
-
-
-def sort_key(value):
-    """Key getter for sorting."""
-    try:
-        return '{0:02d}'.format(SORT_ORDER.index(value))
-    except ValueError:
-        return value
-
-
-def sorted_items(value):
-    """Sorted items iterator."""
-    for key in sorted(value.keys(), key=sort_key):
-        yield key, value[key]
-
-
-def key_value(value):
-    """Validate key=value parameter."""
-    if '=' not in value:
-        raise ValueError('Please specify --param as key=value')
-    return value
-
-
-class Command(object):
-
-    """Basic command object."""
-
-    name = ''
-    description = ''
-
-    def __init__(self, args, config, stdout=None):
-        """Construct Command object."""
-        self.args = args
-        self.config = config
-        if stdout is None:
-            self.stdout = sys.stdout
-        else:
-            self.stdout = stdout
-        self.odorik = odorik.Odorik(config=config)
-
-    @classmethod
-    def add_parser(cls, subparser):
-        """Create parser for command line."""
-        return subparser.add_parser(
-            cls.name, description=cls.description
-        )
-
-    @staticmethod
-    def add_list_option(parser):
-        """Add argparse argument --list."""
-        parser.add_argument(
-            '--list',
-            action='store_true',
-            help='List all records (instead of printing summary)'
-        )
-
-    @staticmethod
-    def add_line_option(parser):
-        """Add argparse argument --line."""
-        parser.add_argument(
-            '--line',
-            help='Line to use for listing'
-        )
-
-    def resolve(self, kind, value):
-        """Resolve line/phone number from configuration."""
-        if value is None:
-            return None
-        if value.isdigit():
-            return value
-        try:
-            return self.config.get(kind, value)
-        except NoOptionError:
-            raise CommandError(
-                'Invalid value for {0}: {1}'.format(kind, value)
-            )
-
-    @staticmethod
-    def summary(values, fields):
-        """Calculate summary of values."""
-        result = {}
-        for field in fields:
-            result[field] = 0
-        for value in values:
-            for field in fields:
-                result[field] += value[field]
-        return result
-
-    @staticmethod
-    def summary_group(values, fields, group, groups):
-        """Calculate summary of values groupped by attribute."""
-        result = {}
-        for field in fields:
-            for group_name in groups:
-                result['{0}_{1}'.format(field, group_name)] = 0
-
-        for value in values:
-            group_name = value[group]
-            for field in fields:
-                result['{0}_{1}'.format(field, group_name)] += value[field]
-        return result
-
-    @classmethod
-    def calls_summary(cls, calls):
-        """Wrapper for getting calls summary."""
-        result = cls.summary(calls, ('price', 'length'))
-        result.update(
-            cls.summary_group(
-                calls, ('length',), 'direction', ('in', 'out', 'redirected')
-            )
-        )
-        result['count'] = len(calls)
-        result['count_in'] = cls.count_direction(calls, 'in')
-        result['count_out'] = cls.count_direction(calls, 'out')
-        return result
-
-    @classmethod
-    def sms_summary(cls, messages):
-        """Wrapper for getting sms summary."""
-        result = cls.summary(messages, ('price',))
-        result['count'] = len(messages)
-        result['count_in'] = cls.count_direction(messages, 'in')
-        result['count_out'] = cls.count_direction(messages, 'out')
-        return result
-
-    @classmethod
-    def data_summary(cls, data_usage):
-        """Wrapper for getting data summary."""
-        return cls.summary(
-            data_usage,
-            ('bytes_total', 'bytes_down', 'bytes_up', 'price')
-        )
-
-    @staticmethod
-    def count_direction(values, direction):
-        """Counts items with matching direction"""
-        return len(
-            [value for value in values if value['direction'] == direction]
-        )
-
-    def println(self, line):
-        """Print single line to output."""
-        print(line, file=self.stdout)
-
-    def print_json(self, value):
-        """JSON print."""
-        json.dump(value, self.stdout, indent=2)
-
-    @staticmethod
-    def format_value(value):
-        """Format value for rendering."""
-        if isinstance(value, float):
-            return '{0:.2f}'.format(value)
-        elif isinstance(value, int):
-            return '{0}'.format(value)
-        elif value is None:
-            return ''
-        return value
-
-    @classmethod
-    def format_csv_value(cls, value):
-        """Format value for rendering in CSV."""
-        value = cls.format_value(value)
-        if sys.version_info < (3, 0):
-            return value.encode('utf-8')
-        return value
-
-    def print_csv(self, value, header):
-        """CSV print."""
-        if header is not None:
-            writer = csv.DictWriter(self.stdout, header)
-            writer.writeheader()
-            for row in value:
-                writer.writerow(
-                    {k: self.format_csv_value(v) for k, v in row.items()}
-                )
-        elif isinstance(list(value.items())[0][1], dict):
-            for key, data in sorted_items(value):
-                self.println(self.format_csv_value(key))
-                self.print_csv(data, None)
-                self.println(self.format_csv_value(''))
-        else:
-            writer = csv.writer(self.stdout)
-            for key, data in sorted_items(value):
-                writer.writerow((key, self.format_csv_value(data)))
-
-    def print_html(self, value, header):
-        """HTML print."""
-        if header is not None:
-            self.println('<table>')
-            self.println('  <thead>')
-            self.println('    <tr>')
-            for key in header:
-                self.println('      <th>{0}</th>'.format(key))
-            self.println('    </tr>')
-            self.println('  </thead>')
-            self.println('  <tbody>')
-
-            for item in value:
-                self.println('    <tr>')
-                for key in header:
-                    self.println('      <td>{0}</td>'.format(
-                        self.format_value(item[key])
-                    ))
-                self.println('    </tr>')
-            self.println('  </tbody>')
-            self.println('</table>')
-        elif isinstance(list(value.items())[0][1], dict):
-            for key, data in sorted_items(value):
-                self.println('<h1>{0}</h1>'.format(key))
-                self.print_html(data, None)
-        else:
-            self.println('<table>')
-            for key, data in sorted_items(value):
-                self.println('  <tr>')
-                self.println('    <th>{0}</th><td>{1}</td>'.format(
-                    key, self.format_value(data)
-                ))
-                self.println('  </tr>')
-            self.println('</table>')
-
-    def print_text(self, value, header):
-        """Text print."""
-        if header is not None:
-            for item in value:
-                for key in header:
-                    self.println('{0}: {1}'.format(
-                        key, self.format_value(item[key])
-                    ))
-                self.println('')
-        elif isinstance(list(value.items())[0][1], dict):
-            for key, data in sorted_items(value):
-                self.println(key)
-                self.print_text(data, None)
-                self.println('')
-        else:
-            for key, data in sorted_items(value):
-                self.println('{0}: {1}'.format(
-                    key, self.format_value(data)
-                ))
-
-    def print(self, value):
-        """Print value."""
-        header = None
-        if isinstance(value, list):
-            if len(value) == 0:
-                return
-            header = sorted(value[0].keys(), key=sort_key)
-
-        if self.args.format == 'json':
-            self.print_json(value)
-        elif self.args.format == 'csv':
-            self.print_csv(value, header)
-        elif self.args.format == 'html':
-            self.print_html(value, header)
-        else:
-            self.print_text(value, header)
-
-    def run(self):
-        """Main execution of the command."""
-        raise NotImplementedError
-
-
-class IntervalCommand(Command):
-
-    """Helper class to handle date intervals."""
-
-    @classmethod
-    def add_parser(cls, subparser):
-        """Create parser for command line."""
-        parser = super(IntervalCommand, cls).add_parser(subparser)
-        parser.add_argument(
-            '--this-month',
-            action='store_true',
-            help='Show data for this month [default]'
-        )
-        parser.add_argument(
-            '--last-month',
-            action='store_true',
-            help='Show data for last month'
-        )
-        parser.add_argument(
-            '--start-date',
-            type=dateutil.parser.parse,
-            help='Starting datetime'
-        )
-        parser.add_argument(
-            '--end-date',
-            type=dateutil.parser.parse,
-            help='Ending datetime'
-        )
-        return parser
-
-    def get_interval(self):
-        """Return interval based on passed flags."""
-        now = datetime.now()
-
-        if self.args.start_date and self.args.end_date:
-            if self.args.start_date >= self.args.end_date:
-                raise CommandError(
-                    'Starting date has to be earlier than ending!'
-                )
-            return (self.args.start_date, self.args.end_date)
-        elif self.args.start_date:
-            return (self.args.start_date, now)
-        elif self.args.end_date:
-            raise CommandError('Can not set ending date without start!')
-
-        if self.args.last_month:
-            # Get last day of previous month
-            now = now.replace(day=1) - timedelta(days=1)
-            # Set to midnight
-            now = now.replace(hour=23, minute=59, second=59)
-
-        # Fallback to this month
-        return (datetime(now.year, now.month, 1), now)
-
-    def run(self):
-        """Main execution of the command."""
-        raise NotImplementedError
+# Commands defined in separate modules register themselves when imported
+import odorik.commands
+from odorik.commands.base import (
+    COMMANDS, Command, CommandError, IntervalCommand, decode_fields,
+    duration, get_parser, key_value, register_command,
+)
+from odorik.config import OdorikConfig
+from odorik.profiling import Profiler
+from odorik.redirects import resolve_redirects
+from odorik.timings import TimingCollector
 
 
 @register_command
@@ -516,16 +114,44 @@ class API(Command):
 
 
 @register_command
-class Balance(Command):
+class Balance(IntervalCommand):
 
     """Print balance."""
 
     name = 'balance'
     description = "Prints current balance"
 
+    @classmethod
+    def add_parser(cls, subparser):
+        """Create parser for command line."""
+        parser = super(Balance, cls).add_parser(subparser)
+        parser.add_argument(
+            '--history',
+            action='store_true',
+            help='Print balance history from calls and SMS in the period'
+        )
+        parser.add_argument(
+            '--step',
+            type=duration,
+            help='Print only last balance in every step, for example 1d'
+        )
+        return parser
+
     def run(self):
         """Main execution of the command."""
-        self.print({'balance': self.odorik.balance()})
+        if self.args.history:
+            from_date, to_date = self.get_interval()
+            self.print(self.odorik.iter_balance(
+                from_date, to_date, step=self.args.step
+            ))
+        else:
+            if self.args.step or self.args.this_month or \
+                    self.args.last_month or self.args.start_date or \
+                    self.args.end_date:
+                raise CommandError(
+                    'Step and date period can be used only with --history!'
+                )
+            self.print({'balance': self.odorik.balance()})
 
 
 @register_command
@@ -584,6 +210,18 @@ class Calls(IntervalCommand):
         parser = super(Calls, cls).add_parser(subparser)
         cls.add_list_option(parser)
         cls.add_line_option(parser)
+        cls.add_follow_option(parser)
+        cls.add_where_option(parser)
+        cls.add_sort_option(parser)
+        cls.add_annotate_option(parser)
+        cls.add_percentiles_option(parser)
+        cls.add_distinct_option(parser)
+        cls.add_fields_option(parser)
+        parser.add_argument(
+            '--resolve-redirects',
+            action='store_true',
+            help='List effective length and price per originating call'
+        )
         parser.add_argument(
             '--direction',
             choices=('in', 'out', 'redirected'),
@@ -604,16 +242,29 @@ class Calls(IntervalCommand):
             args['status'] = self.args.status
         if self.args.direction:
             args['direction'] = self.args.direction
-        calls = self.odorik.calls(
-            from_date,
-            to_date,
-            self.resolve('lines', self.args.line),
-            **args
-        )
-        if self.args.list:
-            self.print(calls)
+        args['fields'] = decode_fields(self.args)
+        line = self.resolve('lines', self.args.line)
+        if self.args.follow:
+            self.follow(
+                lambda start, end: self.odorik.calls(start, end, line, **args)
+            )
+            return
+        calls = self.filter_records(self.annotate_records(
+            self.odorik.calls(from_date, to_date, line, **args)
+        ))
+        if self.args.resolve_redirects:
+            self.print_records(self.sort_records(resolve_redirects(calls)))
+        elif self.args.list:
+            self.print_records(self.sort_records(calls))
         else:
-            self.print(self.calls_summary(calls))
+            result = self.calls_summary(calls)
+            if self.args.percentiles:
+                result.update(
+                    self.call_percentiles(calls, self.args.percentiles)
+                )
+            if self.args.distinct:
+                result.update(self.count_distinct(calls))
+            self.print(result)
 
 
 @register_command
@@ -630,20 +281,34 @@ class SMS(IntervalCommand):
         parser = super(SMS, cls).add_parser(subparser)
         cls.add_list_option(parser)
         cls.add_line_option(parser)
+        cls.add_follow_option(parser)
+        cls.add_where_option(parser)
+        cls.add_sort_option(parser)
+        cls.add_annotate_option(parser)
+        cls.add_distinct_option(parser)
+        cls.add_fields_option(parser)
         return parser
 
     def run(self):
         """Main execution of the command."""
         from_date, to_date = self.get_interval()
-        sms = self.odorik.sms(
-            from_date,
-            to_date,
-            self.resolve('lines', self.args.line)
-        )
+        line = self.resolve('lines', self.args.line)
+        fields = decode_fields(self.args)
+        if self.args.follow:
+            self.follow(
+                lambda start, end: self.odorik.sms(start, end, line, fields)
+            )
+            return
+        sms = self.filter_records(self.annotate_records(
+            self.odorik.sms(from_date, to_date, line, fields)
+        ))
         if self.args.list:
-            self.print(sms)
+            self.print_records(self.sort_records(sms))
         else:
-            self.print(self.sms_summary(sms))
+            result = self.sms_summary(sms)
+            if self.args.distinct:
+                result.update(self.count_distinct(sms))
+            self.print(result)
 
 
 @register_command
@@ -659,6 +324,10 @@ class MobileData(IntervalCommand):
         """Create parser for command line."""
         parser = super(MobileData, cls).add_parser(subparser)
         cls.add_list_option(parser)
+        cls.add_where_option(parser)
+        cls.add_sort_option(parser)
+        cls.add_annotate_option(parser)
+        cls.add_fields_option(parser)
         parser.add_argument(
             '--phone',
             help='Limit listing to phone number',
@@ -673,13 +342,13 @@ class MobileData(IntervalCommand):
     def one_number(self, phone):
         """Processe data summary for one phone number."""
         from_date, to_date = self.get_interval()
-        data_usage = self.odorik.mobile_data(
-            from_date,
-            to_date,
-            phone
-        )
+        data_usage = self.filter_records(self.annotate_records(
+            self.odorik.mobile_data(
+                from_date, to_date, phone, decode_fields(self.args)
+            )
+        ))
         if self.args.list:
-            return data_usage
+            return self.sort_records(data_usage)
         else:
             return self.data_summary(data_usage)
 
@@ -692,9 +361,11 @@ class MobileData(IntervalCommand):
                 result[-1]['public_number'] = line['public_number']
             self.print(result)
         else:
-            self.print(
-                self.one_number(self.resolve('numbers', self.args.phone))
-            )
+            result = self.one_number(self.resolve('numbers', self.args.phone))
+            if self.args.list:
+                self.print_records(result)
+            else:
+                self.print(result)
 
 
 @register_command
@@ -733,61 +404,6 @@ class SendSMS(Command):
         )
 
 
-@register_command
-class Summary(IntervalCommand):
-
-    """Print data usage."""
-
-    name = 'summary'
-    description = "Displays summary information for all lines"
-
-    def process_line(self, line, from_date, to_date):
-        """Processe summary for one line."""
-        messages = self.odorik.sms(from_date, to_date, line['id'])
-        calls = self.odorik.calls(from_date, to_date, line['id'])
-        data_usage = self.odorik.mobile_data(
-            from_date,
-            to_date,
-            line['public_number']
-        )
-        messages_summary = self.sms_summary(messages)
-        calls_summary = self.calls_summary(calls)
-        data_summary = self.data_summary(data_usage)
-        return {
-            'public_number': line['public_number'],
-            'id': line['id'],
-            'call_count': calls_summary['count'],
-            'call_count_in': calls_summary['count_in'],
-            'call_count_out': calls_summary['count_out'],
-            'call_length': calls_summary['length'],
-            'call_length_in': calls_summary['length_in'],
-            'call_length_out': calls_summary['length_out'],
-            'sms_count': messages_summary['count'],
-            'sms_count_in': messages_summary['count_in'],
-            'sms_count_out': messages_summary['count_out'],
-            'bytes_total': data_summary['bytes_total'],
-            'data_price': data_summary['price'],
-            'call_price': calls_summary['price'],
-            'sms_price': messages_summary['price'],
-            'price': (
-                data_summary['price'] +
-                calls_summary['price'] +
-                messages_summary['price']
-            ),
-        }
-
-    def run(self):
-        """Main execution of the command."""
-        lines = self.odorik.lines()
-        from_date, to_date = self.get_interval()
-        result = {}
-        for line in lines:
-            result[line['name']] = self.process_line(
-                line, from_date, to_date
-            )
-        self.print(result)
-
-
 @register_command
 class Callback(Command):
 
@@ -820,28 +436,142 @@ class Callback(Command):
         )
 
 
-def main(settings=None, stdout=None, args=None):
-    """Execution entry point."""
-    parser = get_parser()
-    if args is None:
-        args = sys.argv[1:]
-    args = parser.parse_args(args)
-
-    config = OdorikConfig(args.config_section)
+def get_config(args, settings, section):
+    """Create configuration for given section."""
+    config = OdorikConfig(section)
     if settings is None:
         config.load(args.config)
     else:
-        for section, key, value in settings:
-            config.set(section, key, value)
+        for config_section, key, value in settings:
+            config.set(config_section, key, value)
 
     for override in ('user', 'password', 'url'):
         value = getattr(args, override)
         if value is not None:
-            config.set(args.config_section, override, value)
+            config.set(section, override, value)
+    return config
+
+
+def get_sections(args, settings):
+    """Return list of configuration sections to process or None."""
+    if args.sections:
+        return args.sections
+    if args.all_sections:
+        config = get_config(args, settings, args.config_section)
+        sections = config.account_sections()
+        if not sections:
+            raise CommandError('No sections with API user configured!')
+        return sections
+    return None
+
+
+def run_sections(args, settings, stdout, sections, prepare):
+    """Execute command for several accounts concurrently.
+
+    Output of the command for every section is merged into single result
+    keyed by section name. Text written directly by the command, for
+    example configuration generated by lines, is printed per section
+    before the merged result.
+    """
+    def execute(section):
+        """Execute command for single section."""
+        text = StringIO()
+        command = COMMANDS[args.cmd](
+            args, get_config(args, settings, section), text
+        )
+        prepare(command)
+        command.capture = []
+        try:
+            command.run()
+        except (CommandError, odorik.OdorikException) as error:
+            return None, text.getvalue(), '{0}'.format(error)
+        if not command.capture:
+            # Command has written all its output as text
+            return None, text.getvalue(), None
+        if len(command.capture) == 1:
+            return command.capture[0], text.getvalue(), None
+        return command.capture, text.getvalue(), None
+
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        results = list(executor.map(execute, sections))
+
+    if stdout is None:
+        stdout = sys.stdout
+    output = {}
+    errors = []
+    for section, result in zip(sections, results):
+        if result[1]:
+            stdout.write('{0}\n{1}\n'.format(section, result[1]))
+        if result[2] is None:
+            if result[0] is not None:
+                output[section] = result[0]
+        else:
+            errors.append(section)
+            print(
+                'Error in section {0}: {1}'.format(section, result[2]),
+                file=sys.stderr
+            )
+    if output:
+        Command(
+            args, get_config(args, settings, args.config_section), stdout
+        ).print(output)
+    if errors:
+        raise CommandError('{0} of {1} sections failed'.format(
+            len(errors), len(sections)
+        ))
 
-    command = COMMANDS[args.cmd](args, config, stdout)
+
+def main(settings=None, stdout=None, args=None):
+    """Execution entry point."""
+    parser = get_parser()
+    if args is None:
+        args = sys.argv[1:]
+    args = parser.parse_args(args)
+
+    transport = None
+    if args.record:
+        transport = odorik.RecordingTransport(
+            args.record, fields=decode_fields(args)
+        )
+    elif args.replay:
+        transport = odorik.ReplayTransport(
+            args.replay, fields=decode_fields(args)
+        )
+    timings = None
+    if args.timings or args.timings_file:
+        timings = TimingCollector()
+
+    def prepare(command):
+        """Configure API client of the command."""
+        if transport is not None:
+            command.odorik.transport = transport
+        if timings is not None:
+            command.odorik.add_hook(timings)
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.start()
     try:
-        command.run()
+        sections = get_sections(args, settings)
+        if sections:
+            run_sections(args, settings, stdout, sections, prepare)
+        else:
+            command = COMMANDS[args.cmd](
+                args, get_config(args, settings, args.config_section), stdout
+            )
+            prepare(command)
+            command.run()
     except (CommandError, odorik.OdorikException) as error:
         print('Error: {0}'.format(error), file=sys.stderr)
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
+            profiler.report(sys.stderr)
+        if timings is not None:
+            if args.timings:
+                timings.report(sys.stderr)
+            if args.timings_file:
+                timings.write_trace(args.timings_file)
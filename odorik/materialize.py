@@ -0,0 +1,718 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Persistent summaries maintained incrementally.
+
+The summary state is stored in the cache directory together with the time
+it was computed up to and ids of records fetched last time. Next refresh
+only fetches records since then (with some overlap for records appearing
+late) and folds them into the stored totals.
+
+For arbitrary ranges, daily aggregates of every line are stored instead
+and the range summary is calculated from their prefix sums.
+"""
+from __future__ import unicode_literals
+
+from datetime import datetime, time, timedelta
+import hashlib
+import json
+import os
+import tempfile
+
+import dateutil.parser
+from dateutil.tz import tzlocal
+from xdg.BaseDirectory import save_cache_path
+
+from odorik.sketches import DistinctSketch, QuantileSketch, percentile_name
+
+# Records can appear in the API with some delay
+REFRESH_OVERLAP = timedelta(hours=1)
+
+SUMMARY_FIELDS = (
+    'call_count', 'call_count_in', 'call_count_out',
+    'call_length', 'call_length_in', 'call_length_out',
+    'sms_count', 'sms_count_in', 'sms_count_out',
+    'bytes_total', 'data_price', 'call_price', 'sms_price',
+)
+
+# Call fields with distribution tracked by quantile sketches
+SKETCH_FIELDS = (
+    'length', 'length_in', 'length_out',
+    'ringing_length', 'ringing_length_in', 'ringing_length_out',
+)
+
+# Distinct numbers counted for calls and SMS, with direction and field
+DISTINCT_FIELDS = (
+    ('distinct_destinations', 'out', 'destination_number'),
+    ('distinct_sources', 'in', 'source_number'),
+)
+
+
+def empty_summary():
+    """Return summary with all fields zero."""
+    return {field: 0 for field in SUMMARY_FIELDS}
+
+
+def fold_calls(summary, calls, prefix='call_'):
+    """Add calls to summary with fields prefixed by prefix.
+
+    Length is added per direction only for directions tracked by summary.
+    """
+    for call in calls:
+        summary[prefix + 'count'] += 1
+        summary[prefix + 'length'] += call['length']
+        summary[prefix + 'price'] += call['price']
+        direction = call['direction']
+        if direction in ('in', 'out'):
+            summary[prefix + 'count_' + direction] += 1
+        field = prefix + 'length_' + direction
+        if field in summary:
+            summary[field] += call['length']
+
+
+def empty_sketches():
+    """Return empty quantile sketches of calls."""
+    return {field: QuantileSketch() for field in SKETCH_FIELDS}
+
+
+def fold_call_sketches(sketches, calls):
+    """Add calls to quantile sketches."""
+    for call in calls:
+        for field in ('length', 'ringing_length'):
+            sketches[field].update(call[field])
+            if call['direction'] in ('in', 'out'):
+                sketches[field + '_' + call['direction']].update(call[field])
+
+
+def load_sketches(state):
+    """Create sketches from stored state."""
+    return {
+        field: QuantileSketch.from_state(value)
+        for field, value in state.items()
+    }
+
+
+def dump_sketches(sketches):
+    """Return state of sketches for storing."""
+    return {field: value.get_state() for field, value in sketches.items()}
+
+
+def sketch_percentiles(sketches, percentiles, prefix=''):
+    """Return percentiles of all sketches as summary fields."""
+    result = {}
+    for field in SKETCH_FIELDS:
+        for pct in percentiles:
+            result[percentile_name(prefix + field, pct)] = (
+                sketches[field].quantile(pct)
+            )
+    return result
+
+
+def empty_distinct(prefixes=('call_', 'sms_')):
+    """Return empty distinct count sketches."""
+    return {
+        prefix + name: DistinctSketch()
+        for prefix in prefixes for name, dummy, dummy in DISTINCT_FIELDS
+    }
+
+
+def fold_distinct(sketches, records, prefix):
+    """Add numbers from calls or SMS to distinct count sketches."""
+    for record in records:
+        for name, direction, field in DISTINCT_FIELDS:
+            if record['direction'] == direction:
+                sketches[prefix + name].add(record[field])
+
+
+def load_distinct(state):
+    """Create distinct count sketches from stored state."""
+    return {
+        name: DistinctSketch.from_state(value) for name, value in state.items()
+    }
+
+
+def distinct_counts(sketches):
+    """Return distinct counts as summary fields."""
+    return {name: sketch.count() for name, sketch in sketches.items()}
+
+
+def fold_sms(summary, messages, prefix='sms_'):
+    """Add SMS messages to summary with fields prefixed by prefix."""
+    for message in messages:
+        summary[prefix + 'count'] += 1
+        summary[prefix + 'price'] += message['price']
+        if message['direction'] in ('in', 'out'):
+            summary[prefix + 'count_' + message['direction']] += 1
+
+
+def fold_data(summary, data_usage, prefix='data_'):
+    """Add data usage to summary with price prefixed by prefix.
+
+    Downloaded and uploaded bytes are added only if tracked by summary.
+    """
+    for item in data_usage:
+        summary['bytes_total'] += item['bytes_total']
+        summary[prefix + 'price'] += item['price']
+        for field in ('bytes_down', 'bytes_up'):
+            if field in summary:
+                summary[field] += item[field]
+
+
+def fold_sketches(fold, records, sketches, numbers):
+    """Add records to sketches which are maintained, that is not None."""
+    if sketches is not None and fold is fold_calls:
+        fold_call_sketches(sketches, records)
+    if numbers is not None and fold is not fold_data:
+        fold_distinct(
+            numbers, records, 'call_' if fold is fold_calls else 'sms_'
+        )
+
+
+def add_sketches(summary, sketches, numbers, percentiles):
+    """Add percentiles and distinct counts from sketches to summary."""
+    if sketches is not None:
+        summary.update(sketch_percentiles(sketches, percentiles, 'call_'))
+    if numbers is not None:
+        summary.update(distinct_counts(numbers))
+    return summary
+
+
+def line_summary(line, summary):
+    """Complete summary of line the way summary command does."""
+    summary['public_number'] = line['public_number']
+    summary['id'] = line['id']
+    summary['price'] = (
+        summary['data_price'] + summary['call_price'] + summary['sms_price']
+    )
+    return summary
+
+
+class SummaryStore(object):
+
+    """Storage of materialized summaries in cache directory."""
+
+    def __init__(self, directory=None):
+        """Create store, using XDG cache directory by default."""
+        if directory is None:
+            directory = save_cache_path('odorik')
+        elif not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+
+    def get_filename(self, kind, *key):
+        """Return file name for stored state."""
+        digest = hashlib.sha1(
+            json.dumps(key, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(
+            self.directory, '{0}-{1}.json'.format(kind, digest[:16])
+        )
+
+    def load(self, kind, *key):
+        """Load stored state, returning empty one if there is none."""
+        try:
+            with open(self.get_filename(kind, *key)) as handle:
+                return json.load(handle)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save(self, state, kind, *key):
+        """Atomically store state."""
+        handle, name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as output:
+            json.dump(state, output)
+        os.replace(name, self.get_filename(kind, *key))
+
+
+class IncrementalSummary(object):
+
+    """Line summary updated by folding in new records."""
+
+    def __init__(self, client, store):
+        """Create summary using API client and state store."""
+        self.client = client
+        self.store = store
+
+    def get_key(self, from_date):
+        """Return key identifying summaries of the period."""
+        return (self.client.url, self.client.user, from_date.isoformat())
+
+    @staticmethod
+    def fetch_new(fetch, start, end, seen):
+        """Fetch records not yet included in the summary.
+
+        Returns new records and ids which can be returned again by the next
+        refresh, that is those within overlap window before end.
+        """
+        records = fetch(start, end)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=tzlocal())
+        threshold = end - REFRESH_OVERLAP
+        return (
+            [record for record in records if record['id'] not in seen],
+            [
+                record['id'] for record in records
+                if dateutil.parser.parse(record['date']) >= threshold
+            ],
+        )
+
+    @staticmethod
+    def is_usable(state, to_date, percentiles, distinct):
+        """Check whether stored state can be refreshed up to to_date.
+
+        It can not when going backwards in time or when requested sketches
+        were not maintained.
+        """
+        if not state.get('cursor'):
+            return False
+        if (percentiles and state['sketches'] is None) or \
+                (distinct and state['distinct'] is None):
+            return False
+        return dateutil.parser.parse(state['cursor']) <= to_date
+
+    @staticmethod
+    def new_state(percentiles, distinct):
+        """Return empty state, sketches are stored only if maintained."""
+        return {
+            'summary': empty_summary(),
+            'seen': {},
+            'sketches': (
+                dump_sketches(empty_sketches()) if percentiles else None
+            ),
+            'distinct': (
+                dump_sketches(empty_distinct()) if distinct else None
+            ),
+        }
+
+    def get_sources(self, line):
+        """Return kind, fold function and fetch function of records."""
+        return (
+            ('calls', fold_calls, lambda start, end: self.client.calls(
+                start, end, line['id']
+            )),
+            ('sms', fold_sms, lambda start, end: self.client.sms(
+                start, end, line['id']
+            )),
+            ('data', fold_data, lambda start, end: self.client.mobile_data(
+                start, end, line['public_number']
+            )),
+        )
+
+    def refresh_line(self, line, from_date, to_date, state,
+                     percentiles=False, distinct=False):
+        """Update state of one line up to to_date.
+
+        Sketches are maintained only once they were asked for by
+        percentiles or distinct.
+        """
+        if 'distinct' not in state:
+            # Stored by older version
+            state = {}
+        percentiles = percentiles or state.get('sketches') is not None
+        distinct = distinct or state.get('distinct') is not None
+        start = from_date
+        if self.is_usable(state, to_date, percentiles, distinct):
+            cursor = dateutil.parser.parse(state['cursor'])
+            if cursor == to_date:
+                return state
+            start = max(from_date, cursor - REFRESH_OVERLAP)
+        else:
+            state = self.new_state(percentiles, distinct)
+        seen = state['seen']
+        sketches = load_sketches(state['sketches']) if percentiles else None
+        numbers = load_distinct(state['distinct']) if distinct else None
+        for kind, fold, fetch in self.get_sources(line):
+            records, ids = self.fetch_new(
+                fetch, start, to_date, set(seen.get(kind, ()))
+            )
+            fold(state['summary'], records)
+            fold_sketches(fold, records, sketches, numbers)
+            seen[kind] = ids
+        if percentiles:
+            state['sketches'] = dump_sketches(sketches)
+        if distinct:
+            state['distinct'] = dump_sketches(numbers)
+        state['cursor'] = to_date.isoformat()
+        return state
+
+    def summarize(self, lines, from_date, to_date, percentiles=None,
+                  distinct=False):
+        """Return summaries of lines, updating stored state."""
+        key = self.get_key(from_date)
+        stored = self.store.load('summary', *key)
+        result = {}
+        for line in lines:
+            line_id = '{0}'.format(line['id'])
+            stored[line_id] = state = self.refresh_line(
+                line, from_date, to_date, stored.get(line_id, {}),
+                bool(percentiles), distinct
+            )
+            result[line['name']] = add_sketches(
+                line_summary(line, dict(state['summary'])),
+                load_sketches(state['sketches']) if percentiles else None,
+                load_distinct(state['distinct']) if distinct else None,
+                percentiles
+            )
+        self.store.save(stored, 'summary', *key)
+        return result
+
+
+# Last second of a day, used for ending periods
+DAY_END = time(23, 59, 59)
+
+
+def local_day(value):
+    """Return local day of record date."""
+    return dateutil.parser.parse(value).astimezone(tzlocal()).date()
+
+
+def to_local(value):
+    """Convert datetime to naive local time."""
+    if value.tzinfo is not None:
+        value = value.astimezone(tzlocal()).replace(tzinfo=None)
+    return value
+
+
+def midnight(day):
+    """Return datetime of day start."""
+    return datetime(day.year, day.month, day.day)
+
+
+class LineIndex(object):
+
+    """Daily aggregates of single line with prefix sums.
+
+    The days are stored as contiguous list starting at first day, so
+    summary of any range of days is difference of two prefix sums.
+    """
+
+    def __init__(self, state=None, percentiles=False, distinct=False):
+        """Create index from stored state.
+
+        Sketches are maintained only once they were asked for by
+        percentiles or distinct.
+        """
+        if not state or 'distinct' not in state:
+            # Empty or stored by older version
+            state = {}
+        percentiles = percentiles or state.get('sketches') is not None
+        distinct = distinct or state.get('distinct') is not None
+        if (percentiles and state.get('sketches') is None) or \
+                (distinct and state.get('distinct') is None):
+            # Sketches were not maintained, all days have to be fetched
+            state = {}
+        self.first = None
+        if state.get('first'):
+            self.first = dateutil.parser.parse(state['first']).date()
+        self.days = state.get('days', [])
+        self.complete = state.get('complete', [])
+        # Stored state of call sketches, None for days without calls or
+        # for whole index if not maintained
+        self.sketches = state.get('sketches', []) if percentiles else None
+        # Stored state of distinct count sketches, None for days without
+        # calls or SMS or for whole index if not maintained
+        self.distinct = state.get('distinct', []) if distinct else None
+        self.prefix = None
+
+    def get_state(self):
+        """Return state for storing."""
+        return {
+            'first': self.first.isoformat() if self.first else None,
+            'days': self.days,
+            'complete': self.complete,
+            'sketches': self.sketches,
+            'distinct': self.distinct,
+        }
+
+    def extend(self, start, end):
+        """Extend index to cover days from start to end (exclusive)."""
+        if self.first is None:
+            self.first = start
+        if start < self.first:
+            count = (self.first - start).days
+            self.days[:0] = [empty_summary() for dummy in range(count)]
+            self.complete[:0] = [False] * count
+            if self.sketches is not None:
+                self.sketches[:0] = [None] * count
+            if self.distinct is not None:
+                self.distinct[:0] = [None] * count
+            self.first = start
+        count = (end - self.first).days - len(self.days)
+        if count > 0:
+            self.days.extend(empty_summary() for dummy in range(count))
+            self.complete.extend([False] * count)
+            if self.sketches is not None:
+                self.sketches.extend([None] * count)
+            if self.distinct is not None:
+                self.distinct.extend([None] * count)
+        self.prefix = None
+
+    def missing(self, start, end):
+        """Return list of spans of days which are not complete."""
+        self.extend(start, end)
+        result = []
+        offset = (start - self.first).days
+        for index in range(offset, offset + (end - start).days):
+            if self.complete[index]:
+                continue
+            day = self.first + timedelta(days=index)
+            if result and result[-1][1] == day:
+                result[-1] = (result[-1][0], day + timedelta(days=1))
+            else:
+                result.append((day, day + timedelta(days=1)))
+        return result
+
+    def fill(self, start, end, sources, closed):
+        """Replace days in span by fetched records.
+
+        Only days ending before closed are marked as complete.
+        """
+        offset = (start - self.first).days
+        count = (end - start).days
+        days = [[] for dummy in range(count)]
+        for fold, records in sources:
+            for record in records:
+                index = (local_day(record['date']) - start).days
+                if 0 <= index < count:
+                    days[index].append((fold, record))
+        for index, records in enumerate(days):
+            self.set_day(offset + index, records)
+            day = start + timedelta(days=index + 1)
+            self.complete[offset + index] = midnight(day) <= closed
+        self.prefix = None
+
+    def set_day(self, position, records):
+        """Replace single day by records with their fold functions.
+
+        Sketches are stored as None for days without records they count.
+        """
+        summary = empty_summary()
+        sketches = empty_sketches() if self.sketches is not None else None
+        numbers = empty_distinct() if self.distinct is not None else None
+        folds = set()
+        for fold, record in records:
+            fold(summary, (record,))
+            fold_sketches(fold, (record,), sketches, numbers)
+            folds.add(fold)
+        self.days[position] = summary
+        if sketches is not None:
+            self.sketches[position] = (
+                dump_sketches(sketches) if fold_calls in folds else None
+            )
+        if numbers is not None:
+            self.distinct[position] = (
+                dump_sketches(numbers) if folds - {fold_data} else None
+            )
+
+    def build_prefix(self):
+        """Calculate cumulative sums of days."""
+        current = empty_summary()
+        self.prefix = [dict(current)]
+        for day in self.days:
+            for field in SUMMARY_FIELDS:
+                current[field] += day[field]
+            self.prefix.append(dict(current))
+
+    def range_summary(self, start, end):
+        """Return summary of days from start to end (exclusive)."""
+        if self.prefix is None:
+            self.build_prefix()
+        first = self.prefix[(start - self.first).days]
+        last = self.prefix[(end - self.first).days]
+        return {field: last[field] - first[field] for field in SUMMARY_FIELDS}
+
+    def range_distinct(self, start, end):
+        """Return merged distinct count sketches of days from start to end."""
+        result = empty_distinct()
+        offset = (start - self.first).days
+        for state in self.distinct[offset:offset + (end - start).days]:
+            if state is None:
+                continue
+            for field, sketch in load_distinct(state).items():
+                result[field].merge(sketch)
+        return result
+
+    def range_sketches(self, start, end):
+        """Return merged call sketches of days from start to end."""
+        result = empty_sketches()
+        offset = (start - self.first).days
+        for state in self.sketches[offset:offset + (end - start).days]:
+            if state is None:
+                continue
+            for field, sketch in load_sketches(state).items():
+                result[field].merge(sketch)
+        return result
+
+
+class DailyIndex(object):
+
+    """Range summaries served from stored daily aggregates.
+
+    Whole days are fetched from the API only once they are missing in the
+    index, partial days at the range edges are always fetched.
+    """
+
+    def __init__(self, client, store):
+        """Create index using API client and state store."""
+        self.client = client
+        self.store = store
+
+    def get_key(self, line):
+        """Return key identifying index of the line."""
+        return (self.client.url, self.client.user, line['id'])
+
+    def get_sources(self, line, from_date, to_date):
+        """Fetch records of the line in interval."""
+        return (
+            (fold_calls, self.client.calls(from_date, to_date, line['id'])),
+            (fold_sms, self.client.sms(from_date, to_date, line['id'])),
+            (fold_data, self.client.mobile_data(
+                from_date, to_date, line['public_number']
+            )),
+        )
+
+    @staticmethod
+    def split(from_date, to_date):
+        """Split interval to whole days and partial days on the edges.
+
+        Ending at last second of a day, as periods ending at the end of a
+        month do, is treated as ending at following midnight.
+        """
+        from_date = to_local(from_date)
+        to_date = to_local(to_date)
+        if to_date.time() >= DAY_END:
+            to_date = midnight(to_date.date() + timedelta(days=1))
+        start = from_date.date()
+        if from_date != midnight(start):
+            start += timedelta(days=1)
+        end = to_date.date()
+        if start > end:
+            # Interval within single day
+            return None, [(from_date, to_date)]
+        edges = []
+        if from_date < midnight(start):
+            edges.append((from_date, midnight(start)))
+        if to_date > midnight(end):
+            edges.append((midnight(end), to_date))
+        return (start, end), edges
+
+    def plan_line(self, line, index, periods, schedule):
+        """Plan fetching of records of line needed for periods.
+
+        Returns whole days and scheduled partial days on the edges of
+        every period and scheduled spans of days missing in the index.
+        """
+        spans = []
+        parts = []
+        for from_date, to_date in periods:
+            days, edges = self.split(from_date, to_date)
+            if days is not None:
+                for span in index.missing(*days):
+                    if span not in spans:
+                        spans.append(span)
+            parts.append((days, [
+                (edge[0].date(), schedule(line, *edge)) for edge in edges
+            ]))
+        fills = [
+            (span, schedule(line, midnight(span[0]), midnight(span[1])))
+            for span in spans
+        ]
+        return parts, fills
+
+    @staticmethod
+    def summarize_part(line, index, part, results, percentiles, distinct):
+        """Return summary of whole days from index and fetched edges."""
+        days, edges = part
+        if days is None:
+            summary = empty_summary()
+            sketches = empty_sketches() if percentiles else None
+            numbers = empty_distinct() if distinct else None
+        else:
+            summary = index.range_summary(*days)
+            sketches = index.range_sketches(*days) if percentiles else None
+            numbers = index.range_distinct(*days) if distinct else None
+        for day, task in edges:
+            for fold, records in results[task]:
+                records = [
+                    record for record in records
+                    if local_day(record['date']) == day
+                ]
+                fold(summary, records)
+                fold_sketches(fold, records, sketches, numbers)
+        return add_sketches(
+            line_summary(line, summary), sketches, numbers, percentiles
+        )
+
+    def summarize_periods(self, lines, periods, executor=None,
+                          percentiles=None, distinct=False):
+        """Return summaries of lines in every period.
+
+        All requests needed for all lines are collected first and then
+        executed using executor, if given, in parallel.
+        """
+        tasks = []
+
+        def schedule(line, from_date, to_date):
+            """Add fetching of records to tasks."""
+            tasks.append((line, from_date, to_date))
+            return len(tasks) - 1
+
+        plans = []
+        for line in lines:
+            index = LineIndex(
+                self.store.load('daily', *self.get_key(line)),
+                bool(percentiles), distinct
+            )
+            plans.append(
+                (line, index) + self.plan_line(line, index, periods, schedule)
+            )
+
+        if executor is None:
+            results = [self.get_sources(*task) for task in tasks]
+        else:
+            results = list(executor.map(
+                lambda task: self.get_sources(*task), tasks
+            ))
+
+        closed = datetime.now() - REFRESH_OVERLAP
+        result = {}
+        for line, index, parts, fills in plans:
+            for span, task in fills:
+                index.fill(span[0], span[1], results[task], closed)
+            if fills:
+                self.store.save(
+                    index.get_state(), 'daily', *self.get_key(line)
+                )
+            result[line['name']] = [
+                self.summarize_part(
+                    line, index, part, results, percentiles, distinct
+                )
+                for part in parts
+            ]
+        return result
+
+    def summarize(self, lines, from_date, to_date, executor=None,
+                  percentiles=None, distinct=False):
+        """Return summaries of lines in interval."""
+        return {
+            name: summaries[0] for name, summaries in self.summarize_periods(
+                lines, ((from_date, to_date),), executor, percentiles,
+                distinct
+            ).items()
+        }
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Local mock of the Odorik API for load testing.
+
+The server can be started by ``python -m odorik.mockserver``.
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import bisect
+import json
+import random
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import dateutil.parser
+from dateutil.tz import tzutc
+
+from odorik import synthetic
+
+PREFIX = '/api/v1/'
+
+MOBILE_DATA = re.compile('^sim_cards/(?:([0-9]+)/)?mobile_data.json$')
+
+
+def parse_date(value):
+    """Parse date from request parameter to naive UTC datetime."""
+    result = dateutil.parser.parse(value)
+    if result.tzinfo is not None:
+        result = result.astimezone(tzutc()).replace(tzinfo=None)
+    return result
+
+
+class Dataset(object):
+
+    """Synthetic records indexed by date."""
+
+    def __init__(self, records):
+        """Store chronologically sorted records."""
+        self.records = records
+        self.dates = [
+            datetime.strptime(record['date'], '%Y-%m-%dT%H:%M:%SZ')
+            for record in records
+        ]
+
+    def select(self, from_date, to_date, **filters):
+        """Return records in interval matching filters."""
+        start = bisect.bisect_left(self.dates, from_date)
+        end = bisect.bisect_right(self.dates, to_date)
+        result = self.records[start:end]
+        for key, value in filters.items():
+            if value is not None:
+                result = [
+                    record for record in result
+                    if '{0}'.format(record[key]) == value
+                ]
+        return result
+
+
+class TokenBucket(object):
+
+    """Token bucket rate limiter."""
+
+    def __init__(self, rate, burst=None):
+        """Create bucket allowing rate requests per second."""
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Consume token if available."""
+        with self.lock:
+            now = time.time()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    """HTTP handler emulating the API."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def send_body(self, status, body, content_type='text/plain'):
+        """Send response."""
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', '{0}'.format(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, value):
+        """Send JSON response."""
+        self.send_body(200, json.dumps(value), 'application/json')
+
+    def handle_request(self, method, params):
+        """Emulate network conditions and dispatch request."""
+        server = self.server
+        server.count_request()
+        url = urlparse(self.path)
+        if not url.path.startswith(PREFIX):
+            self.send_body(404, 'error not_found')
+            return
+        path = url.path[len(PREFIX):]
+        params.update(parse_qs(url.query))
+        params = {key: value[-1] for key, value in params.items()}
+        delay, fail = server.get_conditions()
+        if delay:
+            time.sleep(delay)
+        if server.bucket is not None and not server.bucket.allow():
+            self.send_body(429, 'error too_many_requests')
+            return
+        if fail:
+            self.send_body(500, 'error internal_error')
+            return
+        if server.user and (
+                params.get('user') != server.user or
+                params.get('password') != server.password):
+            if path.endswith('.json'):
+                self.send_json({'errors': ['authentication_failed']})
+            else:
+                self.send_body(200, 'error authentication_failed')
+            return
+        if method == 'POST':
+            self.dispatch_post(path, params)
+        else:
+            self.dispatch_get(path, params)
+
+    def dispatch_get(self, path, params):
+        """Handle GET requests."""
+        server = self.server
+        if path == 'balance':
+            self.send_body(200, '{0}'.format(server.balance))
+        elif path == 'lines.json':
+            self.send_json(server.lines)
+        elif path == 'sms/allowed_sender':
+            self.send_body(200, 'Odorik.cz,5517,00420789123456')
+        elif path in ('calls.json', 'sms.json') or MOBILE_DATA.match(path):
+            self.dispatch_records(path, params)
+        else:
+            self.send_body(404, 'error not_found')
+
+    def dispatch_records(self, path, params):
+        """Handle record listing requests."""
+        server = self.server
+        try:
+            from_date = parse_date(params['from'])
+            to_date = parse_date(params['to'])
+        except (KeyError, ValueError):
+            self.send_json({'errors': ['invalid_date']})
+            return
+        if path == 'calls.json':
+            result = server.calls.select(
+                from_date, to_date,
+                line=params.get('line'),
+                status=params.get('status'),
+                direction=params.get('direction'),
+            )
+        elif path == 'sms.json':
+            result = server.sms.select(
+                from_date, to_date, line=params.get('line')
+            )
+        else:
+            result = server.data.select(
+                from_date, to_date,
+                phone_number=MOBILE_DATA.match(path).group(1)
+            )
+        self.send_json(result)
+
+    def dispatch_post(self, path, params):
+        """Handle POST requests."""
+        if path == 'sms':
+            if params.get('sender') == '5517':
+                self.send_body(200, 'successfully_sent 132.44')
+            else:
+                self.send_body(200, 'error unsupported_recipient')
+        elif path == 'callback':
+            self.send_body(200, 'callback_ordered')
+        else:
+            self.send_body(404, 'error not_found')
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle GET request."""
+        self.handle_request('GET', {})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handle POST request."""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        self.handle_request('POST', parse_qs(body))
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Silence request logging."""
+
+
+class MockServer(ThreadingMixIn, HTTPServer):
+
+    """Mock API server with configurable network conditions."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit=None, user='', password='', records=10000,
+                 lines=10, seed=0):
+        """Create server with synthetic data ending at current time."""
+        HTTPServer.__init__(self, address, MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket = None
+        if rate_limit:
+            self.bucket = TokenBucket(rate_limit)
+        self.user = user
+        self.password = password
+        self.balance = 123.45
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        # Records are roughly five minutes apart, end them at current time
+        start = datetime.utcnow() - timedelta(seconds=records * 300)
+        self.lines = synthetic.generate_lines(lines, seed)
+        self.calls = Dataset(list(
+            synthetic.generate_calls(records, seed, lines, start)
+        ))
+        self.sms = Dataset(list(
+            synthetic.generate_sms(records // 2, seed, lines, start)
+        ))
+        self.data = Dataset(list(
+            synthetic.generate_data(records // 10, seed, lines, start)
+        ))
+
+    @property
+    def url(self):
+        """API URL of the server."""
+        return 'http://{0}:{1}{2}'.format(
+            self.server_address[0], self.server_address[1], PREFIX
+        )
+
+    def count_request(self):
+        """Count handled request."""
+        with self.lock:
+            self.requests += 1
+
+    def get_conditions(self):
+        """Return delay and whether to fail the request."""
+        with self.lock:
+            delay = self.latency
+            if self.jitter:
+                delay += self.random.uniform(-self.jitter, self.jitter)
+            fail = self.random.random() < self.error_rate
+        return max(delay, 0), fail
+
+    def start(self):
+        """Start serving in background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop the server."""
+        self.shutdown()
+        self.server_close()
+
+
+def add_server_arguments(parser):
+    """Add arguments configuring mock server."""
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Response latency in seconds',
+    )
+    parser.add_argument(
+        '--jitter', type=float, default=0.0,
+        help='Maximal random deviation from latency in seconds',
+    )
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0,
+        help='Ratio of requests failing with internal error',
+    )
+    parser.add_argument(
+        '--rate-limit', type=float,
+        help='Number of requests per second allowed before throttling',
+    )
+    parser.add_argument(
+        '--records', type=int, default=10000,
+        help='Number of generated calls',
+    )
+    parser.add_argument(
+        '--lines', type=int, default=10,
+        help='Number of generated lines',
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed for data generator',
+    )
+
+
+def create_server(args, address=('127.0.0.1', 0)):
+    """Create server configured from parsed arguments."""
+    return MockServer(
+        address,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        records=args.records,
+        lines=args.lines,
+        seed=args.seed,
+    )
+
+
+def main(args=None):
+    """Run standalone mock server."""
+    parser = ArgumentParser(description='Mock Odorik API server.')
+    parser.add_argument(
+        '--bind', default='127.0.0.1', help='Address to listen on',
+    )
+    parser.add_argument(
+        '--port', type=int, default=8088, help='Port to listen on',
+    )
+    add_server_arguments(parser)
+    args = parser.parse_args(args)
+    server = create_server(args, (args.bind, args.port))
+    print('Serving mock API at {0}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
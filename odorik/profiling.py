@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""CPU and memory profiling of command execution."""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+
+MEMORY_SUFFIX = '.memory.txt'
+
+
+class Profiler(object):
+
+    """CPU and memory profiler."""
+
+    def __init__(self, limit=10):
+        """Create profiler reporting limit top entries."""
+        self.limit = limit
+        self.profile = cProfile.Profile()
+        self.snapshot = None
+        self.peak = 0
+
+    def start(self):
+        """Start profiling."""
+        tracemalloc.start()
+        self.profile.enable()
+
+    def stop(self):
+        """Stop profiling."""
+        self.profile.disable()
+        self.snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def get_stats(self, stream):
+        """Return pstats object sorted by cumulative time."""
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats('cumulative')
+        return stats
+
+    def get_allocations(self, limit=None):
+        """Return top allocation sites."""
+        statistics = self.snapshot.statistics('lineno')
+        if limit is None:
+            return statistics
+        return statistics[:limit]
+
+    def write(self, path):
+        """Write pstats dump and allocations report.
+
+        The pstats file is written to path and the allocations report to path
+        with .memory.txt suffix.
+        """
+        self.profile.dump_stats(path)
+        with io.open(path + MEMORY_SUFFIX, 'w', encoding='utf-8') as handle:
+            handle.write('Peak traced memory: {0} KiB\n\n'.format(
+                self.peak // 1024
+            ))
+            for statistic in self.get_allocations(100):
+                handle.write('{0}\n'.format(statistic))
+
+    def report(self, stream):
+        """Print short summary of hot spots."""
+        print('CPU hot spots (cumulative time):', file=stream)
+        self.get_stats(stream).print_stats(self.limit)
+        print(
+            'Peak traced memory: {0} KiB'.format(self.peak // 1024),
+            file=stream
+        )
+        print('Top allocations:', file=stream)
+        for statistic in self.get_allocations(self.limit):
+            print('  {0}'.format(statistic), file=stream)
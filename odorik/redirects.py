@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Resolving of redirected calls to their originating calls.
+
+Redirected call legs reference the call they were redirected from by the
+redirection_parent_id field. The chains are resolved while streaming using
+union-find index over call ids, so every record is processed once in
+amortized constant time regardless of the order of the records.
+"""
+from __future__ import unicode_literals
+
+# Fields of resolved call taken from the originating call
+ORIGIN_FIELDS = (
+    'id', 'date', 'line', 'direction', 'source_number',
+    'destination_number', 'destination_name',
+)
+
+
+class RedirectIndex(object):
+
+    """Index of redirect chains keyed by originating call id."""
+
+    def __init__(self):
+        """Create empty index."""
+        # Link to parent call, roots link to themselves
+        self.parents = {}
+        # Totals of chains keyed by root call id
+        self.chains = {}
+
+    def find(self, key):
+        """Return id of originating call, compressing the path."""
+        parents = self.parents
+        while parents[key] != key:
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    @staticmethod
+    def empty_chain(key):
+        """Create totals of chain."""
+        result = {field: None for field in ORIGIN_FIELDS}
+        result.update({'id': key, 'legs': 0, 'length': 0, 'price': 0.0})
+        return result
+
+    @staticmethod
+    def merge(target, source):
+        """Merge totals of chain into other one."""
+        target['legs'] += source['legs']
+        target['length'] += source['length']
+        target['price'] += source['price']
+        if source['date'] is not None and (
+                target['date'] is None or source['date'] < target['date']):
+            target['date'] = source['date']
+
+    def add(self, record):
+        """Add call to the index."""
+        key = record['id']
+        parent = record.get('redirection_parent_id')
+        self.parents.setdefault(key, key)
+        # Legs redirected from this call might have been seen already
+        chain = self.chains.pop(key, None) or self.empty_chain(key)
+        self.merge(chain, {
+            'legs': 1,
+            'length': record.get('length') or 0,
+            'price': record.get('price') or 0.0,
+            'date': record.get('date'),
+        })
+        if parent is None or parent == key:
+            root = key
+            for field in ORIGIN_FIELDS:
+                chain[field] = record.get(field)
+        else:
+            self.parents.setdefault(parent, parent)
+            root = self.find(parent)
+            self.parents[key] = root
+        if root in self.chains:
+            self.merge(self.chains[root], chain)
+        else:
+            if root != key:
+                chain['id'] = root
+            self.chains[root] = chain
+
+    def extend(self, records):
+        """Add all calls to the index."""
+        for record in records:
+            self.add(record)
+
+    def results(self):
+        """Return resolved calls ordered by date.
+
+        Calls redirected from call which was not indexed are returned under
+        id of that call without originating call details.
+        """
+        return sorted(
+            self.chains.values(),
+            key=lambda chain: (chain['date'] or '', chain['id'])
+        )
+
+
+def resolve_redirects(records):
+    """Return effective duration and cost per originating call."""
+    index = RedirectIndex()
+    index.extend(records)
+    return index.results()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Periodic execution of jobs with jitter and coalescing of overlapping runs.
+
+Jobs due at the same time are started together in one tick and share
+context created for the tick, which is used to share fetched data.
+"""
+from __future__ import unicode_literals
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+OVERLAP_MODES = ('skip', 'merge')
+
+
+class Job(object):
+
+    """Periodically executed job."""
+
+    def __init__(self, name, interval, jitter=0, overlap='skip', data=None):
+        """Create job executed every interval seconds."""
+        if interval <= 0:
+            raise ValueError('Interval has to be positive')
+        if overlap not in OVERLAP_MODES:
+            raise ValueError('Invalid overlap mode: {0}'.format(overlap))
+        self.name = name
+        self.interval = interval
+        self.jitter = jitter
+        self.overlap = overlap
+        self.data = data
+        self.next_run = None
+        self.running = False
+        self.pending = False
+        self.runs = 0
+        self.skipped = 0
+        self.merged = 0
+        self.errors = 0
+
+
+class Scheduler(object):
+
+    """Execute jobs periodically in a thread pool.
+
+    The execute callable is invoked with job and context, the context is
+    created by prepare callable once for all jobs started in a tick.
+    """
+
+    def __init__(self, jobs, execute, prepare=None, max_workers=4,
+                 clock=time.time, seed=None):
+        """Create scheduler for jobs."""
+        self.jobs = jobs
+        self.execute = execute
+        self.prepare = prepare or (lambda now: None)
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def start(self, now=None):
+        """Plan first run of all jobs, spread by their jitter."""
+        if now is None:
+            now = self.clock()
+        for job in self.jobs:
+            job.next_run = now + self.random.uniform(0, job.jitter)
+
+    def tick(self, now=None):
+        """Start all due jobs, returning list of started ones.
+
+        Job which is still running is skipped or merged to one run following
+        the current one depending on its overlap mode.
+        """
+        if now is None:
+            now = self.clock()
+        started = []
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            job.next_run += job.interval
+            if job.next_run <= now:
+                # Fell behind, do not try to catch up missed runs
+                job.next_run = now + job.interval
+            with self.lock:
+                if job.running:
+                    if job.overlap == 'merge':
+                        job.pending = True
+                        job.merged += 1
+                    else:
+                        job.skipped += 1
+                    continue
+                job.running = True
+            started.append(job)
+        if started:
+            context = self.prepare(now)
+            for job in started:
+                self.executor.submit(self.run_job, job, context)
+        return started
+
+    def run_job(self, job, context):
+        """Execute job, repeating it if overlapping runs were merged."""
+        while True:
+            try:
+                self.execute(job, context)
+            except Exception:  # pylint: disable=broad-except
+                job.errors += 1
+            job.runs += 1
+            with self.lock:
+                if not job.pending or self.stopped.is_set():
+                    job.running = False
+                    job.pending = False
+                    return
+                job.pending = False
+            context = self.prepare(self.clock())
+
+    def get_delay(self, now=None):
+        """Return number of seconds until next due job."""
+        if now is None:
+            now = self.clock()
+        return max(0, min(job.next_run for job in self.jobs) - now)
+
+    def run(self):
+        """Run jobs until stopped."""
+        self.start()
+        try:
+            while not self.stopped.is_set():
+                self.tick()
+                self.stopped.wait(self.get_delay())
+        finally:
+            self.stop()
+            self.shutdown()
+
+    def run_once(self):
+        """Run every job once in a single tick and wait for completion."""
+        self.start()
+        now = self.clock()
+        for job in self.jobs:
+            job.next_run = now
+        self.tick(now)
+        self.shutdown()
+
+    def stop(self):
+        """Stop running jobs after current runs."""
+        self.stopped.set()
+
+    def shutdown(self):
+        """Wait for running jobs to complete."""
+        self.executor.shutdown(wait=True)
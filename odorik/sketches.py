@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Mergeable streaming sketches of records.
+
+The sketches use bounded memory regardless of number of processed values,
+can be merged together and serialized to JSON compatible state.
+"""
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+import math
+
+# Accuracy parameter of the quantile sketch, the rank error is about 1.7/k
+DEFAULT_K = 200
+
+# Precision of the distinct count sketch, the error is about 1.04/sqrt(2^p)
+DEFAULT_PRECISION = 12
+
+# Number of distinct values counted exactly
+EXACT_LIMIT = 1000
+
+
+def parse_percentiles(value):
+    """Parse comma separated list of percentiles."""
+    result = []
+    for item in value.split(','):
+        pct = float(item)
+        if not 0 < pct <= 100:
+            raise ValueError('Percentile has to be between 0 and 100')
+        result.append(pct)
+    return result
+
+
+def percentile_name(field, pct):
+    """Return field name for percentile."""
+    return '{0}_p{1:g}'.format(field, pct)
+
+
+class QuantileSketch(object):
+
+    """KLL sketch of values distribution.
+
+    Values are kept in levels of compactors, each value at level h stands
+    for 2^h original values. Once level is full, it is sorted and every
+    other value is promoted to next level. While nothing was compacted, the
+    quantiles are exact.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        """Create empty sketch."""
+        self.k = k
+        self.levels = [[]]
+        self.count = 0
+        self.size = 0
+        self.offset = 0
+
+    def __len__(self):
+        """Return number of values added to the sketch."""
+        return self.count
+
+    def capacity(self, level):
+        """Return capacity of the level, lower levels are smaller."""
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def compress(self):
+        """Compact levels until the sketch fits into its capacity."""
+        while self.size >= sum(
+                self.capacity(level) for level in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) < self.capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                # Odd item stays on the level
+                keep = [items.pop()] if len(items) % 2 else []
+                # Alternate which half is promoted to avoid bias
+                self.offset ^= 1
+                promoted = items[self.offset::2]
+                self.levels[level + 1].extend(promoted)
+                self.levels[level] = keep
+                self.size -= len(items) - len(promoted)
+                break
+
+    def update(self, value):
+        """Add value to the sketch."""
+        self.levels[0].append(value)
+        self.count += 1
+        self.size += 1
+        if len(self.levels[0]) >= self.capacity(0):
+            self.compress()
+
+    def extend(self, values):
+        """Add values to the sketch."""
+        for value in values:
+            self.update(value)
+
+    def merge(self, other):
+        """Merge other sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.size += other.size
+        self.compress()
+        return self
+
+    def quantile(self, pct):
+        """Return percentile of values using nearest rank method."""
+        if not self.count:
+            return None
+        items = sorted(
+            (value, 1 << level)
+            for level, values in enumerate(self.levels)
+            for value in values
+        )
+        total = sum(weight for value, weight in items)
+        rank = max(int(math.ceil(pct / 100.0 * total)), 1)
+        cumulative = 0
+        for value, weight in items:
+            cumulative += weight
+            if cumulative >= rank:
+                return value
+        return items[-1][0]
+
+    def get_state(self):
+        """Return JSON serializable state."""
+        return {'k': self.k, 'count': self.count, 'levels': self.levels}
+
+    @classmethod
+    def from_state(cls, state):
+        """Create sketch from stored state."""
+        result = cls(state['k'])
+        result.levels = [list(items) for items in state['levels']]
+        result.count = state['count']
+        result.size = sum(len(items) for items in result.levels)
+        return result
+
+
+class DistinctSketch(object):
+
+    """HyperLogLog sketch counting distinct values.
+
+    Small number of values is kept as a set and counted exactly, larger
+    sets are converted to registers of the HyperLogLog estimator.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, limit=EXACT_LIMIT):
+        """Create empty sketch."""
+        self.precision = precision
+        self.limit = limit
+        self.values = set()
+        self.registers = None
+
+    def __len__(self):
+        """Return estimated number of distinct values."""
+        return self.count()
+
+    def add_hash(self, value):
+        """Add value to the registers."""
+        digest = hashlib.sha1(value.encode('utf-8')).digest()
+        hashed = int(base64.b16encode(digest[:8]), 16)
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def convert(self):
+        """Switch from exact set to registers."""
+        self.registers = bytearray(1 << self.precision)
+        for value in self.values:
+            self.add_hash(value)
+        self.values = None
+
+    def add(self, value):
+        """Add value to the sketch."""
+        value = '{0}'.format(value)
+        if self.values is None:
+            self.add_hash(value)
+            return
+        self.values.add(value)
+        if len(self.values) > self.limit:
+            self.convert()
+
+    def merge(self, other):
+        """Merge other sketch into this one."""
+        if self.values is not None and other.values is not None:
+            self.values.update(other.values)
+            if len(self.values) > self.limit:
+                self.convert()
+            return self
+        if self.values is not None:
+            self.convert()
+        if other.values is not None:
+            for value in other.values:
+                self.add_hash(value)
+        else:
+            self.registers = bytearray(
+                max(first, second)
+                for first, second in zip(self.registers, other.registers)
+            )
+        return self
+
+    def count(self):
+        """Return estimated number of distinct values."""
+        if self.values is not None:
+            return len(self.values)
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(
+            2.0 ** -register for register in self.registers
+        )
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Linear counting for small cardinalities
+            estimate = size * math.log(float(size) / zeros)
+        return int(round(estimate))
+
+    def get_state(self):
+        """Return JSON serializable state."""
+        if self.values is not None:
+            return {
+                'precision': self.precision,
+                'limit': self.limit,
+                'values': sorted(self.values),
+            }
+        return {
+            'precision': self.precision,
+            'limit': self.limit,
+            'registers': base64.b64encode(
+                bytes(self.registers)
+            ).decode('ascii'),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Create sketch from stored state."""
+        result = cls(state['precision'], state['limit'])
+        if 'values' in state:
+            result.values = set(state['values'])
+        else:
+            result.values = None
+            result.registers = bytearray(
+                base64.b64decode(state['registers'])
+            )
+        return result
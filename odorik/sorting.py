@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Sorting of records with bounded memory usage."""
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+import json
+import os
+import tempfile
+
+# Number of records kept in memory before spilling to disk
+DEFAULT_BUFFER = 100000
+
+
+def parse_sort(value):
+    """Parse sort specification, fields prefixed by - are descending."""
+    result = []
+    for field in value.split(','):
+        field = field.strip()
+        reverse = field.startswith('-')
+        if reverse:
+            field = field[1:]
+        if not field:
+            raise ValueError('Invalid sort field')
+        result.append((field, reverse))
+    return result
+
+
+class SortKey(object):
+
+    """Sort key honoring direction per field.
+
+    Missing values are always sorted last, values of different types are
+    compared as strings.
+    """
+
+    __slots__ = ('values', 'reverse')
+
+    def __init__(self, values, reverse):
+        """Create key from field values."""
+        self.values = values
+        self.reverse = reverse
+
+    def __lt__(self, other):
+        """Compare keys."""
+        for value, other_value, reverse in zip(
+                self.values, other.values, self.reverse):
+            if value == other_value:
+                continue
+            if value is None:
+                return False
+            if other_value is None:
+                return True
+            try:
+                less = value < other_value
+            except TypeError:
+                less = '{0}'.format(value) < '{0}'.format(other_value)
+            return less != reverse
+        return False
+
+    def __eq__(self, other):
+        """Compare keys for equality, needed for tuple comparison."""
+        return not self < other and not other < self
+
+    def __ne__(self, other):
+        """Compare keys for inequality."""
+        return not self == other
+
+    __hash__ = None
+
+
+def make_key(spec):
+    """Create key function for sort specification."""
+    fields = [field for field, reverse in spec]
+    reverse = tuple(reverse for field, reverse in spec)
+    return lambda record: SortKey(
+        tuple(record.get(field) for field in fields), reverse
+    )
+
+
+def spill(records, directory):
+    """Write sorted chunk to temporary file, returning its name."""
+    handle, name = tempfile.mkstemp(dir=directory, suffix='.jsonl')
+    with os.fdopen(handle, 'w') as output:
+        for record in records:
+            output.write(json.dumps(record))
+            output.write('\n')
+    return name
+
+
+def read_chunk(name):
+    """Read records from spilled chunk."""
+    with open(name) as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+def external_sort(records, key, buffer_size, directory):
+    """Sort records spilling sorted chunks to disk, merging them lazily."""
+    chunks = []
+    try:
+        while True:
+            chunk = list(itertools.islice(records, buffer_size))
+            if not chunk:
+                break
+            chunk.sort(key=key)
+            chunks.append(spill(chunk, directory))
+            del chunk
+        for record in heapq.merge(
+                *[read_chunk(name) for name in chunks], key=key):
+            yield record
+    finally:
+        for name in chunks:
+            os.unlink(name)
+
+
+def sort_records(records, spec=None, limit=None, buffer_size=DEFAULT_BUFFER,
+                 directory=None):
+    """Sort records by specification.
+
+    With limit only top records are kept in a bounded heap. Otherwise the
+    records are sorted in memory if they fit in buffer_size records, larger
+    inputs are sorted using external merge sort.
+    """
+    if not spec:
+        if limit is None:
+            return records
+        return list(itertools.islice(records, limit))
+    key = make_key(spec)
+    if limit is not None:
+        return heapq.nsmallest(limit, records, key=key)
+    records = iter(records)
+    head = list(itertools.islice(records, buffer_size + 1))
+    if len(head) <= buffer_size:
+        head.sort(key=key)
+        return head
+    return external_sort(
+        itertools.chain(head, records), key, buffer_size, directory
+    )
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Deterministic generator of synthetic API data.
+
+The records have same shape as responses of the Odorik API and are used for
+benchmarks and load testing. Same seed always produces same data.
+"""
+from __future__ import unicode_literals
+
+import json
+import random
+from datetime import datetime, timedelta
+
+START = datetime(2015, 1, 1)
+
+DESTINATIONS = (
+    ('*300000', 'Česká rep. - * v síti'),
+    ('00420799799799', 'Česká rep. - mobil'),
+    ('00420222333444', 'Česká rep. - pevná'),
+    ('00421905123456', 'Slovensko - mobil'),
+    ('00491511234567', 'Německo - mobil'),
+)
+
+
+def generate_lines(count, seed=0):
+    """Generate list of lines."""
+    rnd = random.Random(seed)
+    result = []
+    for i in range(count):
+        number = '00420{0:09d}'.format(799000000 + i)
+        result.append({
+            'incoming_call_name_format': 0,
+            'active_pin': rnd.random() < 0.5,
+            'active_anonymous': True,
+            'id': 123465 + i,
+            'active_greeting': False,
+            'connected_devices': [],
+            'missed_call_email': 'noreply@example.net',
+            'recording_email': 'noreply@example.net',
+            'sip_password': '{0:08d}'.format(rnd.randrange(100000000)),
+            'active_password': True,
+            'public_number': number,
+            'active_cz_restriction': False,
+            'active_iax': False,
+            'caller_id': number,
+            'active_ping': False,
+            'backup_number': None,
+            'incoming_call_number_format': 0,
+            'name': 'Line {0}'.format(i),
+            'active_sip': True,
+            'active_rtp': False,
+            'backup_number_email': None,
+            'voicemail_email': 'noreply@example.net',
+            'active_822': False,
+        })
+    return result
+
+
+def format_date(value):
+    """Format date the way API does."""
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def generate_calls(count, seed=0, lines=10, start=START):
+    """Generate calls in chronological order."""
+    rnd = random.Random(seed)
+    date = start
+    balance = 1000.0
+    last_id = 98292356
+    for i in range(count):
+        date += timedelta(seconds=rnd.randrange(1, 600))
+        direction = rnd.choice(('in', 'in', 'out', 'out', 'redirected'))
+        answered = rnd.random() < 0.8
+        destination, name = rnd.choice(DESTINATIONS)
+        length = rnd.randrange(1, 1800) if answered else 0
+        price_per_minute = 0.0 if direction == 'in' else rnd.choice(
+            (0.0, 0.45, 0.79, 1.2)
+        )
+        price = round(price_per_minute * length / 60, 4)
+        balance = round(balance - price, 4)
+        call_id = 98292358 + i
+        parent = None
+        if direction == 'redirected':
+            parent = last_id
+        last_id = call_id
+        yield {
+            'id': call_id,
+            'redirection_parent_id': parent,
+            'date': format_date(date),
+            'direction': direction,
+            'source_number': '00420555{0:06d}'.format(rnd.randrange(10000)),
+            'destination_number': destination,
+            'destination_name': name,
+            'length': length,
+            'ringing_length': rnd.randrange(0, 30),
+            'status': 'answered' if answered else 'missed',
+            'price': price,
+            'price_per_minute': price_per_minute,
+            'balance_after': balance,
+            'line': 123465 + rnd.randrange(lines),
+        }
+
+
+def generate_sms(count, seed=0, lines=10, start=START):
+    """Generate SMS messages in chronological order."""
+    rnd = random.Random(seed)
+    date = start
+    balance = 1000.0
+    for i in range(count):
+        date += timedelta(seconds=rnd.randrange(1, 1200))
+        direction = rnd.choice(('in', 'out'))
+        price = 0.0 if direction == 'in' else 1.2
+        balance = round(balance - price, 4)
+        yield {
+            'status': 'delivered' if direction == 'out' else 'unknown',
+            'direction': direction,
+            'destination_number': '00420799{0:06d}'.format(
+                rnd.randrange(10000)
+            ),
+            'line': 123465 + rnd.randrange(lines),
+            'price': price,
+            'source_number': '00420555{0:06d}'.format(rnd.randrange(10000)),
+            'date': format_date(date),
+            'balance_after': balance,
+            'type': 'sms',
+            'id': 121250000 + i,
+        }
+
+
+def generate_data(count, seed=0, lines=10, start=START):
+    """Generate mobile data usage records in chronological order."""
+    rnd = random.Random(seed)
+    date = start
+    for i in range(count):
+        date += timedelta(seconds=rnd.randrange(60, 3600))
+        bytes_up = rnd.randrange(0, 500000)
+        bytes_down = rnd.randrange(0, 5000000)
+        total = bytes_up + bytes_down
+        yield {
+            'id': 133 + i,
+            'date': format_date(date),
+            'bytes_up': bytes_up,
+            'bytes_down': bytes_down,
+            'bytes_total': total,
+            'price': round(total / 1048576.0, 4),
+            'price_per_mb': 1.0,
+            'phone_number': '00420{0:09d}'.format(
+                799000000 + rnd.randrange(lines)
+            ),
+        }
+
+
+def dump(records):
+    """Serialize records to JSON the way API does."""
+    return json.dumps(list(records))
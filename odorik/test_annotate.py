@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test the record annotation."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from odorik.annotate import Annotator, normalize_number
+from odorik.config import OdorikConfig
+
+LINES = [
+    {'id': 123465, 'name': 'Office', 'public_number': '00420799799799'},
+    {'id': 123466, 'name': '', 'public_number': '00420799799798'},
+]
+
+
+class AnnotatorTest(TestCase):
+
+    """Testing of the record annotation."""
+
+    def get_annotator(self):
+        """Create annotator with configured aliases."""
+        config = OdorikConfig()
+        config.set('lines', 'work', '123465')
+        config.set('numbers', 'friend', '+420555444333')
+        config.set('numbers', 'reception', '00420799799799')
+        return Annotator(LINES, config)
+
+    def test_normalize(self):
+        """Test phone number normalization."""
+        self.assertEqual(normalize_number('+420123'), '00420123')
+        self.assertEqual(normalize_number(' 00420123 '), '00420123')
+
+    def test_call(self):
+        """Test annotating call."""
+        record = self.get_annotator().annotate({
+            'line': 123465,
+            'source_number': '00420555444333',
+            'destination_number': '00420111222333',
+        })
+        self.assertEqual(record['line_name'], 'Office')
+        self.assertEqual(record['line_number'], '00420799799799')
+        self.assertEqual(record['line_alias'], 'work')
+        self.assertEqual(record['source_alias'], 'friend')
+        self.assertIsNone(record['destination_alias'])
+
+    def test_unknown_line(self):
+        """Test annotating record from unknown line."""
+        record = self.get_annotator().annotate({'line': 1})
+        self.assertIsNone(record['line_name'])
+        self.assertIsNone(record['line_number'])
+        self.assertIsNone(record['line_alias'])
+
+    def test_line_names(self):
+        """Test aliases from line names without configuration."""
+        annotator = Annotator(LINES)
+        record = annotator.annotate({'phone_number': '00420799799799'})
+        self.assertEqual(record['phone_alias'], 'Office')
+        # Configured alias takes precedence
+        record = self.get_annotator().annotate(
+            {'phone_number': '00420799799799'}
+        )
+        self.assertEqual(record['phone_alias'], 'reception')
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test the export to SQLite."""
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from odorik import synthetic
+from odorik.export import SQLiteExporter, parse_target
+
+
+class SQLiteExporterTest(TestCase):
+
+    """Testing of the SQLite export."""
+
+    def setUp(self):
+        """Create database."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.exporter = SQLiteExporter(
+            os.path.join(tempdir, 'odorik.db'), batch_size=7
+        )
+        self.addCleanup(self.exporter.close)
+
+    def query(self, sql):
+        """Execute query returning all rows."""
+        return self.exporter.connection.execute(sql).fetchall()
+
+    def test_parse_target(self):
+        """Test parsing of export target."""
+        self.assertEqual(
+            parse_target('sqlite:/tmp/a.db'), ('sqlite', '/tmp/a.db')
+        )
+        self.assertRaises(ValueError, parse_target, 'sqlite:')
+        self.assertRaises(ValueError, parse_target, 'postgres:db')
+        self.assertRaises(ValueError, parse_target, 'odorik.db')
+
+    def test_schema(self):
+        """Test indexes are created."""
+        indexes = [
+            row[0] for row in
+            self.query("SELECT name FROM sqlite_master WHERE type='index'")
+        ]
+        self.assertIn('calls_date', indexes)
+        self.assertIn('calls_destination_number', indexes)
+        self.assertIn('mobile_data_phone_number', indexes)
+
+    def test_load(self):
+        """Test loading records is idempotent."""
+        calls = list(synthetic.generate_calls(50))
+        self.assertEqual(self.exporter.load('calls', iter(calls)), 50)
+        self.assertEqual(self.exporter.load('calls', iter(calls[:20])), 20)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM calls'), [(50,)])
+        self.assertEqual(
+            self.query(
+                'SELECT length, line FROM calls WHERE id = {0}'.format(
+                    calls[3]['id']
+                )
+            ),
+            [(calls[3]['length'], calls[3]['line'])]
+        )
+
+    def test_lines(self):
+        """Test loading lines."""
+        self.exporter.load('lines', synthetic.generate_lines(3))
+        self.assertEqual(
+            self.query('SELECT name FROM lines ORDER BY id'),
+            [('Line 0',), ('Line 1',), ('Line 2',)]
+        )
+        # Credentials are not exported
+        columns = [row[1] for row in self.query('PRAGMA table_info(lines)')]
+        self.assertNotIn('sip_password', columns)
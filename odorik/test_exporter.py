@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test OpenMetrics exporter."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+import threading
+try:
+    from urllib2 import urlopen
+except ImportError:
+    from urllib.request import urlopen
+
+from odorik.exporter import (
+    MetricsCache, MetricsServer, render_metrics, CONTENT_TYPE,
+)
+
+LINE = {
+    'id': 123465,
+    'public_number': '00420799799799',
+    'call_count': 1,
+    'call_count_in': 0,
+    'call_count_out': 0,
+    'call_length': 362,
+    'call_length_in': 0,
+    'call_length_out': 0,
+    'sms_count': 1,
+    'sms_count_in': 1,
+    'sms_count_out': 0,
+    'bytes_total': 155434,
+    'data_price': 0.1484,
+    'call_price': 0.0,
+    'sms_price': 0.0,
+    'price': 0.1484,
+}
+
+DATA = {'balance': 123.45, 'lines': {'Test "line"': LINE}}
+
+
+class ExporterTest(TestCase):
+
+    """Testing of metrics exporter."""
+
+    def test_render(self):
+        """Test rendering metrics."""
+        state = {'timestamp': 10, 'duration': 1, 'errors': 2}
+        output = render_metrics(DATA, state).decode('utf-8')
+        self.assertIn('\nodorik_balance 123.45\n', output)
+        self.assertIn(
+            'odorik_line_call_length{line="123465",name="Test \\"line\\"",'
+            'public_number="00420799799799"} 362.0\n',
+            output
+        )
+        self.assertIn('# TYPE odorik_refresh_errors counter\n', output)
+        self.assertIn('\nodorik_refresh_errors_total 2.0\n', output)
+        self.assertTrue(output.endswith('# EOF\n'))
+
+    def test_render_empty(self):
+        """Test rendering metrics without data."""
+        state = {'timestamp': 0, 'duration': 0, 'errors': 1}
+        output = render_metrics(None, state).decode('utf-8')
+        self.assertNotIn('odorik_balance', output)
+        self.assertIn('odorik_refresh_errors_total 1.0', output)
+
+    def test_cache(self):
+        """Test cache keeps stale data on failure."""
+        calls = []
+
+        def collect():
+            """Fail on second call."""
+            calls.append(1)
+            if len(calls) > 1:
+                raise ValueError('Failed')
+            return DATA
+
+        cache = MetricsCache(collect, 60)
+        self.assertTrue(cache.refresh())
+        self.assertFalse(cache.refresh())
+        output = cache.get_content().decode('utf-8')
+        self.assertIn('odorik_balance 123.45', output)
+        self.assertIn('odorik_refresh_errors_total 1.0', output)
+
+    def test_background(self):
+        """Test background refreshing."""
+        refreshed = threading.Event()
+
+        def collect():
+            """Signal refresh."""
+            refreshed.set()
+            return DATA
+
+        cache = MetricsCache(collect, 0.01)
+        cache.start()
+        try:
+            self.assertTrue(refreshed.wait(5))
+        finally:
+            cache.stop()
+        self.assertIn(b'odorik_balance', cache.get_content())
+
+    def test_server(self):
+        """Test serving metrics over HTTP."""
+        cache = MetricsCache(lambda: DATA, 60)
+        cache.refresh()
+        server = MetricsServer(('127.0.0.1', 0), cache)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            response = urlopen(
+                'http://127.0.0.1:{0}/metrics'.format(server.server_address[1])
+            )
+            self.assertEqual(response.headers['Content-Type'], CONTENT_TYPE)
+            self.assertIn(b'odorik_balance 123.45', response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
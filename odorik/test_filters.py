@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test filter expressions."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+
+from odorik.filters import compile_filter, FilterError
+
+RECORD = {
+    'price': 1.5,
+    'length': 120,
+    'ringing_length': 8,
+    'direction': 'out',
+    'destination_name': 'Slovensko - mobil',
+    'redirection_parent_id': None,
+}
+
+
+class FilterTest(TestCase):
+
+    """Testing of filter expressions."""
+
+    def assert_match(self, expression, expected=True):
+        """Check whether expression matches test record."""
+        self.assertEqual(compile_filter(expression)(RECORD), expected)
+
+    def test_comparison(self):
+        """Test comparison operators."""
+        self.assert_match('price > 1')
+        self.assert_match('price < 1', False)
+        self.assert_match('length >= 120')
+        self.assert_match('length <= 119', False)
+        self.assert_match('length == 120')
+        self.assert_match('length = 120')
+        self.assert_match('length != 120', False)
+        self.assert_match('1 < price')
+        self.assert_match('length > ringing_length')
+        self.assert_match('price > -1.5')
+        self.assert_match('1 < 2')
+
+    def test_string(self):
+        """Test string comparison."""
+        self.assert_match("direction == 'out'")
+        self.assert_match('direction == "in"', False)
+        self.assert_match("destination_name ~ 'Slovensko'")
+        self.assert_match("destination_name ~ '^mobil'", False)
+        self.assert_match("destination_name !~ 'Německo'")
+        self.assert_match("direction == 'it\\'s'", False)
+
+    def test_regex_escapes(self):
+        """Test escapes in regular expressions are kept."""
+        record = {'destination_number': '+420123456789'}
+        match = compile_filter("destination_number ~ '^\\+420'")
+        self.assertTrue(match(record))
+        self.assertFalse(match({'destination_number': '420123456789'}))
+        match = compile_filter("destination_number ~ '\\d{9}$'")
+        self.assertTrue(match(record))
+        self.assertFalse(match({'destination_number': 'd'}))
+        # Escaped backslash is unescaped, other backslashes are kept
+        self.assertTrue(compile_filter(r"'a\\b' == 'a\b'")({}))
+
+    def test_logic(self):
+        """Test logical operators."""
+        self.assert_match(
+            "price > 1 and length >= 60 and destination_name ~ 'Slovensko'"
+        )
+        self.assert_match('price > 2 or length > 60')
+        self.assert_match('price > 2 or length > 600', False)
+        self.assert_match('not price > 2')
+        self.assert_match('NOT (price > 1 and length > 60)', False)
+        self.assert_match('(price > 2 or length > 60) and direction = "out"')
+
+    def test_missing(self):
+        """Test missing and null values."""
+        self.assert_match('missing > 1', False)
+        self.assert_match('missing == null')
+        self.assert_match('redirection_parent_id == null')
+        self.assert_match('redirection_parent_id > 1', False)
+        self.assert_match('direction > 1', False)
+
+    def test_invalid(self):
+        """Test invalid expressions."""
+        for expression in (
+                '', 'price >', 'price', '(price > 1', 'price > 1 1',
+                'price ~ length', "price ~ '('", 'price $ 1', 'and > 1',
+                'price > 1 and'):
+            self.assertRaises(FilterError, compile_filter, expression)
+
+    def test_fields(self):
+        """Test fields referenced by expression."""
+        self.assertEqual(
+            compile_filter('price > 1 and (length > 60 or 1 < line)').fields,
+            {'price', 'length', 'line'}
+        )
+        self.assertEqual(compile_filter('1 = 1').fields, set())
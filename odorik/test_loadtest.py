@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test load testing driver."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+from io import StringIO
+
+from odorik.loadtest import main
+
+
+class LoadTest(TestCase):
+
+    """Testing of load test driver."""
+
+    def test_operations(self):
+        """Test running library operations."""
+        output = StringIO()
+        results = main(
+            [
+                '--concurrency', '1,2', '--requests', '6', '--records', '100',
+                '--operation', 'balance', '--operation', 'calls',
+            ],
+            output
+        )
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[1]['concurrency'], 2)
+        self.assertEqual(results[0]['errors'], 0)
+        self.assertIn('ops/s', output.getvalue())
+
+    def test_commands(self):
+        """Test running command line commands."""
+        results = main(
+            [
+                '--concurrency', '2', '--requests', '2', '--records', '100',
+                '--lines', '2', '--command', 'summary',
+            ],
+            StringIO()
+        )
+        self.assertEqual(results[0]['errors'], 0)
+
+    def test_errors(self):
+        """Test counting errors."""
+        results = main(
+            [
+                '--concurrency', '1', '--requests', '3', '--records', '100',
+                '--error-rate', '1', '--command', 'balance',
+            ],
+            StringIO()
+        )
+        self.assertEqual(results[0]['errors'], 3)
@@ -20,22 +20,39 @@
 """Test command line interface."""
 from __future__ import unicode_literals
 
+from argparse import Namespace
+from datetime import datetime
 from unittest import TestCase
+from unittest.mock import patch
 from io import StringIO, BytesIO
 import httpretty
 import json
 import sys
 import os
+import pstats
+import shutil
+import sqlite3
+import tempfile
 
 import odorik
-from odorik.main import main
+from odorik.main import main, get_parser, Command, COMMANDS
 from odorik.config import OdorikConfig
-from odorik.test_odorik import register_uris
+from odorik.test_odorik import CALLS_BODY, SMS_BODY, register_uris
 
 TEST_CONFIG = os.path.join(os.path.dirname(__file__), 'test_data', 'odorik')
 TEST_SECTION = os.path.join(os.path.dirname(__file__), 'test_data', 'section')
 
 
+class FixedDatetime(datetime):
+
+    """Datetime with fixed current time."""
+
+    @classmethod
+    def now(cls, tz=None):
+        """Return fixed time."""
+        return cls(2016, 3, 15, 10, 0)
+
+
 def execute(args, binary=False, settings=None, stdout=None):
     """Execute command and return output."""
     if settings is None:
@@ -191,6 +208,14 @@ class TestOutput(TestCase):
         output = execute(['--format', 'text', 'version'])
         self.assertIn('version: {0}'.format(odorik.__version__), output)
 
+    def test_library_print(self):
+        """Test printing using command with minimal arguments."""
+        stdout = StringIO()
+        Command(Namespace(format='csv'), OdorikConfig(), stdout).print(
+            [{'id': 1, 'price': 1.5}]
+        )
+        self.assertEqual(stdout.getvalue().splitlines(), ['id,price', '1,1.50'])
+
     def test_version_json(self):
         """Test version printing."""
         output = execute(['--format', 'json', 'version'], True)
@@ -275,6 +300,67 @@ class TestOutput(TestCase):
         self.assertIn('>price</th><td>0.15<', output)
 
 
+class TestSinks(TestCase):
+
+    """Test output to several sinks."""
+
+    def setUp(self):
+        """Create directory for output files."""
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def read(self, name):
+        """Read output file."""
+        with open(os.path.join(self.tempdir, name)) as handle:
+            return handle.read()
+
+    def get_args(self, *names):
+        """Return --output arguments for files."""
+        result = []
+        for name in names:
+            result.extend([
+                '--output',
+                '{0}:{1}'.format(
+                    name.split('.')[1], os.path.join(self.tempdir, name)
+                ),
+            ])
+        return result
+
+    @httpretty.activate
+    def test_list(self):
+        """Test writing list to several files."""
+        register_uris()
+        output = execute(
+            self.get_args('calls.csv', 'calls.json', 'calls.html') +
+            ['calls', '--list']
+        )
+        self.assertEqual(output, '')
+        self.assertIn('98292358', self.read('calls.csv'))
+        self.assertEqual(json.loads(self.read('calls.json'))[0]['length'], 362)
+        self.assertIn('<table>', self.read('calls.html'))
+
+    @httpretty.activate
+    def test_stream(self):
+        """Test streaming records to several sinks."""
+        register_uris()
+        output = execute(
+            self.get_args('history.csv', 'history.json') +
+            ['--output', 'text:-', 'balance', '--history']
+        )
+        self.assertIn('balance: 554.03', output)
+        self.assertEqual(
+            self.read('history.csv').splitlines()[:2],
+            ['balance,date', '554.03,2014-10-01T11:28:31Z']
+        )
+        self.assertEqual(len(json.loads(self.read('history.json'))), 2)
+
+    def test_invalid(self):
+        """Test invalid output specification."""
+        self.assertRaises(
+            SystemExit, execute, ['--output', 'xml:/tmp/x', 'balance']
+        )
+
+
 class TestCommands(TestCase):
 
     """Test command line interface."""
@@ -362,6 +448,263 @@ class TestCommands(TestCase):
         output = execute(['calls', '--line', '1234'])
         self.assertIn('length: 362', output)
 
+    @httpretty.activate
+    def test_calls_where(self):
+        """Test filtering calls by expression."""
+        register_uris()
+        output = execute(
+            ['calls', '--list', '--where', 'length > 300 and price == 0']
+        )
+        self.assertIn('554.03', output)
+        output = execute(
+            ['calls', '--list', '--where', "destination_name ~ 'Slovensko'"]
+        )
+        self.assertEqual(output, '')
+        output = execute(['calls', '--where', 'length < 300'])
+        self.assertIn('count: 0', output)
+
+    @httpretty.activate
+    def test_calls_fields(self):
+        """Test listing only some fields of calls."""
+        register_uris()
+        output = execute(
+            ['--format', 'csv', 'calls', '--list', '--fields', 'price,id']
+        )
+        self.assertEqual(
+            output.splitlines(), ['price,id', '0.00,98292358']
+        )
+        output = execute(
+            [
+                '--format', 'json', 'calls', '--list', '--fields', 'id',
+                '--where', 'length > 300', '--sort=-price',
+            ],
+            True
+        )
+        self.assertEqual(json.loads(output), [{'id': 98292358}])
+        output = execute(['calls', '--fields', 'id'])
+        self.assertIn('length: 362', output)
+
+    @httpretty.activate
+    def test_sms_fields(self):
+        """Test listing only some fields of annotated SMS."""
+        register_uris()
+        output = execute(
+            ['sms', '--list', '--annotate', '--fields', 'id,line_name']
+        )
+        self.assertEqual(output.splitlines()[0], 'id: 121250000')
+        self.assertEqual(len(output.strip().splitlines()), 2)
+        output = execute(['mobile-data', '--list', '--fields', 'price'])
+        self.assertEqual(output.strip(), 'price: 0.15')
+
+    @httpretty.activate
+    def test_calls_redirects(self):
+        """Test resolving redirected calls."""
+        register_uris()
+        output = execute(
+            ['--format', 'json', 'calls', '--resolve-redirects'], True
+        )
+        result = json.loads(output)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['id'], 98292356)
+        self.assertEqual(result[0]['legs'], 1)
+        self.assertEqual(result[0]['length'], 362)
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/calls.json',
+            body=json.dumps([
+                {'id': 1, 'redirection_parent_id': None, 'length': 10,
+                 'price': 1.0, 'date': '2015-01-01T10:00:00Z'},
+                {'id': 2, 'redirection_parent_id': 1, 'length': 20,
+                 'price': 0.5, 'date': '2015-01-01T10:00:05Z'},
+            ])
+        )
+        output = execute(
+            ['--format', 'json', 'calls', '--list', '--resolve-redirects',
+             '--fields', 'id,date,legs,length,price'],
+            True
+        )
+        result = json.loads(output)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(
+            set(result[0]), {'id', 'date', 'legs', 'length', 'price'}
+        )
+        self.assertEqual(result[0]['legs'], 2)
+        self.assertEqual(result[0]['length'], 30)
+        output = execute(
+            ['--format', 'csv', 'calls', '--resolve-redirects',
+             '--fields', 'id,legs'],
+            True
+        )
+        self.assertEqual(output.splitlines()[0], 'id,legs')
+
+    def test_calls_where_invalid(self):
+        """Test invalid filter expression."""
+        self.assertRaises(
+            SystemExit,
+            execute,
+            ['calls', '--list', '--where', 'length >']
+        )
+
+    @httpretty.activate
+    def test_data_where(self):
+        """Test filtering data usage by expression."""
+        register_uris()
+        output = execute(['mobile-data', '--where', 'bytes_up > 1000000'])
+        self.assertIn('bytes_total: 0\n', output)
+        output = execute(['sms', '--list', '--where', "direction = 'in'"])
+        self.assertIn('direction: in', output)
+
+    @httpretty.activate
+    def test_sms_annotate(self):
+        """Test annotating SMS with line names and aliases."""
+        register_uris()
+        output = execute(
+            ['--format', 'json', 'sms', '--list', '--annotate'],
+            True,
+            settings=(('numbers', 'friend', '00420799799799'),),
+        )
+        record = json.loads(output)[0]
+        self.assertIsNone(record['line_name'])
+        self.assertEqual(record['source_alias'], 'friend')
+        self.assertEqual(record['destination_alias'], 'friend')
+        output = execute(
+            ['sms', '--list', '--annotate', '--where', "source_alias = 'Test'"]
+        )
+        self.assertIn('source_alias: Test', output)
+
+    @httpretty.activate
+    def test_export(self):
+        """Test exporting records to SQLite."""
+        register_uris()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        path = os.path.join(tempdir, 'odorik.db')
+        args = [
+            'export', '--to', 'sqlite:{0}'.format(path),
+            '--start-date', '2015-01-01', '--end-date', '2015-01-03',
+        ]
+        for dummy in range(2):
+            output = execute(args)
+            self.assertIn('calls: 1', output)
+            self.assertIn('lines: 1', output)
+        connection = sqlite3.connect(path)
+        self.addCleanup(connection.close)
+        self.assertEqual(
+            connection.execute('SELECT COUNT(*) FROM calls').fetchall(),
+            [(1,)]
+        )
+        output = execute(args + ['--records', 'sms'])
+        self.assertEqual(output, 'sms: 1\n')
+
+    def test_export_invalid(self):
+        """Test exporting to unsupported target."""
+        self.assertRaises(
+            SystemExit, execute, ['export', '--to', 'csv:/tmp/x']
+        )
+
+    @httpretty.activate
+    def test_calls_percentiles(self):
+        """Test percentiles of calls."""
+        register_uris()
+        output = execute(['calls', '--percentiles', '50,99'])
+        self.assertIn('length_p50: 362\n', output)
+        self.assertIn('ringing_length_p99: 8\n', output)
+        self.assertIn('length_in_p50: \n', output)
+        output = execute(['summary', '--percentiles', '95'])
+        self.assertIn('call_length_p95: 362\n', output)
+        self.assertRaises(
+            SystemExit, execute, ['calls', '--percentiles', '150']
+        )
+
+    @httpretty.activate
+    def test_distinct(self):
+        """Test distinct numbers counts."""
+        register_uris()
+        output = execute(['calls', '--distinct'])
+        self.assertIn('distinct_destinations: 0\n', output)
+        output = execute(['sms', '--distinct'])
+        self.assertIn('distinct_sources: 1\n', output)
+        output = execute(['summary', '--distinct'])
+        self.assertIn('sms_distinct_sources: 1\n', output)
+        self.assertIn('call_distinct_sources: 0\n', output)
+
+    @httpretty.activate
+    def test_balance_history(self):
+        """Test balance history."""
+        register_uris()
+        output = execute(
+            ['--format', 'csv', 'balance', '--history',
+             '--start-date', '2014-10-01', '--end-date', '2014-10-02'],
+            True
+        )
+        self.assertEqual(
+            output.splitlines(),
+            [
+                'balance,date',
+                '554.03,2014-10-01T11:28:31Z',
+                '377.78,2015-05-18T16:26:56Z',
+            ]
+        )
+        output = execute(
+            ['balance', '--history', '--step', '1d',
+             '--start-date', '2014-10-01', '--end-date', '2014-10-02']
+        )
+        self.assertIn('balance: 554.03', output)
+        self.assertRaises(
+            SystemExit, execute, ['balance', '--history', '--step', '1x']
+        )
+        self.assertRaises(SystemExit, execute, ['balance', '--step', '1d'])
+        self.assertRaises(SystemExit, execute, ['balance', '--last-month'])
+
+    @httpretty.activate
+    def test_calls_sort(self):
+        """Test sorting and limiting calls."""
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/calls.json',
+            body=json.dumps([
+                {'id': 1, 'price': 1.0, 'length': 10},
+                {'id': 2, 'price': 3.0, 'length': 20},
+                {'id': 3, 'price': 2.0, 'length': 30},
+            ])
+        )
+        output = execute(['calls', '--list', '--sort=-price'])
+        self.assertLess(output.index('id: 2'), output.index('id: 3'))
+        self.assertLess(output.index('id: 3'), output.index('id: 1'))
+        output = execute(
+            ['--format', 'json', 'calls', '--list', '--sort', 'length',
+             '--limit', '2'],
+            True
+        )
+        self.assertEqual(
+            [item['id'] for item in json.loads(output)], [1, 2]
+        )
+        output = execute(
+            ['--format', 'json', 'calls', '--list', '--sort', 'length',
+             '--sort-buffer', '1'],
+            True
+        )
+        self.assertEqual(
+            [item['id'] for item in json.loads(output)], [1, 2, 3]
+        )
+        output = execute(
+            ['--format', 'csv', 'calls', '--list', '--sort', 'length',
+             '--sort-buffer', '1'],
+            True
+        )
+        self.assertTrue(output.startswith('id,length,price'))
+        self.assertEqual(len(output.splitlines()), 4)
+        output = execute(
+            ['calls', '--list', '--sort', 'length', '--sort-buffer', '1',
+             '--where', 'length > 100']
+        )
+        self.assertEqual(output, '')
+        for args in (['--limit', '-1'], ['--limit', 'x'],
+                     ['--sort', 'length', '--sort-buffer', '0']):
+            self.assertRaises(
+                SystemExit, execute, ['calls', '--list'] + args
+            )
+
     @httpretty.activate
     def test_sms_summary(self):
         """Test getting sms summary."""
@@ -420,6 +763,118 @@ class TestCommands(TestCase):
         output = execute(['summary'])
         self.assertIn('\nprice: 0.15', output)
 
+    @httpretty.activate
+    def test_summary_indexed(self):
+        """Test summary from daily aggregates."""
+        register_uris()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        args = [
+            '--format', 'json', 'summary', '--indexed', '--cache-dir',
+            tempdir, '--start-date', '2014-09-30', '--end-date', '2014-10-03',
+        ]
+        output = json.loads(execute(args, True))
+        self.assertEqual(output['Test']['call_length'], 362)
+        self.assertEqual(output['Test']['sms_count'], 0)
+        self.assertEqual(len(httpretty.latest_requests()), 4)
+        output = json.loads(execute(args, True))
+        self.assertEqual(output['Test']['call_length'], 362)
+        # Only lines are fetched again
+        self.assertEqual(len(httpretty.latest_requests()), 5)
+        # Closed month is fetched only once
+        args = [
+            '--format', 'json', 'summary', '--indexed', '--cache-dir',
+            tempdir, '--last-month',
+        ]
+        execute(args, True)
+        count = len(httpretty.latest_requests())
+        execute(args, True)
+        self.assertEqual(len(httpretty.latest_requests()), count + 1)
+
+    @httpretty.activate
+    def test_pivot(self):
+        """Test pivot of metric for lines and months."""
+        register_uris()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        args = [
+            '--format', 'csv', 'pivot', '--year', '2014', '--metric',
+            'call_length', '--cache-dir', tempdir,
+        ]
+        output = execute(args, True)
+        self.assertTrue(output.startswith('line,2014-01,2014-02,'))
+        self.assertIn('Test,0,0,0,0,0,0,0,0,0,362,0,0,362', output)
+        self.assertEqual(len(httpretty.latest_requests()), 1 + 12 * 3)
+        output = execute(args + ['--cols', 'quarter', '--rows', 'number'], True)
+        self.assertTrue(
+            output.startswith('number,2014-Q1,2014-Q2,2014-Q3,2014-Q4,total')
+        )
+        self.assertIn('00420799799799,0,0,0,362,362', output)
+        # Closed months are not fetched again
+        self.assertEqual(len(httpretty.latest_requests()), 1 + 12 * 3 + 1)
+
+    @httpretty.activate
+    def test_compare(self):
+        """Test comparing periods."""
+        register_uris()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        output = execute(
+            ['--format', 'csv', 'compare', '--metric', 'call_count',
+             '--cache-dir', tempdir],
+            True
+        )
+        self.assertEqual(
+            output.splitlines(),
+            [
+                'line,metric,this-month,last-month,delta,delta_pct',
+                'Test,call_count,0,0,0,',
+            ]
+        )
+        self.assertRaises(
+            SystemExit,
+            execute,
+            ['compare', '--against', 'this-month', '--cache-dir', tempdir]
+        )
+        # Closed periods are used from cache
+        args = [
+            'compare', '--period', 'last-month', '--against',
+            'last-month-last-year', '--cache-dir', tempdir
+        ]
+        execute(args)
+        count = len(httpretty.latest_requests())
+        execute(args)
+        self.assertEqual(len(httpretty.latest_requests()), count + 1)
+
+    def test_compare_periods(self):
+        """Test periods for comparing."""
+        compare = COMMANDS['compare'](Namespace(), OdorikConfig())
+        with patch('odorik.commands.compare.datetime', FixedDatetime):
+            self.assertEqual(
+                compare.get_period('this-month'),
+                (datetime(2016, 3, 1), datetime(2016, 3, 15, 10, 0))
+            )
+        compare.now = datetime(2016, 3, 15, 10, 0)
+        self.assertEqual(
+            compare.get_period('last-month'),
+            (datetime(2016, 2, 1), datetime(2016, 2, 29, 23, 59, 59))
+        )
+        self.assertEqual(
+            compare.get_period('this-month-last-year'),
+            (datetime(2015, 3, 1), datetime(2015, 3, 15, 10, 0))
+        )
+        self.assertEqual(
+            compare.get_period('last-month-last-year'),
+            (datetime(2015, 2, 1), datetime(2015, 2, 28, 23, 59, 59))
+        )
+        compare.now = datetime(2016, 1, 20)
+        self.assertEqual(
+            compare.get_period('last-month'),
+            (datetime(2015, 12, 1), datetime(2015, 12, 31, 23, 59, 59))
+        )
+        self.assertEqual(compare.get_delta(15, 10), (5, 50.0))
+        self.assertEqual(compare.get_delta(5, 0), (5, None))
+
     @httpretty.activate
     def test_lines(self):
         """Test lines."""
@@ -480,3 +935,634 @@ class TestAPI(TestCase):
             '--param', 'recipient=800123456'
         ])
         self.assertIn('callback_ordered', output)
+
+
+class TestSchedule(TestCase):
+
+    """Test periodic execution of commands."""
+
+    def setUp(self):
+        """Create temporary directory for job files."""
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def write_jobs(self, content):
+        """Write jobs file and return its path."""
+        path = os.path.join(self.tempdir, 'jobs.ini')
+        with open(path, 'w') as handle:
+            handle.write(content)
+        return path
+
+    @httpretty.activate
+    def test_once(self):
+        """Test jobs share API responses within a tick."""
+        register_uris()
+        target = os.path.join(self.tempdir, 'calls.csv')
+        path = self.write_jobs(
+            '[DEFAULT]\n'
+            'interval = 1h\n'
+            '[list]\n'
+            'command = --format csv calls --list --last-month\n'
+            'output = {0}\n'
+            '[summary]\n'
+            'command = calls --last-month\n'
+            'jitter = 0\n'
+            'overlap = merge\n'.format(target)
+        )
+        timings = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = timings
+            output = execute(['--timings', 'schedule', '--once', path])
+        finally:
+            sys.stderr = backup
+        self.assertIn('length: 362', output)
+        with open(target) as handle:
+            self.assertIn('554.03', handle.read())
+        paths = [
+            request.path for request in httpretty.latest_requests()
+            if 'calls.json' in request.path
+        ]
+        self.assertEqual(len(paths), 1)
+        # Shared response is reported only once
+        self.assertEqual(timings.getvalue().count('calls.json'), 1)
+
+    @httpretty.activate
+    def test_error(self):
+        """Test failing job does not stop others."""
+        register_uris()
+        path = self.write_jobs(
+            '[sms]\n'
+            'command = send-sms INVALID text\n'
+            'interval = 1h\n'
+            '[balance]\n'
+            'command = balance\n'
+            'interval = 1h\n'
+        )
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            result = execute(['schedule', '--once', path])
+        except SystemExit:
+            result = None
+        finally:
+            sys.stderr = backup
+        self.assertIsNone(result)
+        self.assertIn('Error in job sms', output.getvalue())
+        self.assertIn('1 of 2 jobs failed', output.getvalue())
+
+    def test_invalid(self):
+        """Test invalid job definitions."""
+        for content in (
+                '',
+                '[job]\ncommand = balance\n',
+                '[job]\ncommand = balance\ninterval = 0h\n',
+                '[job]\ncommand = balance\ninterval = 1h\noverlap = x\n',
+                '[job]\ncommand = schedule x\ninterval = 1h\n',
+                'invalid'):
+            path = self.write_jobs(content)
+            self.assertRaises(
+                SystemExit, execute, ['schedule', '--once', path]
+            )
+        self.assertRaises(
+            SystemExit,
+            execute,
+            ['schedule', os.path.join(self.tempdir, 'missing.ini')]
+        )
+        self.assertRaises(
+            SystemExit, execute, ['schedule', '--jobs', '0', path]
+        )
+
+
+class TestBatch(TestCase):
+
+    """Test batch execution of commands."""
+
+    def setUp(self):
+        """Create temporary directory for batch files."""
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove temporary directory."""
+        shutil.rmtree(self.tempdir)
+
+    def write_batch(self, content):
+        """Write batch file and return its path."""
+        path = os.path.join(self.tempdir, 'batch')
+        with open(path, 'w') as handle:
+            handle.write(content)
+        return path
+
+    @httpretty.activate
+    def test_batch(self):
+        """Test executing several commands."""
+        register_uris()
+        path = self.write_batch(
+            '# Comment\n'
+            'balance\n'
+            '\n'
+            'calls --list\n'
+        )
+        output = execute(['batch', path])
+        self.assertIn('balance: 123.45', output)
+        self.assertIn('554.03', output)
+        self.assertLess(output.index('123.45'), output.index('554.03'))
+
+    @httpretty.activate
+    def test_batch_parallel(self):
+        """Test executing commands in parallel keeps order."""
+        register_uris()
+        path = self.write_batch(
+            'summary\n'
+            'balance\n'
+            'sms --list\n'
+        )
+        output = execute(['batch', '--jobs', '3', path])
+        self.assertIn('\nprice: 0.15', output)
+        self.assertLess(output.index('0.15'), output.index('123.45'))
+        self.assertLess(output.index('123.45'), output.index('direction'))
+
+    @httpretty.activate
+    def test_batch_format(self):
+        """Test global options are inherited and can be overridden."""
+        register_uris()
+        path = self.write_batch(
+            'balance\n'
+            '--format text version\n'
+        )
+        output = execute(['--format', 'csv', 'batch', path], True)
+        self.assertIn('balance,123.45', output)
+        self.assertIn('version: ', output)
+
+    @httpretty.activate
+    def test_batch_target(self):
+        """Test writing output to file."""
+        register_uris()
+        target = os.path.join(self.tempdir, 'balance.json')
+        path = self.write_batch(
+            '--format json balance > "{0}"\n'
+            'version --bare\n'.format(target)
+        )
+        output = execute(['batch', path])
+        self.assertTrue(output.startswith(odorik.__version__))
+        self.assertNotIn('123.45', output)
+        with open(target) as handle:
+            self.assertEqual(json.load(handle), {'balance': 123.45})
+
+    @httpretty.activate
+    def test_batch_error(self):
+        """Test failing command does not stop the batch."""
+        register_uris()
+        path = self.write_batch(
+            'send-sms INVALID text\n'
+            'balance\n'
+        )
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            self.assertRaises(SystemExit, execute, ['batch', path])
+        finally:
+            sys.stderr = backup
+        self.assertIn('Error on line 1', output.getvalue())
+        self.assertIn('1 of 2 commands failed', output.getvalue())
+
+    def test_batch_nested(self):
+        """Test batch can not be nested."""
+        path = self.write_batch('batch\n')
+        self.assertRaises(SystemExit, execute, ['batch', path])
+
+    def test_batch_invalid(self):
+        """Test invalid command is rejected before executing anything."""
+        path = self.write_batch('version\ninvalid\n')
+        self.assertRaises(SystemExit, execute, ['batch', path])
+
+    def test_batch_invalid_args(self):
+        """Test invalid arguments are reported with file and line."""
+        for content in ('version\ncalls --limit x\n', 'version\n"\n'):
+            path = self.write_batch(content)
+            output = StringIO()
+            backup = sys.stderr
+            try:
+                sys.stderr = output
+                self.assertRaises(SystemExit, execute, ['batch', path])
+            finally:
+                sys.stderr = backup
+            self.assertIn('{0}:2: '.format(path), output.getvalue())
+            self.assertNotIn('usage:', output.getvalue())
+
+    def test_batch_output(self):
+        """Test global output is rejected."""
+        target = os.path.join(self.tempdir, 'output.json')
+        path = self.write_batch('version\n')
+        self.assertRaises(
+            SystemExit,
+            execute,
+            ['--output', 'json:{0}'.format(target), 'batch', path]
+        )
+        self.assertFalse(os.path.exists(target))
+        # Output can be set for each line
+        path = self.write_batch(
+            '--output json:{0} version\nversion --bare\n'.format(target)
+        )
+        output = execute(['batch', path])
+        self.assertEqual(output.strip(), odorik.__version__)
+        with open(target) as handle:
+            self.assertIn('version', json.load(handle))
+
+
+class TestExporter(TestCase):
+
+    """Test metrics exporter."""
+
+    @httpretty.activate
+    def test_collect(self):
+        """Test collecting metrics data."""
+        register_uris()
+        args = get_parser().parse_args(['exporter', '--refresh', '10'])
+        command = COMMANDS['exporter'](args, OdorikConfig())
+        data = command.collect()
+        self.assertAlmostEqual(data['balance'], 123.45)
+        self.assertEqual(data['lines']['Test']['call_length'], 362)
+
+    @httpretty.activate
+    def test_incremental(self):
+        """Test exporter with incrementally updated summary."""
+        register_uris()
+        # Records have to be recent to be recognized on next refresh
+        date = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        for path, body in (('calls', CALLS_BODY), ('sms', SMS_BODY)):
+            records = json.loads(body)
+            records[0]['date'] = date
+            httpretty.register_uri(
+                httpretty.GET,
+                'https://www.odorik.cz/api/v1/{0}.json'.format(path),
+                body=json.dumps(records)
+            )
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        args = get_parser().parse_args(
+            ['exporter', '--incremental', '--cache-dir', tempdir]
+        )
+        command = COMMANDS['exporter'](args, OdorikConfig())
+        for dummy in range(2):
+            data = command.collect()
+            self.assertEqual(data['lines']['Test']['call_length'], 362)
+            self.assertEqual(data['lines']['Test']['sms_count'], 1)
+
+    def test_refresh(self):
+        """Test validation of refresh interval."""
+        for value in ('0', '-10', '9', 'x'):
+            self.assertRaises(
+                SystemExit,
+                get_parser().parse_args,
+                ['exporter', '--refresh', value]
+            )
+
+
+class TestTimings(TestCase):
+
+    """Test request timings reporting."""
+
+    @httpretty.activate
+    def test_timings(self):
+        """Test printing timings."""
+        register_uris()
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            execute(['--timings', 'summary'])
+        finally:
+            sys.stderr = backup
+        self.assertIn('lines.json', output.getvalue())
+        self.assertIn('requests: 4', output.getvalue())
+        self.assertIn('p99: ', output.getvalue())
+
+    @httpretty.activate
+    def test_timings_file(self):
+        """Test writing trace file."""
+        register_uris()
+        tempdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tempdir, 'trace.json')
+            execute(['--timings-file', path, 'balance'])
+            with open(path) as handle:
+                trace = json.load(handle)
+        finally:
+            shutil.rmtree(tempdir)
+        self.assertEqual(trace['traceEvents'][0]['name'], 'GET balance')
+
+
+class TestProfile(TestCase):
+
+    """Test profiling."""
+
+    @httpretty.activate
+    def test_profile(self):
+        """Test writing profile."""
+        register_uris()
+        tempdir = tempfile.mkdtemp()
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            path = os.path.join(tempdir, 'profile')
+            execute(['--profile', path, 'summary'])
+            stats = pstats.Stats(path)
+            with open(path + '.memory.txt') as handle:
+                memory = handle.read()
+        finally:
+            sys.stderr = backup
+            shutil.rmtree(tempdir)
+        self.assertTrue(
+            any(func[2] == 'process_line' for func in stats.stats)
+        )
+        self.assertIn('Peak traced memory', memory)
+        self.assertIn('CPU hot spots', output.getvalue())
+        self.assertIn('Top allocations', output.getvalue())
+
+
+class TestCassettes(TestCase):
+
+    """Test recording and replaying API responses."""
+
+    def test_record_replay(self):
+        """Test replaying recorded summary."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        args = [
+            'summary', '--start-date', '2015-01-01', '--end-date', '2015-02-01'
+        ]
+        with httpretty.enabled():
+            register_uris()
+            recorded = execute(['--record', tempdir] + args)
+        self.assertIn('\nprice: 0.15', recorded)
+        replayed = execute(['--replay', tempdir] + args)
+        self.assertEqual(recorded, replayed)
+
+    def test_record_replay_last_month(self):
+        """Test replaying recorded summary of last month."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        args = ['calls', '--last-month']
+        with httpretty.enabled():
+            register_uris()
+            recorded = execute(['--record', tempdir] + args)
+        replayed = execute(['--replay', tempdir] + args)
+        self.assertEqual(recorded, replayed)
+
+    def test_record_fields(self):
+        """Test records with only some fields are not replayed as complete."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        period = ['--start-date', '2015-01-01', '--end-date', '2015-02-01']
+        args = ['calls', '--list', '--fields', 'id,date'] + period
+        with httpretty.enabled():
+            register_uris()
+            recorded = execute(['--record', tempdir] + args)
+        self.assertNotIn('price', recorded)
+        replayed = execute(['--replay', tempdir] + args)
+        self.assertEqual(recorded, replayed)
+        self.assertRaises(
+            SystemExit, execute, ['--replay', tempdir, 'summary'] + period
+        )
+
+    def test_replay_missing(self):
+        """Test replaying not recorded response."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.assertRaises(
+            SystemExit, execute, ['--replay', tempdir, 'balance']
+        )
+
+
+class TestFollow(TestCase):
+
+    """Test following new records."""
+
+    def follow(self, args, responses, intervals=('1', '3')):
+        """Execute command with --follow on sequence of responses."""
+        requests = []
+        sleeps = []
+
+        def response(request, uri, headers):
+            """Return next response."""
+            requests.append(uri)
+            return (200, headers, json.dumps(responses[len(requests) - 1]))
+
+        def sleep(interval):
+            """Record sleeping, interrupt after all responses."""
+            sleeps.append(interval)
+            if len(sleeps) == len(responses):
+                raise KeyboardInterrupt()
+
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/{0}.json'.format(args[0]),
+            body=response
+        )
+        with patch('odorik.commands.base.time.sleep', sleep), \
+                patch('odorik.commands.base.datetime', FixedDatetime):
+            output = execute(
+                args + [
+                    '--follow',
+                    '--interval', intervals[0],
+                    '--max-interval', intervals[1],
+                ]
+            )
+        return output, requests, sleeps
+
+    @httpretty.activate
+    def test_follow_calls(self):
+        """Test following calls."""
+        first = {'id': 1, 'date': '2015-01-01T10:00:00Z', 'price': 1.5}
+        second = {'id': 2, 'date': '2015-01-01T10:00:00Z', 'price': 2.5}
+        third = {'id': 3, 'date': '2015-01-01T11:00:00Z', 'price': 3.5}
+        output, requests, sleeps = self.follow(
+            ['calls', '--start-date', '2015-01-01', '--direction', 'in'],
+            [[first], [first], [first], [first, second], [third, second]],
+        )
+        self.assertEqual(sleeps, [1, 2, 3, 1, 1])
+        self.assertEqual(output.count('price: 1.50'), 1)
+        self.assertEqual(output.count('price: 2.50'), 1)
+        self.assertEqual(output.count('price: 3.50'), 1)
+        self.assertIn('direction=in', requests[0])
+        self.assertIn('from=2014-12-31T23%3A55%3A00&', requests[0])
+        # Only window since previous poll is requested, even when idle
+        for request in requests[1:]:
+            self.assertIn('from=2016-03-15T09%3A55%3A00&', request)
+            self.assertIn('to=2016-03-15T10%3A00%3A00&', request)
+
+    @httpretty.activate
+    def test_follow_sms(self):
+        """Test following SMS."""
+        message = {'id': 1, 'date': '2015-01-01T10:00:00Z', 'price': 1.5}
+        output = self.follow(['sms'], [[], [message]])[0]
+        self.assertIn('price: 1.50', output)
+
+    def test_follow_intervals(self):
+        """Test validation of polling intervals."""
+        for intervals in (('0', '3'), ('1', '-1'), ('1', 'nan')):
+            self.assertRaises(
+                SystemExit, self.follow, ['sms'], [], intervals
+            )
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            self.assertRaises(
+                SystemExit, self.follow, ['sms'], [], ('5', '1')
+            )
+        finally:
+            sys.stderr = backup
+        self.assertIn('can not be shorter', output.getvalue())
+
+
+class TestSections(TestCase):
+
+    """Test processing several accounts."""
+
+    def setUp(self):
+        """Create configuration with several accounts."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.config = os.path.join(tempdir, 'odorik')
+        with open(self.config, 'w') as handle:
+            handle.write(
+                '[first]\n'
+                'user = first\n'
+                '[second]\n'
+                'user = second\n'
+                'url = https://example.net/\n'
+                '[lines]\n'
+                'test = 1234\n'
+            )
+
+    def execute(self, args):
+        """Execute command with the configuration."""
+        return execute(['--config', self.config] + args, True, settings=False)
+
+    @httpretty.activate
+    def test_all_sections(self):
+        """Test processing all accounts."""
+        register_uris()
+        output = self.execute(['--format', 'json', '--all-sections', 'balance'])
+        self.assertEqual(
+            json.loads(output),
+            {'first': {'balance': 123.45}, 'second': {'balance': 321.09}}
+        )
+
+    @httpretty.activate
+    def test_sections(self):
+        """Test processing selected accounts."""
+        register_uris()
+        output = self.execute(['--sections', 'first', 'summary'])
+        self.assertTrue(output.startswith('first\n'))
+        self.assertIn('Test\n', output)
+        self.assertIn('\nprice: 0.15', output)
+        output = self.execute(
+            ['--format', 'json', '--sections', 'first, second', 'balance']
+        )
+        self.assertEqual(set(json.loads(output)), {'first', 'second'})
+
+    def test_sections_invalid(self):
+        """Test invalid sections options."""
+        for args in (['--sections', 'first,'], ['--max-workers', '0']):
+            self.assertRaises(
+                SystemExit, self.execute, args + ['balance']
+            )
+        with open(self.config, 'w') as handle:
+            handle.write('[lines]\ntest = 1234\n')
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            self.assertRaises(
+                SystemExit, self.execute, ['--all-sections', 'balance']
+            )
+        finally:
+            sys.stderr = backup
+        self.assertIn('No sections with API user', output.getvalue())
+
+    @httpretty.activate
+    def test_sections_list(self):
+        """Test merging lists."""
+        register_uris()
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://example.net/calls.json',
+            body='[]'
+        )
+        output = self.execute([
+            '--sections', 'first,second', '--max-workers', '1',
+            '--format', 'csv', 'calls', '--list'
+        ])
+        self.assertTrue(output.startswith('first\n'))
+        self.assertIn('554.03', output)
+        self.assertIn('\nsecond', output)
+
+    @httpretty.activate
+    def test_sections_fields(self):
+        """Test listing some fields of filtered records for accounts."""
+        register_uris()
+        output = self.execute([
+            '--sections', 'first', '--format', 'json', 'calls', '--list',
+            '--fields', 'id', '--where', 'price >= 0'
+        ])
+        self.assertEqual(json.loads(output), {'first': [{'id': 98292358}]})
+
+    @httpretty.activate
+    def test_sections_balance_history(self):
+        """Test balance history for accounts."""
+        register_uris()
+        output = self.execute([
+            '--sections', 'first', '--format', 'json', 'balance',
+            '--history', '--start-date', '2014-10-01',
+            '--end-date', '2014-10-02'
+        ])
+        self.assertEqual(
+            json.loads(output)['first'][0],
+            {'balance': 554.0288, 'date': '2014-10-01T11:28:31Z'}
+        )
+        output = self.execute([
+            '--sections', 'first', 'balance', '--history',
+            '--start-date', '2014-10-01', '--end-date', '2014-10-02'
+        ])
+        self.assertIn('balance: 554.03', output)
+        self.assertNotIn('generator', output)
+
+    @httpretty.activate
+    def test_sections_text(self):
+        """Test text written by command is kept per section."""
+        register_uris()
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://example.net/lines.json',
+            body='[{"id": 1, "name": "Other", "public_number": "1"}]'
+        )
+        output = self.execute(
+            ['--all-sections', 'lines', '--generate-config']
+        )
+        first = output.index('first\n[lines]\nTest = 123465\n')
+        second = output.index('second\n[lines]\nOther = 1\n')
+        self.assertLess(first, second)
+        self.assertNotIn('first:', output)
+        self.assertNotIn('second:', output)
+
+    def test_sections_error(self):
+        """Test failure in sections."""
+        output = StringIO()
+        backup = sys.stderr
+        try:
+            sys.stderr = output
+            self.assertRaises(
+                SystemExit,
+                self.execute,
+                ['--all-sections', 'send-sms', 'INVALID', 'text'],
+            )
+        finally:
+            sys.stderr = backup
+        self.assertIn('Error in section first', output.getvalue())
+        self.assertIn('2 of 2 sections failed', output.getvalue())
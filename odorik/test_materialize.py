@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test the incrementally maintained summaries."""
+from __future__ import unicode_literals
+
+import shutil
+from argparse import Namespace
+import tempfile
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import dateutil.parser
+from dateutil.tz import tzlocal, tzutc
+
+from odorik import synthetic
+from odorik.materialize import (
+    DailyIndex, IncrementalSummary, LineIndex, SummaryStore,
+)
+from odorik.commands.summary import Summary
+
+START = datetime(2015, 1, 1, tzinfo=tzutc())
+
+
+class StaticClient(object):
+
+    """API client returning synthetic records."""
+
+    url = 'https://example.net/'
+    user = 'test'
+
+    def __init__(self):
+        """Generate records."""
+        start = START.replace(tzinfo=None)
+        self.records = {
+            'calls': list(synthetic.generate_calls(3000, 1, 2, start)),
+            'sms': list(synthetic.generate_sms(1200, 1, 2, start)),
+            'data': list(synthetic.generate_data(200, 1, 2, start)),
+        }
+        self.dates = {
+            kind: [dateutil.parser.parse(record['date']) for record in records]
+            for kind, records in self.records.items()
+        }
+        self.requests = []
+
+    def select(self, kind, from_date, to_date, field, value):
+        """Return records in interval."""
+        self.requests.append((kind, from_date, to_date))
+        if from_date.tzinfo is None:
+            from_date = from_date.replace(tzinfo=tzlocal())
+            to_date = to_date.replace(tzinfo=tzlocal())
+        return [
+            record
+            for record, date in zip(self.records[kind], self.dates[kind])
+            if from_date <= date <= to_date and record[field] == value
+        ]
+
+    def calls(self, from_date, to_date, line=None):
+        """Return calls."""
+        return self.select('calls', from_date, to_date, 'line', line)
+
+    def sms(self, from_date, to_date, line=None):
+        """Return SMS messages."""
+        return self.select('sms', from_date, to_date, 'line', line)
+
+    def mobile_data(self, from_date, to_date, number=None):
+        """Return data usage."""
+        return self.select(
+            'data', from_date, to_date, 'phone_number', number
+        )
+
+
+class SummaryTestMixin(object):
+
+    """Helpers for testing stored summaries."""
+
+    percentiles = None
+    distinct = False
+
+    def setUp(self):
+        """Create client and store."""
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.client = StaticClient()
+        self.lines = synthetic.generate_lines(2, 1)
+
+    def full_summary(self, to_date, from_date=START):
+        """Calculate summary from scratch."""
+        command = Summary(
+            Namespace(percentiles=self.percentiles, distinct=self.distinct),
+            None,
+            client=self.client
+        )
+        return {
+            line['name']: command.process_line(line, from_date, to_date)
+            for line in self.lines
+        }
+
+    def assert_summary(self, first, second):
+        """Compare summaries with tolerance for float prices."""
+        self.assertEqual(set(first), set(second))
+        for name in first:
+            for key, value in first[name].items():
+                self.assertAlmostEqual(value, second[name][key], msg=key)
+
+
+class IncrementalSummaryTest(SummaryTestMixin, TestCase):
+
+    """Testing of incremental summaries."""
+
+    def incremental_summary(self, to_date):
+        """Calculate summary using stored state."""
+        return IncrementalSummary(
+            self.client, SummaryStore(self.tempdir)
+        ).summarize(
+            self.lines, START, to_date, self.percentiles, self.distinct
+        )
+
+    def test_refresh(self):
+        """Test summary is equal to full computation after refreshes."""
+        for hours in (5, 10, 10, 30):
+            to_date = START + timedelta(hours=hours)
+            self.assert_summary(
+                self.incremental_summary(to_date),
+                self.full_summary(to_date),
+            )
+
+    def test_percentiles(self):
+        """Test percentiles are maintained across refreshes."""
+        self.percentiles = [50, 95]
+        for hours in (2, 4, 6):
+            to_date = START + timedelta(hours=hours)
+            summary = self.incremental_summary(to_date)
+            self.assertIn('call_ringing_length_in_p95', summary['Line 0'])
+            self.assert_summary(summary, self.full_summary(to_date))
+
+    def test_distinct(self):
+        """Test distinct counts are maintained across refreshes."""
+        self.distinct = True
+        for hours in (5, 10, 30):
+            to_date = START + timedelta(hours=hours)
+            summary = self.incremental_summary(to_date)
+            self.assertGreater(summary['Line 0']['sms_distinct_sources'], 0)
+            self.assert_summary(summary, self.full_summary(to_date))
+
+    def test_sketches_requested(self):
+        """Test sketches are maintained only once requested."""
+        to_date = START + timedelta(hours=10)
+        self.incremental_summary(to_date)
+        state = SummaryStore(self.tempdir).load(
+            'summary', *IncrementalSummary(self.client, None).get_key(START)
+        )
+        for line in state.values():
+            self.assertIsNone(line['sketches'])
+            self.assertIsNone(line['distinct'])
+        self.percentiles = [50]
+        self.distinct = True
+        to_date = START + timedelta(hours=12)
+        self.assert_summary(
+            self.incremental_summary(to_date),
+            self.full_summary(to_date),
+        )
+        # Sketches are kept once they were requested
+        self.percentiles = None
+        self.distinct = False
+        self.incremental_summary(START + timedelta(hours=14))
+        state = SummaryStore(self.tempdir).load(
+            'summary', *IncrementalSummary(self.client, None).get_key(START)
+        )
+        for line in state.values():
+            self.assertIsNotNone(line['sketches'])
+            self.assertIsNotNone(line['distinct'])
+
+    def test_fetches_only_new(self):
+        """Test refresh fetches only window since last refresh."""
+        self.incremental_summary(START + timedelta(hours=20))
+        del self.client.requests[:]
+        self.incremental_summary(START + timedelta(hours=22))
+        for kind, from_date, to_date in self.client.requests:
+            self.assertEqual(from_date, START + timedelta(hours=19))
+        # Nothing is fetched if there is nothing new
+        del self.client.requests[:]
+        self.incremental_summary(START + timedelta(hours=22))
+        self.assertEqual(self.client.requests, [])
+
+    def test_backwards(self):
+        """Test summary is recomputed when going back in time."""
+        self.incremental_summary(START + timedelta(hours=20))
+        to_date = START + timedelta(hours=10)
+        self.assert_summary(
+            self.incremental_summary(to_date),
+            self.full_summary(to_date),
+        )
+
+    def test_store(self):
+        """Test storing state."""
+        store = SummaryStore(self.tempdir)
+        self.assertEqual(store.load('test', 'key'), {})
+        store.save({'value': 1}, 'test', 'key')
+        self.assertEqual(store.load('test', 'key'), {'value': 1})
+        self.assertEqual(store.load('test', 'other'), {})
+
+
+class DailyIndexTest(SummaryTestMixin, TestCase):
+
+    """Testing of summaries from daily aggregates."""
+
+    def indexed_summary(self, from_date, to_date):
+        """Calculate summary using daily index."""
+        return DailyIndex(
+            self.client, SummaryStore(self.tempdir)
+        ).summarize(
+            self.lines, from_date, to_date, percentiles=self.percentiles,
+            distinct=self.distinct
+        )
+
+    def assert_range(self, from_date, to_date):
+        """Compare indexed summary with full computation."""
+        self.assert_summary(
+            self.indexed_summary(from_date, to_date),
+            self.full_summary(to_date, from_date),
+        )
+
+    def test_ranges(self):
+        """Test summaries of various ranges."""
+        day = datetime(2015, 1, 2, tzinfo=tzlocal())
+        self.assert_range(day, day + timedelta(days=3))
+        self.assert_range(
+            day + timedelta(hours=5), day + timedelta(days=5, hours=7)
+        )
+        self.assert_range(
+            day + timedelta(hours=5), day + timedelta(hours=17)
+        )
+        self.assert_range(
+            day - timedelta(days=1), day + timedelta(days=1, hours=2)
+        )
+
+    def test_percentiles(self):
+        """Test percentiles are merged from days and partial days."""
+        self.percentiles = [50, 99]
+        day = datetime(2015, 1, 2, tzinfo=tzlocal())
+        self.assert_range(day, day + timedelta(days=1))
+        self.assert_range(day, day + timedelta(days=1, hours=5))
+        summary = self.indexed_summary(day, day + timedelta(days=1))
+        self.assertIn('call_length_p99', summary['Line 1'])
+
+    def test_distinct(self):
+        """Test distinct counts are merged from days and partial days."""
+        self.distinct = True
+        day = datetime(2015, 1, 2, tzinfo=tzlocal())
+        self.assert_range(day, day + timedelta(days=3))
+        self.assert_range(
+            day + timedelta(hours=5), day + timedelta(days=2, hours=7)
+        )
+
+    def test_sketches_requested(self):
+        """Test sketches are stored only once requested."""
+        day = datetime(2015, 1, 2, tzinfo=tzlocal())
+        self.indexed_summary(day, day + timedelta(days=1))
+        index = LineIndex(SummaryStore(self.tempdir).load(
+            'daily', *DailyIndex(self.client, None).get_key(self.lines[0])
+        ))
+        self.assertIsNone(index.sketches)
+        self.assertIsNone(index.distinct)
+        self.percentiles = [50, 99]
+        self.distinct = True
+        self.assert_range(day, day + timedelta(days=1))
+
+    def test_cached_days(self):
+        """Test complete days are not fetched again."""
+        day = datetime(2015, 1, 2, tzinfo=tzlocal())
+        self.indexed_summary(day, day + timedelta(days=5))
+        del self.client.requests[:]
+        # Ending at last second of a day covers the whole day
+        self.indexed_summary(
+            day + timedelta(days=1), day + timedelta(days=3, seconds=-1)
+        )
+        self.assertEqual(self.client.requests, [])
+        self.indexed_summary(day + timedelta(days=1), day + timedelta(days=3))
+        self.assertEqual(self.client.requests, [])
+        # Only partial days on the edges are fetched
+        self.indexed_summary(
+            day + timedelta(hours=6), day + timedelta(days=2, hours=3)
+        )
+        self.assertEqual(len(self.client.requests), 2 * 3 * 2)
+
+    def test_line_index(self):
+        """Test prefix sums of line index."""
+        index = LineIndex()
+        first = datetime(2015, 1, 1).date()
+        self.assertEqual(
+            index.missing(first, first + timedelta(days=3)),
+            [(first, first + timedelta(days=3))]
+        )
+        index.complete[1] = True
+        index.days[0]['sms_count'] = 1
+        index.days[2]['sms_count'] = 2
+        self.assertEqual(
+            index.missing(first - timedelta(days=1), first + timedelta(days=3)),
+            [
+                (first - timedelta(days=1), first + timedelta(days=1)),
+                (first + timedelta(days=2), first + timedelta(days=3)),
+            ]
+        )
+        self.assertEqual(
+            index.range_summary(first, first + timedelta(days=3))['sms_count'],
+            3
+        )
+        self.assertEqual(
+            LineIndex(index.get_state()).range_summary(
+                first + timedelta(days=1), first + timedelta(days=3)
+            )['sms_count'],
+            2
+        )
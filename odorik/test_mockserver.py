@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test mock API server."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+from datetime import datetime, timedelta
+try:
+    from urllib2 import HTTPError
+except ImportError:
+    from urllib.error import HTTPError
+
+from odorik import Odorik, OdorikException
+from odorik.mockserver import MockServer, TokenBucket
+
+
+class MockServerTest(TestCase):
+
+    """Testing of mock API server."""
+
+    def start_server(self, **kwargs):
+        """Start mock server and return API object for it."""
+        kwargs.setdefault('records', 1000)
+        server = MockServer(('127.0.0.1', 0), **kwargs)
+        server.start()
+        self.addCleanup(server.stop)
+        return Odorik(url=server.url), server
+
+    def test_balance(self):
+        """Test getting balance."""
+        api, server = self.start_server()
+        self.assertAlmostEqual(api.balance(), 123.45)
+        self.assertEqual(server.requests, 1)
+
+    def test_lines(self):
+        """Test getting lines."""
+        api = self.start_server(lines=3)[0]
+        self.assertEqual(len(api.lines()), 3)
+
+    def test_records(self):
+        """Test listing records in interval."""
+        api = self.start_server()[0]
+        now = datetime.utcnow()
+        calls = api.calls(now - timedelta(days=10), now)
+        self.assertEqual(len(calls), 1000)
+        calls = api.calls(now - timedelta(days=1), now)
+        self.assertLess(len(calls), 1000)
+        self.assertGreater(len(calls), 0)
+        line = calls[0]['line']
+        for call in api.calls(now - timedelta(days=1), now, line):
+            self.assertEqual(call['line'], line)
+        for call in api.calls(now - timedelta(days=1), now, direction='in'):
+            self.assertEqual(call['direction'], 'in')
+        self.assertEqual(len(api.sms(now - timedelta(days=10), now)), 500)
+        data = api.mobile_data(now - timedelta(days=10), now)
+        self.assertEqual(len(data), 100)
+        number = data[0]['phone_number']
+        for item in api.mobile_data(now - timedelta(days=10), now, number):
+            self.assertEqual(item['phone_number'], number)
+
+    def test_post(self):
+        """Test POST operations."""
+        api = self.start_server()[0]
+        self.assertEqual(
+            api.send_sms('00420789123456', 'text'),
+            'successfully_sent 132.44'
+        )
+        self.assertRaises(
+            OdorikException, api.send_sms, '00420789123456', 'text', '123'
+        )
+        self.assertEqual(
+            api.callback('00420789123456', '800123456'),
+            'callback_ordered'
+        )
+
+    def test_authentication(self):
+        """Test authentication checking."""
+        api = self.start_server(user='user', password='pass')[0]
+        self.assertRaises(OdorikException, api.balance)
+        self.assertRaises(OdorikException, api.lines)
+        api.user = 'user'
+        api.password = 'pass'
+        self.assertAlmostEqual(api.balance(), 123.45)
+
+    def test_errors(self):
+        """Test error injection."""
+        api = self.start_server(error_rate=1)[0]
+        with self.assertRaises(HTTPError) as context:
+            api.balance()
+        self.assertEqual(context.exception.code, 500)
+
+    def test_throttling(self):
+        """Test request throttling."""
+        api = self.start_server(rate_limit=0.001)[0]
+        api.balance()
+        with self.assertRaises(HTTPError) as context:
+            api.balance()
+        self.assertEqual(context.exception.code, 429)
+
+    def test_bucket(self):
+        """Test token bucket refills."""
+        bucket = TokenBucket(1000, 1)
+        self.assertTrue(bucket.allow())
+        bucket.updated -= 1
+        self.assertTrue(bucket.allow())
@@ -21,9 +21,16 @@
 from __future__ import unicode_literals
 
 from unittest import TestCase
-from odorik import Odorik, OdorikException
+from odorik import (
+    Odorik, OdorikException, RecordingTransport, ReplayTransport,
+    SharedTransport,
+)
 import httpretty
 import datetime
+import json
+import os
+import shutil
+import tempfile
 try:
     from urlparse import parse_qs
 except ImportError:
@@ -276,6 +283,32 @@ class OdorikTest(TestCase):
             1
         )
 
+    @httpretty.activate
+    def test_calls_fields(self):
+        """Test decoding only some fields of calls."""
+        register_uris()
+        self.assertEqual(
+            Odorik().calls(
+                datetime.datetime.now(),
+                datetime.datetime.now(),
+                fields=('id', 'price', 'missing'),
+            ),
+            [{'id': 98292358, 'price': 0.0}]
+        )
+
+    @httpretty.activate
+    def test_data_invalid_fields(self):
+        """Test that errors are kept when decoding only some fields."""
+        register_uris()
+        self.assertRaises(
+            OdorikException,
+            Odorik().mobile_data,
+            datetime.datetime.now(),
+            datetime.datetime.now(),
+            'INVALID',
+            ('id',)
+        )
+
     @httpretty.activate
     def test_sms(self):
         """Test sms."""
@@ -309,3 +342,326 @@ class OdorikTest(TestCase):
             len(Odorik().lines()),
             1
         )
+
+
+class HooksTest(TestCase):
+
+    """Testing of request hooks."""
+
+    @httpretty.activate
+    def test_get_json(self):
+        """Test timing event for JSON request."""
+        register_uris()
+        events = []
+        api = Odorik(password='secret')
+        api.add_hook(events.append)
+        api.lines()
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual(event['method'], 'GET')
+        self.assertEqual(event['path'], 'lines.json')
+        self.assertEqual(event['status'], 200)
+        self.assertEqual(event['bytes'], len(LINES_BODY.encode('utf-8')))
+        self.assertNotIn('password', event['args'])
+        self.assertEqual(
+            set(event['phases']), set(('request', 'download', 'decode'))
+        )
+        self.assertGreaterEqual(
+            event['duration'], sum(event['phases'].values()) * 0.99
+        )
+
+    @httpretty.activate
+    def test_post(self):
+        """Test timing event for POST request."""
+        register_uris()
+        events = []
+        api = Odorik()
+        api.add_hook(events.append)
+        api.callback('00420789123456', '800123456')
+        self.assertEqual(events[0]['method'], 'POST')
+        self.assertNotIn('decode', events[0]['phases'])
+        api.remove_hook(events.append)
+        api.balance()
+        self.assertEqual(len(events), 1)
+
+    @httpretty.activate
+    def test_error(self):
+        """Test timing event for failed request."""
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/balance',
+            status=500,
+            body='error'
+        )
+        events = []
+        api = Odorik()
+        api.add_hook(events.append)
+        self.assertRaises(Exception, api.balance)
+        self.assertEqual(events[0]['status'], 500)
+        self.assertIsNotNone(events[0]['error'])
+
+
+class TransportTest(TestCase):
+
+    """Testing of record, replay and shared transports."""
+
+    def setUp(self):
+        """Create temporary cassette directory."""
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    @httpretty.activate
+    def record(self):
+        """Record some responses."""
+        register_uris()
+        api = Odorik(
+            user='user', password='secret',
+            transport=RecordingTransport(self.tempdir)
+        )
+        self.assertEqual(len(api.lines()), 1)
+        self.assertAlmostEqual(api.balance(), 123.45)
+        self.assertEqual(
+            len(api.calls(
+                datetime.datetime(2015, 1, 1), datetime.datetime(2015, 2, 1)
+            )),
+            1
+        )
+
+    def test_replay(self):
+        """Test replaying recorded responses without network."""
+        self.record()
+        for name in os.listdir(self.tempdir):
+            with open(os.path.join(self.tempdir, name)) as handle:
+                content = handle.read()
+            self.assertNotIn('secret', content)
+            self.assertNotIn('"password"', content)
+        events = []
+        api = Odorik(
+            user='user', password='other',
+            transport=ReplayTransport(self.tempdir)
+        )
+        api.add_hook(events.append)
+        self.assertEqual(len(api.lines()), 1)
+        self.assertEqual(len(api.lines()), 1)
+        self.assertAlmostEqual(api.balance(), 123.45)
+        self.assertEqual(
+            len(api.calls(
+                datetime.datetime(2015, 1, 1), datetime.datetime(2015, 2, 1)
+            )),
+            1
+        )
+        self.assertEqual(events[0]['status'], 200)
+        self.assertIn('replay', events[0]['phases'])
+
+    @httpretty.activate
+    def test_record_fields(self):
+        """Test recording only some fields of records."""
+        register_uris()
+        api = Odorik(transport=RecordingTransport(self.tempdir, fields=['id']))
+        self.assertEqual(len(api.lines()[0]), 23)
+        self.assertGreater(
+            len(api.calls(
+                datetime.datetime(2015, 1, 1), datetime.datetime(2015, 2, 1)
+            )[0]),
+            1
+        )
+        api = Odorik(
+            transport=ReplayTransport(self.tempdir, fields=['id'])
+        )
+        self.assertEqual(len(api.lines()[0]), 23)
+        self.assertEqual(
+            api.calls(
+                datetime.datetime(2015, 1, 1), datetime.datetime(2015, 2, 1)
+            ),
+            [{'id': 98292358}]
+        )
+        # Partial records are not replayed for complete ones
+        api = Odorik(transport=ReplayTransport(self.tempdir))
+        self.assertEqual(len(api.lines()[0]), 23)
+        self.assertRaises(
+            OdorikException,
+            api.calls,
+            datetime.datetime(2015, 1, 1),
+            datetime.datetime(2015, 2, 1)
+        )
+
+    @httpretty.activate
+    def test_shared(self):
+        """Test shared responses are fetched and reported only once."""
+        register_uris()
+        events = []
+        transport = SharedTransport()
+        for dummy in range(2):
+            api = Odorik(transport=transport)
+            api.add_hook(events.append)
+            self.assertEqual(len(api.lines()), 1)
+        self.assertEqual(len(httpretty.latest_requests()), 1)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['path'], 'lines.json')
+
+    def test_replay_account(self):
+        """Test responses are not shared between accounts."""
+        self.record()
+        api = Odorik(user='other', transport=ReplayTransport(self.tempdir))
+        self.assertRaises(OdorikException, api.lines)
+
+    def test_replay_missing(self):
+        """Test replaying not recorded response."""
+        self.record()
+        api = Odorik(transport=ReplayTransport(self.tempdir))
+        self.assertRaises(
+            OdorikException,
+            api.calls,
+            datetime.datetime(2015, 1, 1),
+            datetime.datetime(2015, 3, 1)
+        )
+
+
+def calls_window_response(request, uri, headers):
+    """httpretty calls response with one call per day in the window."""
+    params = parse_qs(uri.split('?', 1)[1])
+    start = datetime.datetime.strptime(params['from'][0], '%Y-%m-%dT%H:%M:%S')
+    end = datetime.datetime.strptime(params['to'][0], '%Y-%m-%dT%H:%M:%S')
+    result = []
+    while start <= end:
+        result.append({
+            'id': start.toordinal(),
+            'date': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'balance_after': 100.0 - start.day,
+        })
+        start += datetime.timedelta(days=1)
+    # API does not guarantee ordering
+    result.reverse()
+    return (200, headers, json.dumps(result))
+
+
+class IteratorTest(TestCase):
+
+    """Testing of paginating iterators."""
+
+    @httpretty.activate
+    def test_iter_calls(self):
+        """Test iterating over calls in windows."""
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/calls.json',
+            body=calls_window_response
+        )
+        events = []
+        api = Odorik()
+        api.add_hook(events.append)
+        calls = list(api.iter_calls(
+            datetime.datetime(2015, 1, 1),
+            datetime.datetime(2015, 2, 1),
+            window=datetime.timedelta(days=7),
+        ))
+        self.assertEqual(len(events), 5)
+        self.assertEqual(len(calls), 32)
+        dates = [call['date'] for call in calls]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(set(dates)), 32)
+
+    @httpretty.activate
+    def test_iter_balance(self):
+        """Test balance history from calls and SMS."""
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/calls.json',
+            body=calls_window_response
+        )
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/sms.json',
+            body=json.dumps([
+                {'id': 2, 'date': '2015-01-04T12:00:00Z',
+                 'balance_after': 95.5},
+                {'id': 1, 'date': '2015-01-02T12:00:00Z',
+                 'balance_after': 97.5},
+            ])
+        )
+        api = Odorik()
+        start = datetime.datetime(2015, 1, 1)
+        end = datetime.datetime(2015, 1, 5)
+        history = list(api.iter_balance(start, end))
+        self.assertEqual(
+            [point['balance'] for point in history],
+            [99.0, 98.0, 97.5, 97.0, 96.0, 95.5, 95.0]
+        )
+        history = list(
+            api.iter_balance(start, end, step=datetime.timedelta(days=2))
+        )
+        self.assertEqual(
+            history,
+            [
+                {'date': '2015-01-02T12:00:00Z', 'balance': 97.5},
+                {'date': '2015-01-04T12:00:00Z', 'balance': 95.5},
+                {'date': '2015-01-05T00:00:00Z', 'balance': 95.0},
+            ]
+        )
+
+    @httpretty.activate
+    def test_iter_lazy(self):
+        """Test iterating fetches windows lazily."""
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/calls.json',
+            body=calls_window_response
+        )
+        events = []
+        api = Odorik()
+        api.add_hook(events.append)
+        iterator = api.iter_calls(
+            datetime.datetime(2015, 1, 1),
+            datetime.datetime(2016, 1, 1),
+            window=datetime.timedelta(days=1),
+        )
+        self.assertEqual(len(events), 0)
+        next(iterator)
+        iterator.close()
+        self.assertLessEqual(len(events), 2)
+
+    @httpretty.activate
+    def test_iter_sms_data(self):
+        """Test iterating over sms and mobile data."""
+        register_uris()
+        api = Odorik()
+        start = datetime.datetime(2015, 1, 1)
+        end = datetime.datetime(2015, 1, 20)
+        self.assertEqual(len(list(api.iter_sms(start, end, line='1234'))), 1)
+        self.assertEqual(
+            len(list(api.iter_mobile_data(
+                start, end, number='00420789123456'
+            ))),
+            1
+        )
+        self.assertEqual(len(list(api.iter_sms(end, start))), 0)
+
+    @httpretty.activate
+    def test_iter_fields(self):
+        """Test iterating over some fields of calls."""
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://www.odorik.cz/api/v1/calls.json',
+            body=calls_window_response
+        )
+        records = list(Odorik().iter_calls(
+            datetime.datetime(2015, 1, 1),
+            datetime.datetime(2015, 1, 3),
+            fields=('balance_after',),
+        ))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(
+            set(records[0].keys()), {'id', 'date', 'balance_after'}
+        )
+
+    def test_iter_invalid(self):
+        """Test invalid window."""
+        self.assertRaises(
+            ValueError,
+            list,
+            Odorik().iter_calls(
+                datetime.datetime(2015, 1, 1),
+                datetime.datetime(2015, 2, 1),
+                window=datetime.timedelta(0),
+            )
+        )
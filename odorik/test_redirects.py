@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test resolving of redirected calls."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+import random
+
+from odorik import synthetic
+from odorik.redirects import RedirectIndex, resolve_redirects
+
+CALLS = [
+    {
+        'id': 1, 'redirection_parent_id': None, 'date': '2015-01-01T10:00:00Z',
+        'direction': 'in', 'length': 10, 'price': 0.0, 'line': 100,
+    },
+    {
+        'id': 2, 'redirection_parent_id': 1, 'date': '2015-01-01T10:00:05Z',
+        'direction': 'redirected', 'length': 60, 'price': 1.5, 'line': 100,
+    },
+    {
+        'id': 3, 'redirection_parent_id': 2, 'date': '2015-01-01T10:00:09Z',
+        'direction': 'redirected', 'length': 30, 'price': 0.5, 'line': 100,
+    },
+    {
+        'id': 4, 'redirection_parent_id': None, 'date': '2015-01-01T11:00:00Z',
+        'direction': 'out', 'length': 20, 'price': 0.25, 'line': 101,
+    },
+    {
+        'id': 6, 'redirection_parent_id': 5, 'date': '2015-01-01T12:00:00Z',
+        'direction': 'redirected', 'length': 5, 'price': 0.1, 'line': 101,
+    },
+]
+
+
+def naive_resolve(records):
+    """Resolve chains by walking parents, used for verification."""
+    by_id = {record['id']: record for record in records}
+    result = {}
+    for record in records:
+        key = record['id']
+        while by_id.get(key, {}).get('redirection_parent_id') is not None:
+            key = by_id[key]['redirection_parent_id']
+        totals = result.setdefault(key, [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += record['length']
+        totals[2] += record['price']
+    return {
+        key: (value[0], value[1], round(value[2], 4))
+        for key, value in result.items()
+    }
+
+
+def totals(chains):
+    """Return totals of resolved chains."""
+    return {
+        chain['id']: (chain['legs'], chain['length'], round(chain['price'], 4))
+        for chain in chains
+    }
+
+
+class RedirectTest(TestCase):
+
+    """Testing of redirect chains resolving."""
+
+    def test_resolve(self):
+        """Test resolving chains."""
+        result = resolve_redirects(CALLS)
+        self.assertEqual([chain['id'] for chain in result], [1, 4, 5])
+        self.assertEqual(
+            totals(result),
+            {1: (3, 100, 2.0), 4: (1, 20, 0.25), 5: (1, 5, 0.1)}
+        )
+        self.assertEqual(result[0]['direction'], 'in')
+        self.assertEqual(result[0]['date'], '2015-01-01T10:00:00Z')
+        # Originating call is not known
+        self.assertIsNone(result[2]['direction'])
+        self.assertEqual(result[2]['date'], '2015-01-01T12:00:00Z')
+
+    def test_order(self):
+        """Test result does not depend on order of records."""
+        expected = resolve_redirects(CALLS)
+        for seed in range(10):
+            calls = list(CALLS)
+            random.Random(seed).shuffle(calls)
+            self.assertEqual(resolve_redirects(calls), expected)
+
+    def test_synthetic(self):
+        """Test resolving generated calls against naive implementation."""
+        calls = list(synthetic.generate_calls(2000))
+        random.Random(0).shuffle(calls)
+        index = RedirectIndex()
+        index.extend(calls)
+        self.assertEqual(totals(index.results()), naive_resolve(calls))
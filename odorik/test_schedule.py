@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test periodic execution of jobs."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+import threading
+
+from odorik.schedule import Job, Scheduler
+
+
+class SchedulerTest(TestCase):
+
+    """Testing of job scheduler."""
+
+    def setUp(self):
+        """Create scheduler with blocking jobs."""
+        self.release = threading.Event()
+        self.contexts = []
+        self.jobs = [
+            Job('first', 60, jitter=30),
+            Job('second', 60, jitter=30, overlap='merge'),
+            Job('third', 600),
+        ]
+        self.scheduler = Scheduler(
+            self.jobs, self.execute, self.prepare, clock=lambda: 1000,
+            seed=1
+        )
+        self.addCleanup(self.scheduler.shutdown)
+        self.addCleanup(self.release.set)
+
+    def prepare(self, now):
+        """Create tick context."""
+        return now
+
+    def execute(self, job, context):
+        """Record job execution and wait until released."""
+        self.contexts.append((job.name, context))
+        if job.name == 'third':
+            raise ValueError('Failed job')
+        self.release.wait()
+
+    def test_jitter(self):
+        """Test first runs are spread by jitter."""
+        self.scheduler.start(1000)
+        first, second, third = [job.next_run for job in self.jobs]
+        self.assertTrue(1000 <= first <= 1030)
+        self.assertTrue(1000 <= second <= 1030)
+        self.assertNotEqual(first, second)
+        self.assertEqual(third, 1000)
+        self.assertEqual(self.scheduler.get_delay(1000), 0)
+
+    def test_overlap(self):
+        """Test overlapping runs are skipped or merged."""
+        self.scheduler.start(1000)
+        self.assertEqual(self.scheduler.tick(1030), self.jobs)
+        self.assertEqual(self.scheduler.tick(1100), [])
+        self.assertEqual(self.scheduler.tick(1160), [])
+        first, second, third = self.jobs
+        self.assertEqual((first.skipped, first.merged), (2, 0))
+        self.assertEqual((second.skipped, second.merged), (0, 2))
+        self.assertTrue(second.pending)
+        self.release.set()
+        self.scheduler.shutdown()
+        self.assertEqual([job.runs for job in self.jobs], [1, 2, 1])
+        self.assertEqual(third.errors, 1)
+        self.assertFalse(second.running)
+        # Jobs started in the same tick share context
+        self.assertEqual(
+            sorted(self.contexts),
+            [('first', 1030), ('second', 1000), ('second', 1030),
+             ('third', 1030)]
+        )
+        self.assertEqual(third.next_run, 1600)
+
+    def test_behind(self):
+        """Test missed runs are not caught up."""
+        self.release.set()
+        self.scheduler.start(1000)
+        self.scheduler.tick(5000)
+        self.assertEqual(
+            [job.next_run for job in self.jobs], [5060, 5060, 5600]
+        )
+
+    def test_once(self):
+        """Test running all jobs once."""
+        self.release.set()
+        self.scheduler.run_once()
+        self.assertEqual([job.runs for job in self.jobs], [1, 1, 1])
+        self.assertEqual(
+            set(context for name, context in self.contexts), {1000}
+        )
+
+    def test_invalid(self):
+        """Test invalid job parameters."""
+        self.assertRaises(ValueError, Job, 'job', 0)
+        self.assertRaises(ValueError, Job, 'job', 60, overlap='queue')
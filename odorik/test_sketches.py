@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test the streaming sketches."""
+from __future__ import unicode_literals
+
+import bisect
+import random
+from unittest import TestCase
+
+from odorik.sketches import (
+    DistinctSketch, QuantileSketch, parse_percentiles, percentile_name,
+)
+from odorik.timings import percentile
+
+
+class QuantileSketchTest(TestCase):
+
+    """Testing of the quantile sketch."""
+
+    def test_exact(self):
+        """Test small sketch is exact."""
+        values = list(range(100, 0, -1))
+        sketch = QuantileSketch()
+        sketch.extend(values)
+        self.assertEqual(len(sketch), 100)
+        for pct in (1, 50, 95, 99, 100):
+            self.assertEqual(
+                sketch.quantile(pct), percentile(sorted(values), pct)
+            )
+        self.assertIsNone(QuantileSketch().quantile(50))
+
+    def test_accuracy(self):
+        """Test rank error of large merged sketch."""
+        rnd = random.Random(1)
+        values = [rnd.expovariate(1 / 300.0) for dummy in range(20000)]
+        sketches = []
+        for start in range(0, len(values), 5000):
+            sketch = QuantileSketch()
+            sketch.extend(values[start:start + 5000])
+            sketches.append(sketch)
+        merged = sketches[0]
+        for sketch in sketches[1:]:
+            merged.merge(sketch)
+        self.assertEqual(len(merged), 20000)
+        self.assertLess(merged.size, 1000)
+        values.sort()
+        for pct in (50, 90, 99):
+            rank = bisect.bisect(values, merged.quantile(pct))
+            self.assertAlmostEqual(
+                rank / float(len(values)), pct / 100.0, delta=0.02
+            )
+
+    def test_state(self):
+        """Test storing sketch."""
+        sketch = QuantileSketch(k=20)
+        sketch.extend(range(1000))
+        restored = QuantileSketch.from_state(sketch.get_state())
+        self.assertEqual(len(restored), 1000)
+        self.assertEqual(restored.size, sketch.size)
+        self.assertEqual(restored.quantile(50), sketch.quantile(50))
+
+    def test_parse(self):
+        """Test parsing percentiles."""
+        self.assertEqual(parse_percentiles('50,95,99.9'), [50, 95, 99.9])
+        self.assertRaises(ValueError, parse_percentiles, '0')
+        self.assertRaises(ValueError, parse_percentiles, 'x')
+        self.assertEqual(percentile_name('length', 99.9), 'length_p99.9')
+        self.assertEqual(percentile_name('length', 50.0), 'length_p50')
+
+
+class DistinctSketchTest(TestCase):
+
+    """Testing of the distinct count sketch."""
+
+    @staticmethod
+    def get_sketch(start, end):
+        """Create sketch with range of numbers."""
+        sketch = DistinctSketch()
+        for number in range(start, end):
+            sketch.add('00420{0:09d}'.format(number))
+        return sketch
+
+    def test_exact(self):
+        """Test small sets are counted exactly."""
+        sketch = self.get_sketch(0, 500)
+        sketch.merge(self.get_sketch(250, 750))
+        self.assertEqual(sketch.count(), 750)
+        self.assertEqual(len(DistinctSketch()), 0)
+
+    def test_estimate(self):
+        """Test estimate of large merged sets."""
+        sketch = self.get_sketch(0, 20000)
+        sketch.merge(self.get_sketch(10000, 40000))
+        self.assertIsNone(sketch.values)
+        self.assertAlmostEqual(sketch.count(), 40000, delta=40000 * 0.05)
+        # Merging small exact set into estimate
+        sketch.merge(self.get_sketch(0, 100))
+        self.assertAlmostEqual(sketch.count(), 40000, delta=40000 * 0.05)
+
+    def test_state(self):
+        """Test storing sketch."""
+        for size in (10, 5000):
+            sketch = self.get_sketch(0, size)
+            restored = DistinctSketch.from_state(sketch.get_state())
+            self.assertEqual(restored.count(), sketch.count())
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test sorting of records."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+
+from odorik import synthetic
+from odorik.sorting import parse_sort, sort_records
+
+RECORDS = [
+    {'id': 1, 'price': 2.0, 'line': 'b'},
+    {'id': 2, 'price': 1.0, 'line': 'a'},
+    {'id': 3, 'price': None, 'line': 'a'},
+    {'id': 4, 'price': 2.0, 'line': 'a'},
+    {'id': 5, 'price': 3.0, 'line': 'b'},
+]
+
+
+def ids(records):
+    """Return list of record ids."""
+    return [record['id'] for record in records]
+
+
+class SortingTest(TestCase):
+
+    """Testing of records sorting."""
+
+    def test_parse(self):
+        """Test parsing sort specification."""
+        self.assertEqual(
+            parse_sort('price,-line'), [('price', False), ('line', True)]
+        )
+        self.assertRaises(ValueError, parse_sort, 'price,')
+
+    def test_sort(self):
+        """Test sorting in memory."""
+        self.assertEqual(
+            ids(sort_records(RECORDS, parse_sort('price'))), [2, 1, 4, 5, 3]
+        )
+        self.assertEqual(
+            ids(sort_records(RECORDS, parse_sort('-price'))), [5, 1, 4, 2, 3]
+        )
+        self.assertEqual(
+            ids(sort_records(RECORDS, parse_sort('line,-price'))),
+            [4, 2, 3, 5, 1]
+        )
+
+    def test_limit(self):
+        """Test top records selection."""
+        self.assertEqual(
+            ids(sort_records(RECORDS, parse_sort('-price'), 2)), [5, 1]
+        )
+        self.assertEqual(ids(sort_records(RECORDS, None, 2)), [1, 2])
+        self.assertEqual(ids(sort_records(RECORDS)), [1, 2, 3, 4, 5])
+
+    def test_mixed_types(self):
+        """Test sorting values of different types."""
+        records = [{'id': 1, 'value': 'x'}, {'id': 2, 'value': 1}]
+        self.assertEqual(
+            ids(sort_records(records, parse_sort('value'))), [2, 1]
+        )
+
+    def test_external(self):
+        """Test external merge sort matches in memory sort."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        records = list(synthetic.generate_calls(1000))
+        spec = parse_sort('-price,date')
+        expected = sort_records(records, spec)
+        result = sort_records(
+            iter(records), spec, buffer_size=64, directory=tempdir
+        )
+        self.assertFalse(isinstance(result, list))
+        self.assertEqual(ids(result), ids(expected))
+        self.assertEqual(os.listdir(tempdir), [])
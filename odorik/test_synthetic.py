@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test synthetic data generator."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+import json
+
+from odorik import synthetic
+from odorik.test_odorik import CALLS_BODY, SMS_BODY, DATA_BODY, LINES_BODY
+
+
+class SyntheticTest(TestCase):
+
+    """Testing of synthetic data."""
+
+    def assert_shape(self, records, body):
+        """Check records have same fields as API fixture."""
+        expected = set(json.loads(body)[0].keys())
+        for record in records:
+            self.assertEqual(set(record.keys()), expected)
+
+    def test_shape(self):
+        """Test records have same fields as API."""
+        self.assert_shape(synthetic.generate_calls(100), CALLS_BODY)
+        self.assert_shape(synthetic.generate_sms(100), SMS_BODY)
+        self.assert_shape(synthetic.generate_data(100), DATA_BODY)
+        self.assert_shape(synthetic.generate_lines(10), LINES_BODY)
+
+    def test_deterministic(self):
+        """Test same seed produces same data."""
+        self.assertEqual(
+            synthetic.dump(synthetic.generate_calls(100, seed=1)),
+            synthetic.dump(synthetic.generate_calls(100, seed=1)),
+        )
+        self.assertNotEqual(
+            synthetic.dump(synthetic.generate_calls(100, seed=1)),
+            synthetic.dump(synthetic.generate_calls(100, seed=2)),
+        )
+
+    def test_chronological(self):
+        """Test records are sorted by date."""
+        dates = [record['date'] for record in synthetic.generate_sms(100)]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(set(dates)), 100)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Test request timings."""
+from __future__ import unicode_literals
+
+from unittest import TestCase
+from io import StringIO
+
+from odorik.timings import TimingCollector, percentile
+
+
+def make_event(path, duration):
+    """Create fake timing event."""
+    return {
+        'method': 'GET',
+        'path': path,
+        'args': {'user': 'test'},
+        'start': 1000.0,
+        'status': 200,
+        'bytes': 10,
+        'phases': {'request': duration / 2, 'download': duration / 2},
+        'duration': duration,
+        'error': None,
+    }
+
+
+class TimingsTest(TestCase):
+
+    """Testing of timings collector."""
+
+    def test_percentile(self):
+        """Test percentile calculation."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([5], 50), 5)
+        self.assertEqual(percentile([], 50), 0)
+
+    def test_report(self):
+        """Test timings report."""
+        collector = TimingCollector()
+        collector(make_event('balance', 0.1))
+        collector(make_event('calls.json', 0.3))
+        output = StringIO()
+        collector.report(output)
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('method'))
+        self.assertIn('calls.json', lines[2])
+        self.assertIn('300.0', lines[2])
+        self.assertIn('p50: 100.0 ms', lines[-1])
+        self.assertIn('max: 300.0 ms', lines[-1])
+
+    def test_report_empty(self):
+        """Test timings report without requests."""
+        output = StringIO()
+        TimingCollector().report(output)
+        self.assertIn('requests: 0', output.getvalue())
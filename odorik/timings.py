@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 Michal Čihař <michal@cihar.com>
+#
+# This file is part of Odorik <https://github.com/nijel/odorik>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Request timings collection and reporting."""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import math
+import os
+import threading
+
+PHASES = ('request', 'download', 'decode')
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, pct):
+    """Calculate percentile of sorted values using nearest rank method."""
+    if not values:
+        return 0
+    rank = int(math.ceil(pct / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def format_ms(value):
+    """Format duration in seconds as milliseconds."""
+    if value is None:
+        return '-'
+    return '{0:.1f}'.format(value * 1000)
+
+
+class TimingCollector(object):
+
+    """Request hook collecting timing events."""
+
+    def __init__(self):
+        """Create empty collector."""
+        self.events = []
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        """Store the event, to be used as Odorik hook."""
+        event = dict(event)
+        event['thread'] = threading.current_thread().ident
+        with self.lock:
+            self.events.append(event)
+
+    def report(self, stream):
+        """Print table of requests and latency percentiles."""
+        header = ('method', 'path', 'status', 'bytes') + PHASES + ('total',)
+        rows = [header]
+        for event in self.events:
+            rows.append(
+                (
+                    event['method'],
+                    event['path'],
+                    '{0}'.format(event['status'] or '-'),
+                    '{0}'.format(event['bytes']),
+                ) + tuple(
+                    format_ms(event['phases'].get(phase)) for phase in PHASES
+                ) + (
+                    format_ms(event['duration']),
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        for row in rows:
+            print(
+                '  '.join(
+                    value.ljust(widths[i]) if i < 2 else value.rjust(widths[i])
+                    for i, value in enumerate(row)
+                ),
+                file=stream
+            )
+        durations = sorted(event['duration'] for event in self.events)
+        print('', file=stream)
+        print(
+            'requests: {0}, total: {1} ms, {2}, max: {3} ms'.format(
+                len(durations),
+                format_ms(sum(durations)),
+                ', '.join(
+                    'p{0}: {1} ms'.format(pct, format_ms(
+                        percentile(durations, pct)
+                    ))
+                    for pct in PERCENTILES
+                ),
+                format_ms(durations[-1] if durations else 0),
+            ),
+            file=stream
+        )
+
+    def write_trace(self, path):
+        """Write events in Trace Event Format (loadable by about:tracing)."""
+        pid = os.getpid()
+        trace = []
+        for event in self.events:
+            start = event['start'] * 1000000
+            trace.append({
+                'name': '{0} {1}'.format(event['method'], event['path']),
+                'cat': 'request',
+                'ph': 'X',
+                'ts': start,
+                'dur': event['duration'] * 1000000,
+                'pid': pid,
+                'tid': event['thread'],
+                'args': {
+                    'args': event['args'],
+                    'status': event['status'],
+                    'bytes': event['bytes'],
+                    'error': event['error'],
+                },
+            })
+            for phase in PHASES:
+                if phase not in event['phases']:
+                    continue
+                duration = event['phases'][phase] * 1000000
+                trace.append({
+                    'name': phase,
+                    'cat': 'phase',
+                    'ph': 'X',
+                    'ts': start,
+                    'dur': duration,
+                    'pid': pid,
+                    'tid': event['thread'],
+                })
+                start += duration
+        with open(path, 'w') as handle:
+            json.dump({'traceEvents': trace}, handle, indent=2)
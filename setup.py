@@ -43,6 +43,7 @@ setup(
     platforms=['any'],
     packages=[
         'odorik',
+        'odorik.commands',
     ],
     package_dir={'odorik': 'odorik'},
     long_description=LONG_DESCRIPTION,